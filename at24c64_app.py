@@ -1,13 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from smartcard.System import readers
-from smartcard.util import toHexString, toBytes
-import datetime
+from smartcard.util import toBytes
 import logging
-import os
-import time
-from smartcard.scard import SCARD_PROTOCOL_T0, SCARD_PROTOCOL_T1
-from smartcard.CardConnection import CardConnection
+import threading
+from card_device import AT24C64Device, CardError, identify_card, list_readers
+from card_drivers import EEPROM_TYPES, get_driver
+from card_jobs import JobRunner, JobCancelled
+from card_log import ConsoleLog, start_file_logging
+from card_trace import ApduTracer
+from card_provision import ProvisioningPool, ProvisionJob, JOB_KINDS
+from card_monitor import AutoProvisioner, PIPELINES
+from dump_compare import compare_bytes
+from dump_store import DumpStore
+from dump_picker import DumpPicker
+from hex_format import format_hex_dump, hex_bytes
+from hex_view import HexView
+from trace_view import TraceWindow
+
+LOG_FILE = "at24c64_app.log"
 
 class AT24C64App:
     def __init__(self, root):
@@ -24,19 +34,31 @@ class AT24C64App:
         root.geometry(f"{window_width}x{window_height}+{x}+{y}")
         
         # Initialize variables
-        self.PAGE_SIZE = 32  # AT24C64 has 32-byte page size
-        self.TOTAL_SIZE = 8192  # 8KB total memory
-        self.PAGES = self.TOTAL_SIZE // self.PAGE_SIZE  # 256 pages
-        self.connection = None
-        self.reader = None
-        self.processing = False
+        self.device = AT24C64Device(log=self.log_message)
+        self.PAGE_SIZE = self.device.PAGE_SIZE
+        self.TOTAL_SIZE = self.device.TOTAL_SIZE
+        self.PAGES = self.device.PAGES
+        self.jobs = JobRunner(root)
+        self.auto = None
+        self.pool = None  # ProvisioningPool while a provisioning run is active
+        self.tracer = ApduTracer()
         
         # Setup logging
         logging.basicConfig(level=logging.INFO,
                           format='%(asctime)s - %(levelname)s - %(message)s')
+        start_file_logging(LOG_FILE)
         
         # Create main frames
         self.create_gui()
+        self.console_log = ConsoleLog(root, self.console, logging.getLogger(),
+                                      timestamp_format="%Y-%m-%d %H:%M:%S")
+        
+        # Dumps live in the deduplicated dump store; bring in old .bin dumps once
+        self.store = DumpStore()
+        if self.store.count() == 0:
+            imported = self.store.import_directory()
+            if imported:
+                self.log_message(f"Imported {len(imported)} dump files into {self.store.path}")
         
         # Initialize status
         self.update_status("Ready")
@@ -73,12 +95,48 @@ class AT24C64App:
         self.status_label = ttk.Label(control_frame, text="Status: Ready")
         self.status_label.grid(row=0, column=2, padx=5, pady=5)
         
+        # Bytes per write APDU; probed on connect and remembered per reader
+        ttk.Label(control_frame, text="Write chunk:").grid(row=1, column=0, padx=5, pady=5)
+        self.write_chunk_var = tk.StringVar(value=str(self.device.write_chunk))
+        self.write_chunk_combo = ttk.Combobox(control_frame, textvariable=self.write_chunk_var, width=5, state="readonly",
+                                              values=[str(size) for size in self.device.WRITE_CHUNK_SIZES])
+        self.write_chunk_combo.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        self.write_chunk_combo.bind('<<ComboboxSelected>>', self.change_write_chunk)
+        
+        # Auto mode runs the selected pipeline whenever a card is inserted
+        self.auto_mode_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Auto mode", variable=self.auto_mode_var,
+                        command=self.toggle_auto_mode).grid(row=2, column=0, padx=5, pady=5)
+        self.auto_pipeline_var = tk.StringVar(value="dump")
+        ttk.Combobox(control_frame, textvariable=self.auto_pipeline_var, values=PIPELINES, width=8,
+                     state="readonly").grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        
+        # Drop the memory image kept for this connection so reads go to the card again
+        ttk.Button(control_frame, text="Refresh from Card",
+                   command=self.refresh_from_card).grid(row=1, column=2, padx=5, pady=5)
+        
+        # Time every APDU sent to the card
+        self.trace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Trace APDUs", variable=self.trace_var,
+                        command=self.toggle_trace).grid(row=3, column=0, padx=5, pady=5)
+        ttk.Button(control_frame, text="APDU Stats",
+                   command=lambda: TraceWindow(self.root, self.tracer)).grid(row=3, column=1, padx=5, pady=5, sticky="w")
+        
+        # I²C EEPROMs have no ATR to tell them apart, so the chip is chosen here
+        ttk.Label(control_frame, text="Chip:").grid(row=4, column=0, padx=5, pady=5)
+        self.chip_var = tk.StringVar(value=self.device.CARD_TYPE)
+        chip_combo = ttk.Combobox(control_frame, textvariable=self.chip_var, values=EEPROM_TYPES, width=8,
+                                  state="readonly")
+        chip_combo.grid(row=4, column=1, padx=5, pady=5, sticky="w")
+        chip_combo.bind('<<ComboboxSelected>>', self.change_chip)
+        
     def create_read_section(self, parent):
         read_frame = ttk.LabelFrame(parent, text="Read Operations", padding="5")
         read_frame.pack(fill="x", padx=5, pady=5)
         
         # Page selection
-        ttk.Label(read_frame, text="Page (0-255):").grid(row=0, column=0, padx=5, pady=5)
+        self.page_label = ttk.Label(read_frame, text=f"Page (0-{self.PAGES - 1}):")
+        self.page_label.grid(row=0, column=0, padx=5, pady=5)
         self.page_entry = ttk.Entry(read_frame, width=10)
         self.page_entry.grid(row=0, column=1, padx=5, pady=5)
         
@@ -97,6 +155,11 @@ class AT24C64App:
         self.compare_dumps_button = ttk.Button(read_frame, text="Compare Dumps", command=self.compare_dumps)
         self.compare_dumps_button.grid(row=0, column=5, padx=5, pady=5)
         
+        # Read the whole chip in the largest chunks the reader accepts
+        self.large_reads_var = tk.BooleanVar(value=self.device.large_reads)
+        ttk.Checkbutton(read_frame, text="Large reads", variable=self.large_reads_var,
+                        command=self.toggle_large_reads).grid(row=0, column=6, padx=5, pady=5)
+        
         # Read data display with both hex and ASCII view
         frame = ttk.Frame(read_frame)
         frame.grid(row=1, column=0, columnspan=5, padx=5, pady=5)
@@ -155,9 +218,20 @@ class AT24C64App:
         self.quick_clone_button = ttk.Button(button_frame, text="Quick Clone Latest Dump", command=self.quick_clone)
         self.quick_clone_button.pack(side=tk.LEFT, padx=(0, 5))
         
+        self.store_clone_button = ttk.Button(button_frame, text="Clone Stored Dump...", command=self.clone_stored_dump)
+        self.store_clone_button.pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.provision_button = ttk.Button(button_frame, text="Provision All Readers", command=self.open_provisioning)
+        self.provision_button.pack(side=tk.LEFT, padx=(0, 5))
+        
+        # Delta clone only writes the pages that differ from the card
+        self.delta_clone_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="Changed pages only",
+                        variable=self.delta_clone_var).pack(side=tk.LEFT, padx=(0, 5))
+        
         # Progress bar
-        self.write_progress = ttk.Progressbar(clone_frame, mode='determinate', length=300)
-        self.write_progress.pack(fill='x', padx=5, pady=5)
+        self.clone_progress = ttk.Progressbar(clone_frame, mode='determinate', length=300)
+        self.clone_progress.pack(fill='x', padx=5, pady=5)
         
         # Binary file write section
         ttk.Label(write_frame, text="Write Binary File:").grid(row=5, column=0, padx=5, pady=5)
@@ -192,6 +266,16 @@ class AT24C64App:
         self.write_progress = ttk.Progressbar(button_frame, mode='determinate', length=300)
         self.write_progress.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
+        # Controls for the running background operation
+        job_frame = ttk.Frame(write_frame)
+        job_frame.grid(row=8, column=1, columnspan=3, sticky='w', padx=5, pady=5)
+        
+        self.pause_button = ttk.Button(job_frame, text="Pause", command=self.toggle_pause, state="disabled")
+        self.pause_button.pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.cancel_button = ttk.Button(job_frame, text="Cancel", command=self.cancel_job, state="disabled")
+        self.cancel_button.pack(side=tk.LEFT)
+        
     def create_console_section(self, parent):
         console_frame = ttk.LabelFrame(parent, text="Console", padding="5")
         console_frame.pack(fill="both", expand=True, padx=5, pady=5)
@@ -204,255 +288,243 @@ class AT24C64App:
         scrollbar.pack(side="right", fill="y")
         self.console.configure(yscrollcommand=scrollbar.set)
         
+    def card_busy(self, parent=None):
+        """Tell the user and return True while a job, auto mode or provisioning uses the readers"""
+        if self.jobs.busy:
+            messagebox.showinfo("Busy", "Another operation is still running", parent=parent)
+            return True
+        if self.auto is not None:
+            messagebox.showinfo("Busy", "Auto mode is using the readers; turn it off first", parent=parent)
+            return True
+        if self.pool is not None:
+            messagebox.showinfo("Busy", "Provisioning is using the readers; stop it first", parent=parent)
+            return True
+        return False
+
     def connect_to_card(self):
+        if self.card_busy():
+            return
         try:
-            # Get list of readers
-            reader_list = readers()
-            if not reader_list:
-                self.log_message("No smart card readers found")
-                return
-                
-            self.reader = reader_list[0]
-            self.connection = self.reader.createConnection()
+            self.device.disconnect()
+            self.device.reader = None
+            atr = self.device.connect()
             
-            # Connect with T0 protocol since that's what the card supports
-            try:
-                self.connection.connect(CardConnection.T0_protocol)
-                self.log_message("Connected using protocol T0")
-            except Exception as e:
-                self.log_message(f"Failed to connect: {str(e)}")
-                return
+            self.write_chunk_var.set(str(self.device.write_chunk))
             
             # Check if it's an AT24C64
-            atr = self.connection.getATR()
-            if self.verify_at24c64(atr):
+            if self.device.verify_at24c64(atr):
                 self.log_message(f"Connected to AT24C64 EEPROM")
-                self.log_message(f"ATR: {toHexString(atr)}")
+                self.log_message(f"ATR: {hex_bytes(atr)}")
                 self.update_status("Connected")
             else:
-                self.log_message("Warning: Card may not be AT24C64")
+                self.log_message(f"Warning: ATR is that of a {identify_card(atr)}, not an I²C EEPROM")
                 
+        except CardError as e:
+            self.log_message(str(e))
         except Exception as e:
             self.log_message(f"Connection error: {str(e)}")
             self.update_status("Connection Failed")
 
-    def verify_at24c64(self, atr):
-        # AT24C64 specific verification
-        # This would need to be adjusted based on your specific card/reader combination
-        return True  # Placeholder - implement actual verification
-        
     def read_page(self):
-        if not self.connection:
+        if self.card_busy():
+            return
+        if not self.device.connected:
             messagebox.showerror("Error", "Please connect to card first")
             return
             
         try:
             page = int(self.page_entry.get())
-            if not 0 <= page < self.PAGES:
-                messagebox.showerror("Error", f"Page number must be between 0 and {self.PAGES-1}")
-                return
-                
-            address = page * self.PAGE_SIZE
-            # Modified command structure for AT24C64
-            # First send the address
-            addr_cmd = [0xFF, 0xB0, 0x00, address & 0xFF, self.PAGE_SIZE]
-            response, sw1, sw2 = self.connection.transmit(addr_cmd)
-            
-            if sw1 == 0x90:  # Success
-                self.read_data.delete(1.0, tk.END)
-                self.read_data.insert(tk.END, toHexString(response))
-                self.log_message(f"Successfully read page {page}")
-            else:
-                self.log_message(f"Read failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                
         except ValueError:
             messagebox.showerror("Error", "Invalid page number")
+            return
+            
+        try:
+            response = self.device.read_page(page)
+            self.read_data.delete(1.0, tk.END)
+            self.read_data.insert(tk.END, hex_bytes(response))
+            self.log_message(f"Successfully read page {page}")
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             self.log_message(f"Read error: {str(e)}")
             
     def write_page(self):
-        if not self.connection:
+        if self.card_busy():
+            return
+        if not self.device.connected:
             messagebox.showerror("Error", "Please connect to card first")
             return
             
         try:
             page = int(self.write_page_entry.get())
-            if not 0 <= page < self.PAGES:
-                messagebox.showerror("Error", f"Page number must be between 0 and {self.PAGES-1}")
-                return
-                
             # Convert hex string to bytes
             data = toBytes(self.write_data_entry.get().replace(" ", ""))
-            if len(data) > self.PAGE_SIZE:
-                messagebox.showerror("Error", f"Data exceeds page size ({self.PAGE_SIZE} bytes)")
-                return
-                
-            address = page * self.PAGE_SIZE
-            # Modified command structure for AT24C64
-            write_cmd = [0xFF, 0xD6, 0x00, address & 0xFF, len(data)] + list(data)
-            response, sw1, sw2 = self.connection.transmit(write_cmd)
-            
-            if sw1 == 0x90:  # Success
-                self.log_message(f"Successfully wrote to page {page}")
-            else:
-                self.log_message(f"Write failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                
-        except ValueError:
+        except (ValueError, TypeError):
             messagebox.showerror("Error", "Invalid page number or data format")
+            return
+            
+        try:
+            self.device.write_page(page, data)
+            self.log_message(f"Successfully wrote to page {page}")
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             self.log_message(f"Write error: {str(e)}")
             
+    def change_chip(self, event=None):
+        if self.card_busy():
+            self.chip_var.set(self.device.CARD_TYPE)
+            return
+        if self.device.connected:
+            messagebox.showwarning("Warning", "Disconnect before changing the chip type")
+            self.chip_var.set(self.device.CARD_TYPE)
+            return
+        self.device.use_driver(get_driver(self.chip_var.get()))
+        self.PAGE_SIZE = self.device.PAGE_SIZE
+        self.TOTAL_SIZE = self.device.TOTAL_SIZE
+        self.PAGES = self.device.PAGES
+        self.page_label.config(text=f"Page (0-{self.PAGES - 1}):")
+        self.write_chunk_combo.config(values=[str(size) for size in self.device.WRITE_CHUNK_SIZES])
+        self.write_chunk_var.set(str(self.device.write_chunk))
+        self.log_message(f"Chip set to {self.device.CARD_TYPE}: {self.device.driver.describe()}")
+        
+    def device_factory(self, reader, log=None):
+        """Devices for auto mode and provisioning use the selected chip"""
+        return AT24C64Device(reader, log=log, driver=self.device.driver)
+        
+    def change_write_chunk(self, event=None):
+        if self.card_busy():
+            self.write_chunk_var.set(str(self.device.write_chunk))
+            return
+        size = int(self.write_chunk_var.get())
+        self.device.set_write_chunk(size)
+        self.log_message(f"Using {size}-byte writes")
+        
+    def refresh_from_card(self):
+        if self.card_busy():
+            return
+        self.device.refresh()
+        self.log_message("Session memory image cleared; next reads come from the card")
+        
+    def toggle_trace(self):
+        self.device.tracer = self.tracer if self.trace_var.get() else None
+        
+    def toggle_large_reads(self):
+        if self.card_busy():
+            self.large_reads_var.set(self.device.large_reads)
+            return
+        self.device.large_reads = self.large_reads_var.get()
+        
+    def toggle_auto_mode(self):
+        if not self.auto_mode_var.get():
+            if self.auto is not None:
+                self.auto.stop()
+                self.auto = None
+            self.update_status("Ready")
+            return
+            
+        if self.card_busy():
+            self.auto_mode_var.set(False)
+            return
+        pipeline = self.auto_pipeline_var.get()
+        try:
+            data = None
+            if pipeline in ("clone", "verify"):
+                with open(self.selected_file_var.get(), "rb") as f:
+                    data = f.read()
+            auto = AutoProvisioner(pipeline, data, delta=self.delta_clone_var.get(),
+                                   store=self.store, log=self.log_message, device_factory=self.device_factory,
+                                   on_event=lambda *event: self.jobs.call_in_ui(self.show_auto_event, *event))
+            # Release the GUI's own connection; auto mode connects per card
+            self.device.disconnect()
+            auto.start()
+        except Exception as e:
+            self.auto_mode_var.set(False)
+            messagebox.showerror("Error", f"Cannot start auto mode: {str(e)}")
+            return
+        self.auto = auto
+        self.update_status(f"Auto {pipeline}")
+        
+    def show_auto_event(self, event, reader, details):
+        if event == "inserted":
+            self.update_status(f"Auto: {details['card_type']}")
+        elif event == "done":
+            self.update_status("Auto: done, remove card")
+        elif event == "skipped":
+            self.update_status(f"Auto: skipped {details['card_type']}, remove card")
+        elif event == "failed":
+            self.update_status("Auto: failed, remove card")
+        elif event == "removed":
+            self.update_status("Auto: insert card")
+        
     def read_all_memory(self):
-        if not self.connection:
+        if not self.device.connected:
             messagebox.showerror("Error", "Please connect to card first")
             return
             
-        try:
-            self.log_message("Starting full memory read...")
-            data = []
-            
-            for page in range(self.PAGES):
-                address = page * self.PAGE_SIZE
-                # Modified command for reading
-                read_cmd = [0xFF, 0xB0, 0x00, address & 0xFF, self.PAGE_SIZE]
-                response, sw1, sw2 = self.connection.transmit(read_cmd)
-                
-                if sw1 == 0x90:
-                    data.extend(response)
-                    if page % 16 == 0:  # Update less frequently to reduce GUI load
-                        self.log_message(f"Read page {page}/{self.PAGES-1}")
-                else:
-                    self.log_message(f"Read failed at page {page}: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                    return
-                    
-            # Save to file
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"at24c64_dump_{timestamp}.bin"
-            with open(filename, "wb") as f:
-                f.write(bytes(data))
-                
-            self.log_message(f"Full memory dump saved to {filename}")
+        def on_error(e):
+            if isinstance(e, JobCancelled):
+                self.log_message("Full memory read cancelled")
+            else:
+                self.log_message(f"Read all error: {str(e)}")
             
-        except Exception as e:
-            self.log_message(f"Read all error: {str(e)}")
+        self.start_job("Read all", lambda job: self.device.dump(self.store, progress=job.progress),
+                       on_error=on_error)
             
     def format_hex_dump(self, data, bytes_per_line=16):
-        result = []
-        ascii_chars = []
-        
-        for i, byte in enumerate(data):
-            if i % bytes_per_line == 0:
-                if i != 0:
-                    # Add ASCII representation
-                    result.append("  " + "".join(ascii_chars))
-                    ascii_chars = []
-                # Add offset
-                result.append(f"\n{i:04X}: ")
-            
-            result.append(f"{byte:02X} ")
-            # Add printable ASCII character or dot
-            ascii_chars.append(chr(byte) if 32 <= byte <= 126 else ".")
-        
-        # Add padding for last line if needed
-        if ascii_chars:
-            padding = bytes_per_line - len(ascii_chars)
-            result.append("   " * padding)
-            result.append("  " + "".join(ascii_chars))
-        
-        return "".join(result)
+        return format_hex_dump(data, bytes_per_line)
 
     def view_last_dump(self):
         try:
-            # Find the most recent dump file
-            dump_files = [f for f in os.listdir() if f.startswith("at24c64_dump_") and f.endswith(".bin")]
-            if not dump_files:
+            # Find the most recent dump
+            last_dump = self.store.latest(card_type=self.device.CARD_TYPE)
+            if not last_dump:
                 messagebox.showinfo("Info", "No dump files found")
                 return
             
-            latest_dump = max(dump_files)
-            
-            with open(latest_dump, "rb") as f:
-                data = f.read()
+            data = self.store.get(last_dump.id)
             
             # Create a new window to display the dump
             dump_window = tk.Toplevel(self.root)
-            dump_window.title(f"Memory Dump Viewer - {latest_dump}")
+            dump_window.title(f"Memory Dump Viewer - {last_dump.label}")
             
-            # Add text widget with scrollbars
+            # Virtualized hex view: only the visible rows are formatted
             frame = ttk.Frame(dump_window, padding="5")
             frame.pack(fill=tk.BOTH, expand=True)
-            
-            text = tk.Text(frame, wrap=tk.NONE, font=("Courier", 10))
-            text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            
-            # Vertical scrollbar
-            yscrollbar = ttk.Scrollbar(frame, orient="vertical", command=text.yview)
-            yscrollbar.pack(side=tk.RIGHT, fill="y")
-            
-            # Horizontal scrollbar
-            xscrollbar = ttk.Scrollbar(dump_window, orient="horizontal", command=text.xview)
-            xscrollbar.pack(side=tk.BOTTOM, fill="x")
-            
-            text.configure(yscrollcommand=yscrollbar.set, xscrollcommand=xscrollbar.set)
-            
-            # Format and display the dump
-            formatted_dump = self.format_hex_dump(data)
-            text.insert("1.0", formatted_dump)
-            text.configure(state="disabled")  # Make read-only
+            HexView(frame, data).pack(fill=tk.BOTH, expand=True)
             
             # Set window size
             dump_window.geometry("800x600")
             
-            self.log_message(f"Opened dump viewer for {latest_dump}")
+            self.log_message(f"Opened dump viewer for {last_dump.label}")
             
         except Exception as e:
             self.log_message(f"Error viewing dump: {str(e)}")
             
     def compare_dumps(self):
         try:
-            # Find all dump files
-            dump_files = [f for f in os.listdir() if f.startswith("at24c64_dump_") and f.endswith(".bin")]
-            if len(dump_files) < 2:
+            if self.store.count() < 2:
                 messagebox.showinfo("Info", "Need at least 2 dump files to compare")
                 return
             
-            # Create file selection window
-            select_window = tk.Toplevel(self.root)
-            select_window.title("Select Dumps to Compare")
-            select_window.geometry("400x200")
-            
-            # First dump selection
-            ttk.Label(select_window, text="First Dump:").pack(pady=5)
-            dump1_var = tk.StringVar(value=dump_files[0])
-            dump1_combo = ttk.Combobox(select_window, textvariable=dump1_var, values=dump_files)
-            dump1_combo.pack(pady=5)
-            
-            # Second dump selection
-            ttk.Label(select_window, text="Second Dump:").pack(pady=5)
-            dump2_var = tk.StringVar(value=dump_files[-1])
-            dump2_combo = ttk.Combobox(select_window, textvariable=dump2_var, values=dump_files)
-            dump2_combo.pack(pady=5)
-            
-            def start_comparison():
-                dump1 = dump1_var.get()
-                dump2 = dump2_var.get()
-                if dump1 == dump2:
-                    messagebox.showwarning("Warning", "Please select different dumps")
-                    return
-                select_window.destroy()
+            # Pick two dumps from the catalog; oldest is shown on the left
+            def start_comparison(records):
+                dump1, dump2 = sorted(records, key=lambda record: record.id)
                 self.show_comparison(dump1, dump2)
             
-            ttk.Button(select_window, text="Compare", command=start_comparison).pack(pady=20)
+            DumpPicker(self.root, self.store, "Select Dumps to Compare", "Compare",
+                       start_comparison, pick=2, filters={"card_type": self.device.CARD_TYPE})
             
         except Exception as e:
             self.log_message(f"Error setting up comparison: {str(e)}")
             
-    def show_comparison(self, dump1_name, dump2_name):
+    def show_comparison(self, dump1, dump2):
         try:
-            # Read both dumps
-            with open(dump1_name, "rb") as f1, open(dump2_name, "rb") as f2:
-                data1 = f1.read()
-                data2 = f2.read()
+            # Fetch both dumps and find the differing byte ranges
+            dump1_name, dump2_name = dump1.label, dump2.label
+            data1 = self.store.get(dump1.id)
+            data2 = self.store.get(dump2.id)
+            diff = compare_bytes(data1, data2, self.PAGE_SIZE)
             
             # Create comparison window
             comp_window = tk.Toplevel(self.root)
@@ -475,6 +547,7 @@ class AT24C64App:
             # Add labels
             ttk.Label(control_frame, text=f"Dump 1: {dump1_name}").pack(side=tk.LEFT, padx=5)
             ttk.Label(control_frame, text=f"Dump 2: {dump2_name}").pack(side=tk.LEFT, padx=5)
+            ttk.Label(control_frame, text=diff.summary()).pack(side=tk.LEFT, padx=5)
             
             # Add sync scroll toggle button with icon
             self.sync_enabled = tk.BooleanVar(value=True)
@@ -492,92 +565,37 @@ class AT24C64App:
                           font=('Segoe UI', 10),
                           padding=2)
             
-            # Create text widgets with synchronized scrolling
-            frame1 = ttk.Frame(main_frame)
-            frame1.grid(row=1, column=0, sticky="nsew", padx=2)
-            frame2 = ttk.Frame(main_frame)
-            frame2.grid(row=1, column=1, sticky="nsew", padx=2)
-            
-            text1 = tk.Text(frame1, wrap=tk.NONE, font=("Courier", 10))
-            text2 = tk.Text(frame2, wrap=tk.NONE, font=("Courier", 10))
+            # Virtualized hex views; each formats and highlights only its visible rows
+            views = []
             
-            # Configure tags for highlighting
-            text1.tag_configure("diff", background="#ffcccc")  # Light red for differences
-            text1.tag_configure("same", background="#ccffcc")  # Light green for matches
-            text2.tag_configure("diff", background="#ffcccc")
-            text2.tag_configure("same", background="#ccffcc")
-            
-            # Add scrollbars
-            yscroll1 = ttk.Scrollbar(frame1, orient="vertical")
-            yscroll2 = ttk.Scrollbar(frame2, orient="vertical")
-            xscroll = ttk.Scrollbar(main_frame, orient="horizontal")
-            
-            # Configure scrollbar commands with sync check
-            def sync_scroll_y_wrapper(*args):
-                if self.sync_enabled.get():
-                    self.sync_scroll_y(text1, text2, *args)
-                return text1.yview(*args)
-                
-            def sync_scroll_y_wrapper2(*args):
+            def sync_scroll(source, row):
                 if self.sync_enabled.get():
-                    self.sync_scroll_y(text2, text1, *args)
-                return text2.yview(*args)
-                
-            def sync_scroll_x_wrapper(*args):
-                if self.sync_enabled.get():
-                    self.sync_scroll_x(text1, text2, *args)
-                return text1.xview(*args)
-            
-            yscroll1.config(command=sync_scroll_y_wrapper)
-            yscroll2.config(command=sync_scroll_y_wrapper2)
-            xscroll.config(command=sync_scroll_x_wrapper)
-            
-            text1.config(yscrollcommand=yscroll1.set, xscrollcommand=xscroll.set)
-            text2.config(yscrollcommand=yscroll2.set, xscrollcommand=xscroll.set)
-            
-            # Pack widgets
-            text1.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            text2.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            yscroll1.pack(side=tk.RIGHT, fill="y")
-            yscroll2.pack(side=tk.RIGHT, fill="y")
-            xscroll.grid(row=2, column=0, columnspan=2, sticky="ew")
-            
-            # Format and display dumps with highlighting
-            lines1 = self.format_hex_dump(data1).split('\n')
-            lines2 = self.format_hex_dump(data2).split('\n')
-            
-            for i, (line1, line2) in enumerate(zip(lines1, lines2)):
-                if line1 == line2:
-                    text1.insert(tk.END, line1 + '\n', "same")
-                    text2.insert(tk.END, line2 + '\n', "same")
-                else:
-                    text1.insert(tk.END, line1 + '\n', "diff")
-                    text2.insert(tk.END, line2 + '\n', "diff")
-            
-            # Make text widgets read-only
-            text1.config(state="disabled")
-            text2.config(state="disabled")
+                    for view in views:
+                        if view is not source:
+                            view.scroll_to(row, notify=False)
+            
+            for column, data in enumerate((data1, data2)):
+                runs = [run for run in diff.runs if run.offset < len(data)]
+                view = HexView(main_frame, data, runs=runs,
+                               on_scroll=lambda row, column=column: sync_scroll(views[column], row))
+                view.grid(row=1, column=column, sticky="nsew", padx=2)
+                views.append(view)
+            
+            for i, run in enumerate(diff.runs):
+                if i < 50:
+                    self.log_message(f"Difference at {run.describe()}")
+            if len(diff.runs) > 50:
+                self.log_message(f"... and {len(diff.runs) - 50} more differing ranges")
+            self.log_message(diff.summary())
             
             self.log_message(f"Opened comparison view for {dump1_name} and {dump2_name}")
             
         except Exception as e:
             self.log_message(f"Error showing comparison: {str(e)}")
             
-    def sync_scroll_y(self, source, target, *args):
-        if len(args) > 1:
-            source.yview(*args)
-            target.yview(*args)
-            
-    def sync_scroll_x(self, source, target, *args):
-        if len(args) > 1:
-            source.xview(*args)
-            target.xview(*args)
-            
     def log_message(self, message):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.console.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.console.see(tk.END)
-        logging.info(message)
+        # Safe from worker threads: the console is only updated by its flush timer
+        self.console_log.write(message)
         
     def update_status(self, status):
         self.status_label.config(text=f"Status: {status}")
@@ -595,7 +613,7 @@ class AT24C64App:
             self.selected_file_var.set(filename)
             
     def write_binary_file(self):
-        if not self.connection:
+        if not self.device.connected:
             messagebox.showerror("Error", "Please connect to card first")
             return
             
@@ -641,104 +659,76 @@ class AT24C64App:
             self.write_progress['value'] = 0
             self.write_progress['maximum'] = required_pages
             
-            # Write data page by page
-            for i in range(required_pages):
-                page = start_page + i
-                offset = i * self.PAGE_SIZE
-                page_data = data[offset:offset + self.PAGE_SIZE]
-                
-                # Pad last page if needed
-                if len(page_data) < self.PAGE_SIZE:
-                    page_data = page_data + bytes([0xFF] * (self.PAGE_SIZE - len(page_data)))
-                
-                # Write the page
-                write_cmd = [0xFF, 0xD6, 0x00, page & 0xFF, len(page_data)] + list(page_data)
-                response, sw1, sw2 = self.connection.transmit(write_cmd)
-                
-                if sw1 != 0x90:
-                    messagebox.showerror("Error", f"Write failed at page {page}: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                    return
-                
-                # Update progress bar
-                self.write_progress['value'] = i + 1
-                self.root.update_idletasks()
-                
-            messagebox.showinfo("Success", f"Successfully wrote {len(data)} bytes to card")
-            self.log_message(f"Wrote binary file {filename} to card starting at page {start_page}")
-            
         except Exception as e:
             messagebox.showerror("Error", f"Write failed: {str(e)}")
             self.log_message(f"Binary write error: {str(e)}")
+            return
             
+        def on_done(result):
+            messagebox.showinfo("Success", f"Successfully wrote {len(data)} bytes to card")
+            self.log_message(f"Wrote binary file {filename} to card starting at page {start_page}")
+            
+        def on_error(e):
+            if isinstance(e, JobCancelled):
+                self.log_message("Binary write cancelled")
+            elif isinstance(e, CardError):
+                messagebox.showerror("Error", str(e))
+            else:
+                messagebox.showerror("Error", f"Write failed: {str(e)}")
+                self.log_message(f"Binary write error: {str(e)}")
+            
+        self.start_job("Write binary",
+                       lambda job: self.device.write_binary(data, start_page, progress=job.progress),
+                       progress_bar=self.write_progress, on_done=on_done, on_error=on_error)
+            
+    def start_job(self, name, func, progress_bar=None, on_done=None, on_error=None):
+        """Run a long card operation on the worker thread"""
+        if self.card_busy():
+            return None
+            
+        def on_progress(done, total):
+            if progress_bar is not None:
+                progress_bar['maximum'] = total
+                progress_bar['value'] = done
+                
+        def finish(callback, value):
+            self.pause_button.config(text="Pause", state="disabled")
+            self.cancel_button.config(state="disabled")
+            if callback:
+                callback(value)
+                
+        self.pause_button.config(text="Pause", state="normal")
+        self.cancel_button.config(state="normal")
+        return self.jobs.submit(name, func, on_progress=on_progress,
+                                on_done=lambda result: finish(on_done, result),
+                                on_error=lambda e: finish(on_error, e))
+        
+    def toggle_pause(self):
+        job = self.jobs.current
+        if not job:
+            return
+        if job.paused:
+            job.resume()
+            self.pause_button.config(text="Pause")
+            self.log_message(f"{job.name} resumed")
+        else:
+            job.pause()
+            self.pause_button.config(text="Resume")
+            self.log_message(f"{job.name} paused")
+            
+    def cancel_job(self):
+        job = self.jobs.current
+        if job:
+            job.cancel()
+            self.log_message(f"Cancelling {job.name}...")
+        
     def write_page_data(self, page, data, max_retries=3):
         """Write a single page with verification and retry"""
-        for attempt in range(max_retries):
-            try:
-                # Calculate base address for this page
-                base_addr = page * self.PAGE_SIZE
-                
-                # Write data in small chunks (4 bytes at a time)
-                chunk_size = 4
-                for offset in range(0, len(data), chunk_size):
-                    chunk = data[offset:offset + chunk_size]
-                    addr = base_addr + offset
-                    
-                    # Match the working read command structure but for write
-                    write_cmd = [
-                        0xFF,           # Special CLA for this card
-                        0xD0,           # Write command
-                        0x00,           # P1
-                        addr & 0xFF,    # P2: Address
-                        len(chunk)      # Lc: Length of data
-                    ] + list(chunk)     # Data bytes
-                    
-                    response, sw1, sw2 = self.connection.transmit(write_cmd)
-                    
-                    if sw1 != 0x90:
-                        raise Exception(f"Write failed at offset {offset}: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                    
-                    # AT24C64 write cycle time (5ms typical)
-                    time.sleep(0.01)  # 10ms to be safe
-                
-                # Additional delay after page write
-                time.sleep(0.05)  # 50ms between pages
-                
-                # Verify written data using the known working read command
-                verify_cmd = [
-                    0xFF,           # Special CLA for this card
-                    0xB0,           # Read command
-                    0x00,           # P1
-                    base_addr & 0xFF,  # P2: Address
-                    self.PAGE_SIZE  # Le: Expected length
-                ]
-                response, sw1, sw2 = self.connection.transmit(verify_cmd)
-                
-                if sw1 != 0x90:
-                    raise Exception(f"Verify read failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                
-                # Compare written data
-                if list(response) != list(data):
-                    if attempt < max_retries - 1:
-                        self.log_message(f"Verification failed on page {page}, attempt {attempt + 1}/{max_retries}")
-                        time.sleep(0.1)  # 100ms before retry
-                        continue
-                    raise Exception("Verification failed: Written data doesn't match")
-                
-                return True
-                
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    self.log_message(f"Retry {attempt + 1}/{max_retries} for page {page}: {str(e)}")
-                    time.sleep(0.1)  # 100ms before retry
-                    continue
-                self.log_message(f"Write error at page {page}: {str(e)}")
-                return False
-        
-        return False
+        return self.device.write_page_data(page, data, max_retries)
 
     def clone_card(self):
         """Write the selected dump to card starting from page 0"""
-        if not self.connection:
+        if not self.device.connected:
             messagebox.showerror("Error", "Please connect to card first")
             return
             
@@ -751,7 +741,15 @@ class AT24C64App:
             # Read the dump file
             with open(filename, 'rb') as f:
                 data = f.read()
-                
+        except Exception as e:
+            messagebox.showerror("Error", f"Clone failed: {str(e)}")
+            self.log_message(f"Clone error: {str(e)}")
+            return
+        self.clone_data(data, filename)
+        
+    def clone_data(self, data, source):
+        """Clone a memory image (from a file or the dump store) onto the card"""
+        try:
             # Verify dump size
             if len(data) != self.TOTAL_SIZE:
                 messagebox.showerror("Error", 
@@ -761,74 +759,170 @@ class AT24C64App:
                 
             # Confirm clone
             if not messagebox.askyesno("Confirm Clone", 
-                f"This will completely overwrite the current card with the contents of:\n{filename}\n\n"
+                f"This will completely overwrite the current card with the contents of:\n{source}\n\n"
                 "Are you sure you want to continue?"):
                 return
                 
             # Reset progress bar
-            self.write_progress['value'] = 0
-            self.write_progress['maximum'] = self.PAGES
+            self.clone_progress['value'] = 0
+            self.clone_progress['maximum'] = self.PAGES
             
-            # Write data page by page
-            failed_pages = []
-            retry_pages = []
-            
-            for page in range(self.PAGES):
-                offset = page * self.PAGE_SIZE
-                page_data = data[offset:offset + self.PAGE_SIZE]
-                
-                # Try to write the page
-                if not self.write_page_data(page, page_data):
-                    retry_pages.append(page)
-                
-                # Update progress bar
-                self.write_progress['value'] = page + 1
-                self.root.update_idletasks()
-                
-                # Small delay between pages
-                time.sleep(0.02)
-            
-            # Retry failed pages with more retries
-            if retry_pages:
-                self.log_message(f"Retrying {len(retry_pages)} failed pages...")
-                for page in retry_pages:
-                    offset = page * self.PAGE_SIZE
-                    page_data = data[offset:offset + self.PAGE_SIZE]
-                    if not self.write_page_data(page, page_data, max_retries=5):
-                        failed_pages.append(page)
-                    time.sleep(0.1)  # Longer delay between retries
+        except Exception as e:
+            messagebox.showerror("Error", f"Clone failed: {str(e)}")
+            self.log_message(f"Clone error: {str(e)}")
+            return
             
+        def on_done(result):
             # Report results
-            if not failed_pages:
-                messagebox.showinfo("Success", "Card cloned successfully!")
-                self.log_message(f"Successfully cloned card from {filename}")
+            if result.ok:
+                messagebox.showinfo("Success", f"Card cloned successfully!\n{result.summary()}")
+                self.log_message(f"Successfully cloned card from {source}: {result.summary()}")
             else:
-                failed_str = ", ".join(str(p) for p in failed_pages)
+                failed_str = ", ".join(str(p) for p in result.failed_pages)
                 messagebox.showerror("Error", 
                     f"Clone completed with errors.\nFailed pages: {failed_str}")
                 self.log_message(f"Clone completed with errors. Failed pages: {failed_str}")
+                
+        def on_error(e):
+            if isinstance(e, JobCancelled):
+                self.log_message("Clone cancelled - card is only partially written")
+            else:
+                messagebox.showerror("Error", f"Clone failed: {str(e)}")
+                self.log_message(f"Clone error: {str(e)}")
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Clone failed: {str(e)}")
-            self.log_message(f"Clone error: {str(e)}")
+        delta = self.delta_clone_var.get()
+        self.start_job("Clone", lambda job: self.device.clone(data, progress=job.progress, delta=delta),
+                       progress_bar=self.clone_progress, on_done=on_done, on_error=on_error)
             
     def quick_clone(self):
         """Automatically find the latest dump and clone it"""
         try:
-            # Find the most recent dump file
-            dump_files = [f for f in os.listdir() if f.startswith("at24c64_dump_") and f.endswith(".bin")]
-            if not dump_files:
+            # Find the most recent dump
+            last_dump = self.store.latest(card_type=self.device.CARD_TYPE)
+            if not last_dump:
                 messagebox.showinfo("Error", "No dump files found")
                 return
                 
-            latest_dump = max(dump_files)
-            self.selected_file_var.set(latest_dump)
-            self.clone_card()
+            if not self.device.connected:
+                messagebox.showerror("Error", "Please connect to card first")
+                return
+            self.clone_data(self.store.get(last_dump.id), last_dump.label)
             
         except Exception as e:
             messagebox.showerror("Error", f"Quick clone failed: {str(e)}")
             self.log_message(f"Quick clone error: {str(e)}")
             
+    def clone_stored_dump(self):
+        """Pick a dump from the catalog and clone it"""
+        if not self.device.connected:
+            messagebox.showerror("Error", "Please connect to card first")
+            return
+        
+        def clone(records):
+            try:
+                self.clone_data(self.store.get(records[0].id), records[0].label)
+            except Exception as e:
+                messagebox.showerror("Error", f"Clone failed: {str(e)}")
+                self.log_message(f"Clone error: {str(e)}")
+        
+        DumpPicker(self.root, self.store, "Select Dump to Clone", "Clone", clone,
+                   filters={"card_type": self.device.CARD_TYPE})
+        
+    def open_provisioning(self):
+        """Run dump/clone/verify jobs on every attached reader in parallel"""
+        try:
+            pool_readers = list_readers()
+        except Exception as e:
+            self.log_message(f"Error listing readers: {str(e)}")
+            return
+        if not pool_readers:
+            messagebox.showinfo("Info", "No smart card readers found")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Multi-Reader Provisioning")
+        window.geometry("700x400")
+        
+        options = ttk.Frame(window, padding="5")
+        options.pack(fill="x")
+        
+        ttk.Label(options, text="Operation:").pack(side=tk.LEFT, padx=5)
+        kind_var = tk.StringVar(value="dump")
+        ttk.Combobox(options, textvariable=kind_var, values=JOB_KINDS, width=8,
+                     state="readonly").pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(options, text="Cards:").pack(side=tk.LEFT, padx=5)
+        count_entry = ttk.Entry(options, width=6)
+        count_entry.insert(0, str(len(pool_readers)))
+        count_entry.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(options, text=f"Image: {self.selected_file_var.get() or '(none)'}").pack(side=tk.LEFT, padx=5)
+        
+        columns = ("state", "progress", "cards", "message")
+        tree = ttk.Treeview(window, columns=columns, show="tree headings")
+        tree.heading("#0", text="Reader")
+        tree.heading("state", text="State")
+        tree.heading("progress", text="Progress")
+        tree.heading("cards", text="OK / Failed")
+        tree.heading("message", text="Last Result")
+        tree.column("state", width=70)
+        tree.column("progress", width=80)
+        tree.column("cards", width=80)
+        for reader in pool_readers:
+            tree.insert("", tk.END, iid=str(reader), text=str(reader), values=("idle", "", "0 / 0", ""))
+        tree.pack(fill="both", expand=True, padx=5, pady=5)
+        
+        buttons = ttk.Frame(window, padding="5")
+        buttons.pack(fill="x")
+        def show_status(status):
+            if not tree.winfo_exists():
+                return
+            progress = f"{status.done}/{status.total}" if status.total else ""
+            tree.item(status.reader, values=(status.state, progress,
+                                             f"{status.cards_done} / {status.cards_failed}", status.message))
+            
+        def start():
+            if self.card_busy(parent=window):
+                return
+            kind = kind_var.get()
+            try:
+                count = int(count_entry.get())
+                data = None
+                if kind != "dump":
+                    with open(self.selected_file_var.get(), "rb") as f:
+                        data = f.read()
+                job = ProvisionJob(kind, data, delta=self.delta_clone_var.get(), store=self.store)
+            except (ValueError, OSError) as e:
+                messagebox.showerror("Error", f"Cannot start provisioning: {str(e)}", parent=window)
+                return
+            
+            # Release the GUI's own connection so its reader can join the pool
+            self.device.disconnect()
+            self.update_status("Provisioning")
+            pool = ProvisioningPool(pool_readers, log=self.log_message, device_factory=self.device_factory,
+                                    on_progress=lambda status: self.jobs.call_in_ui(show_status, status))
+            self.pool = pool
+            pool.submit(job, count)
+            pool.start(wait_for_new_card=count > len(pool_readers))
+            
+            def wait():
+                pool.join()
+                self.jobs.call_in_ui(finished)
+            threading.Thread(target=wait, daemon=True).start()
+            
+        def finished():
+            self.pool = None
+            self.update_status("Ready")
+            self.log_message("Provisioning finished")
+            
+        def stop():
+            if self.pool is not None:
+                self.pool.stop()
+                self.log_message("Stopping provisioning after the current cards...")
+                
+        ttk.Button(buttons, text="Start", command=start).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Stop", command=stop).pack(side=tk.LEFT, padx=5)
+        
 if __name__ == "__main__":
     root = tk.Tk()
     app = AT24C64App(root)
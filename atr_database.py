@@ -0,0 +1,264 @@
+"""ATR database for identifying cards.
+
+Entries are read from files in the pcsc-tools smartcard_list.txt format:
+atr_list.txt next to this module, then the pcsc-tools list if it is
+installed. Every ATR pattern is compiled once into a byte trie whose edges
+are either exact bytes or (value, mask) pairs for wildcards, so a lookup
+walks the ATR once instead of testing every pattern, and its result is
+cached per ATR:
+
+    identify_atr([0x3B, 0x04, 0xA2, 0x13, 0x10, 0x91])  # AtrEntry SLE4442
+
+    python atr_database.py 3B 04 A2 13 10 91
+    python atr_database.py --stats
+"""
+import logging
+import os
+import re
+import threading
+
+ATR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "atr_list.txt")
+PCSC_ATR_FILES = (
+    "/usr/share/pcsc/smartcard_list.txt",
+    "/usr/local/share/pcsc/smartcard_list.txt",
+)
+
+# Part numbers the card type is taken from, e.g. "SLE 4442" or "AT24C64"
+CARD_TYPE_PATTERN = re.compile(r"\b(SLE|AT24C|24C)\s?(\d{2,4})\b")
+BYTE_PATTERN = re.compile(r"[0-9A-F.]{2}")
+
+
+def parse_pattern(pattern):
+    """Turn an ATR pattern like "3B 95 15 40 .. 68" into (value, mask) pairs.
+
+    A trailing ".*" (any further bytes) is not part of the pairs; see
+    split_tail. Raises ValueError for other regular expression features.
+    """
+    tokens = split_tail(pattern)[0].upper().split()
+    if len(tokens) == 1 and len(tokens[0]) > 2:
+        tokens = [tokens[0][i:i + 2] for i in range(0, len(tokens[0]), 2)]
+    pairs = []
+    for token in tokens:
+        if not BYTE_PATTERN.fullmatch(token):
+            raise ValueError(f"Unsupported ATR pattern byte {token!r}")
+        value = mask = 0
+        for nibble in token:
+            value <<= 4
+            mask <<= 4
+            if nibble != ".":
+                value |= int(nibble, 16)
+                mask |= 0xF
+        pairs.append((value, mask))
+    if not pairs:
+        raise ValueError("Empty ATR pattern")
+    return pairs
+
+
+def split_tail(pattern):
+    """Split a trailing ".*" off a pattern; return (pattern, whether it had one)"""
+    pattern = pattern.strip()
+    if pattern.endswith(".*"):
+        return pattern[:-2].rstrip(), True
+    return pattern, False
+
+
+def card_type_of(descriptions):
+    """First SLE/24Cxx part number named in the descriptions, or None"""
+    for line in descriptions:
+        match = CARD_TYPE_PATTERN.search(line.upper())
+        if match:
+            return match.group(1) + match.group(2)
+    return None
+
+
+class AtrEntry:
+    """One ATR pattern with its descriptions and the card type they name"""
+
+    def __init__(self, pattern, descriptions, source=None):
+        self.pattern = pattern
+        self.descriptions = list(descriptions)
+        self.card_type = card_type_of(self.descriptions)
+        self.source = source
+
+    def __repr__(self):
+        return f"AtrEntry({self.pattern!r}, {self.card_type!r})"
+
+    @property
+    def description(self):
+        return self.descriptions[0] if self.descriptions else ""
+
+
+class _Node:
+    __slots__ = ("exact", "masked", "entry", "tail")
+
+    def __init__(self):
+        self.exact = {}  # byte -> node
+        self.masked = []  # (value, mask, node)
+        self.entry = None
+        self.tail = None  # Entry for any longer ATR with this prefix (pattern ending in ".*")
+
+
+class AtrDatabase:
+    """ATR patterns compiled into a trie with a per-ATR lookup cache.
+
+    When several patterns match, exact bytes win over wildcards position by
+    position and whole-ATR patterns over prefixes ending in ".*"; equal
+    patterns keep the entry added first.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.entries = []
+        self.skipped = 0
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, pattern, descriptions, source=None):
+        pairs = parse_pattern(pattern)
+        node = self.root
+        for value, mask in pairs:
+            if mask == 0xFF:
+                child = node.exact.get(value)
+                if child is None:
+                    child = node.exact[value] = _Node()
+                node = child
+                continue
+            for edge_value, edge_mask, child in node.masked:
+                if (edge_value, edge_mask) == (value, mask):
+                    node = child
+                    break
+            else:
+                child = _Node()
+                node.masked.append((value, mask, child))
+                # Most specific wildcard first: more fixed bits are tried earlier
+                node.masked.sort(key=lambda edge: -bin(edge[1]).count("1"))
+                node = child
+        entry = AtrEntry(pattern, descriptions, source)
+        self.entries.append(entry)
+        slot = "tail" if split_tail(pattern)[1] else "entry"
+        if getattr(node, slot) is None:
+            setattr(node, slot, entry)
+        self._cache.clear()
+        return entry
+
+    def load(self, filename):
+        """Add the entries of a smartcard_list.txt style file; returns how many"""
+        added = 0
+        pattern, descriptions = None, []
+
+        def flush():
+            nonlocal added
+            if pattern is None:
+                return
+            try:
+                self.add(pattern, descriptions, filename)
+                added += 1
+            except ValueError as e:
+                self.skipped += 1
+                logging.debug(f"Skipping ATR {pattern} in {filename}: {str(e)}")
+
+        with open(filename, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                if line[0] in " \t":
+                    if pattern is not None:
+                        descriptions.append(line.strip())
+                    continue
+                flush()
+                pattern, descriptions = line.strip(), []
+        flush()
+        return added
+
+    def lookup(self, atr):
+        """AtrEntry matching the whole ATR (or a prefix ending in ".*"), or None"""
+        atr = bytes(atr)
+        try:
+            return self._cache[atr]
+        except KeyError:
+            pass
+        entry = self._match(self.root, atr, 0)
+        self._cache[atr] = entry
+        return entry
+
+    def _match(self, node, atr, i):
+        if i == len(atr):
+            return node.entry or node.tail
+        byte = atr[i]
+        child = node.exact.get(byte)
+        if child is not None:
+            entry = self._match(child, atr, i + 1)
+            if entry is not None:
+                return entry
+        for value, mask, child in node.masked:
+            if byte & mask == value:
+                entry = self._match(child, atr, i + 1)
+                if entry is not None:
+                    return entry
+        return node.tail
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def load_database(files=None):
+    """Compile a database from files (default: atr_list.txt, then pcsc-tools')"""
+    database = AtrDatabase()
+    if files is None:
+        files = [ATR_FILE] + [path for path in PCSC_ATR_FILES if os.path.exists(path)]
+    for filename in files:
+        try:
+            database.load(filename)
+        except OSError as e:
+            logging.warning(f"Cannot read ATR list {filename}: {str(e)}")
+    return database
+
+
+def default_database():
+    """The shared database, compiled on first use"""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = load_database()
+    return _database
+
+
+def identify_atr(atr):
+    """AtrEntry of an ATR in the shared database, or None"""
+    return default_database().lookup(atr)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Look ATRs up in the ATR database")
+    parser.add_argument("atr", nargs="*", help="ATR bytes in hex, e.g. 3B 04 A2 13 10 91")
+    parser.add_argument("--file", action="append", help="ATR list to load instead of the defaults")
+    parser.add_argument("--stats", action="store_true", help="Show how many entries were loaded")
+    args = parser.parse_args(argv)
+
+    database = load_database(args.file)
+    if args.stats or not args.atr:
+        print(f"{len(database)} ATR patterns loaded, {database.skipped} skipped")
+    if not args.atr:
+        return 0
+
+    atr = bytes.fromhex("".join(args.atr))
+    entry = database.lookup(atr)
+    if entry is None:
+        print("Unknown ATR")
+        return 1
+    print(f"Card type: {entry.card_type or 'Unknown'}")
+    print(f"Pattern:   {entry.pattern}")
+    for line in entry.descriptions:
+        print(f"  {line}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
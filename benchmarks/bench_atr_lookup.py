@@ -0,0 +1,81 @@
+"""Benchmark ATR identification against a linear pattern scan.
+
+A synthetic list of pcsc-tools style patterns (about one in four with ".."
+wildcards) is looked up three ways:
+
+- scan: every pattern turned into a regular expression and tried in turn,
+  as the apps did before atr_database
+- trie: the compiled AtrDatabase without its cache
+- cached: AtrDatabase.lookup, as seen by a provisioning loop
+
+    python benchmarks/bench_atr_lookup.py --entries 5000
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from atr_database import AtrDatabase  # noqa: E402
+
+
+def patterns(count, seed=1):
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        atr = [0x3B] + [rng.getrandbits(8) for _ in range(rng.randint(4, 19))]
+        tokens = [f"{b:02X}" for b in atr]
+        if rng.random() < 0.25:
+            tokens[rng.randrange(1, len(tokens))] = ".."
+        result.append(" ".join(tokens))
+    return result
+
+
+def scan(entries, atr):
+    """Linear scan with a regular expression built per pattern"""
+    text = " ".join(f"{b:02X}" for b in atr)
+    for pattern, card_type in entries:
+        if re.fullmatch(pattern, text):
+            return card_type
+    return None
+
+
+def best(function, repeat, number):
+    """Best time per call over repeat runs, in microseconds"""
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark ATR lookup")
+    parser.add_argument("--entries", type=int, default=5000, help="Patterns in the database")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    entries = [(pattern, f"card {i}") for i, pattern in enumerate(patterns(args.entries))]
+    database = AtrDatabase()
+    compile_ms = best(lambda: [AtrDatabase().add(pattern, [name]) for pattern, name in entries], 1, 1) / 1000
+    for pattern, name in entries:
+        database.add(pattern, [name])
+
+    # Look up the last pattern: the worst case for the scan
+    atr = bytes(int(token, 16) if token != ".." else 0x42 for token in entries[-1][0].split())
+    assert database.lookup(atr).description == scan(entries, atr)
+
+    def uncached():
+        database._cache.clear()
+        database.lookup(atr)
+
+    print(f"{args.entries} patterns, compiled in {compile_ms:.1f} ms")
+    print(f"{'case':<8} {'µs/lookup':>10}")
+    print(f"{'scan':<8} {best(lambda: scan(entries, atr), args.repeat, 10):10.1f}")
+    print(f"{'trie':<8} {best(uncached, args.repeat, 1000):10.1f}")
+    print(f"{'cached':<8} {best(lambda: database.lookup(atr), args.repeat, 10000):10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
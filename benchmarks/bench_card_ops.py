@@ -0,0 +1,233 @@
+"""Benchmark the card hot paths against emulated reader timings.
+
+Each case runs the device code the apps use on a fresh emulated card
+(card_emulator) whose reader latency is only accounted, not slept:
+
+- at24c64_dump: full AT24C64 dump into a dump store (Read All)
+- at24c64_clone: 256-page clone with verification (Clone Card)
+- sle4442_sector_write: 16-byte SLE4442 sector write after the PSC
+- sle4428_image_write: full 1 KB SLE4428 image programmed (Write Image)
+- dump_compare: two stored 8 KB dumps fetched and compared (Compare Dumps)
+
+For every case it reports the APDUs sent, wall time, time the host slept
+waiting for write cycles, emulated card time, and peak Python memory.
+Results can be saved as baselines and later runs checked against them:
+
+    python benchmarks/bench_card_ops.py --save
+    python benchmarks/bench_card_ops.py --check
+    python benchmarks/bench_card_ops.py --profile-from-trace clone_trace.jsonl
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_device import AT24C64Device, SmartCardDevice  # noqa: E402
+from card_emulator import VirtualClock, simulated_reader  # noqa: E402
+from card_trace import ApduTracer, load_trace  # noqa: E402
+from dump_compare import compare_bytes  # noqa: E402
+from dump_store import DumpStore  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Reader timings: seconds per APDU, per byte transferred, and per write cycle
+PROFILES = {
+    "usb-ccid": {"latency": 0.004, "byte_latency": 0.00001, "write_cycle": 0.005},
+    "fast": {"latency": 0.001, "byte_latency": 0.000002, "write_cycle": 0.003},
+}
+
+# Allowed growth over the baseline before a metric counts as a regression.
+# APDUs and card time only vary with write-cycle polling; wall time is noisy.
+# Host sleep is what adaptive write timing cuts, so it is held close.
+TOLERANCES = {"apdus": 1.05, "card_s": 1.1, "wall_s": 2.0, "sleep_s": 1.1, "peak_kb": 1.5}
+# Absolute slack on top, for noise on very short runs and one extra poll sleep
+SLACK = {"wall_s": 0.01, "sleep_s": 0.005}
+
+
+def image(size, seed):
+    return bytes(random.Random(seed).getrandbits(8) for _ in range(size))
+
+
+def connected(device_class, card_type, timing, **kwargs):
+    clock = VirtualClock()
+    reader = simulated_reader(card_type, clock=clock, **timing)
+    device = device_class(reader, log=lambda message: None, **kwargs)
+    device.connect()
+    return device, reader.connections[-1], clock
+
+
+def case_at24c64_dump(timing, workdir):
+    device, connection, clock = connected(AT24C64Device, "AT24C64", timing)
+    store = DumpStore(os.path.join(workdir, "bench_store.db"))
+    try:
+        yield device, connection, clock
+        device.dump(store, refresh=True)
+    finally:
+        store.close()
+
+
+def case_at24c64_clone(timing, workdir):
+    device, connection, clock = connected(AT24C64Device, "AT24C64", timing)
+    data = image(device.TOTAL_SIZE, 1)
+    yield device, connection, clock
+    result = device.clone(data)
+    if not result.ok:
+        raise RuntimeError(f"Clone failed: {result.summary()}")
+
+
+def case_sle4442_sector_write(timing, workdir):
+    device, connection, clock = connected(SmartCardDevice, "SLE4442", timing,
+                                          pin_file=os.path.join(workdir, "pins.txt"))
+    device.verify_pin(["FFFFFF"])
+    yield device, connection, clock
+    failed = device.write_sector_with_pin(2, list(image(16, 2)), 0xD0)
+    if failed:
+        raise RuntimeError(f"Sector write failed at bytes {failed}")
+
+
+def case_sle4428_image_write(timing, workdir):
+    device, connection, clock = connected(SmartCardDevice, "SLE4428", timing,
+                                          pin_file=os.path.join(workdir, "pins.txt"))
+    yield device, connection, clock
+    result = device.write_image(image(device.driver.memory_size, 4), pins=["FFFF"])
+    if not result.ok:
+        raise RuntimeError(f"Image write failed: {result.summary()}")
+
+
+def case_dump_compare(timing, workdir):
+    store = DumpStore(os.path.join(workdir, "bench_compare.db"))
+    try:
+        first = image(8192, 3)
+        second = bytearray(first)
+        for offset in range(0, len(second), 97):
+            second[offset] ^= 0xFF
+        ids = [store.put(data, card_type="AT24C64").id for data in (first, bytes(second))]
+        yield None, None, None
+        compare_bytes(store.get(ids[0]), store.get(ids[1]))
+    finally:
+        store.close()
+
+
+CASES = {
+    "at24c64_dump": case_at24c64_dump,
+    "at24c64_clone": case_at24c64_clone,
+    "sle4442_sector_write": case_sle4442_sector_write,
+    "sle4428_image_write": case_sle4428_image_write,
+    "dump_compare": case_dump_compare,
+}
+
+
+def run_case(case, timing, workdir):
+    """Set the case up, then measure the part after its yield"""
+    steps = case(timing, workdir)
+    device, connection, clock = next(steps)
+    apdus = connection.apdus if connection else 0
+    card_time = clock.slept if clock else 0.0
+    slept = device.write_timer.slept if device else 0.0
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in steps:
+        pass
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "apdus": (connection.apdus - apdus) if connection else 0,
+        "wall_s": round(wall, 4),
+        "sleep_s": round(device.write_timer.slept - slept, 4) if device else 0.0,
+        "card_s": round(clock.slept - card_time, 4) if clock else 0.0,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def profile_from_trace(filename, write_cycle=PROFILES["usb-ccid"]["write_cycle"]):
+    """Reader timing from a recorded trace: the median APDU latency of its reads"""
+    tracer = ApduTracer()
+    for entry in load_trace(filename):
+        tracer.record(entry["apdu"], entry["response"], entry["sw1"], entry["sw2"],
+                      entry["ms"] / 1000, entry.get("reader"), entry.get("op"))
+    reads = tracer.histograms.get(("op", "read"))
+    if reads is None:
+        raise ValueError(f"{filename} holds no reads to take the latency from")
+    return {"latency": reads.percentile(0.5), "byte_latency": 0.0, "write_cycle": write_cycle}
+
+
+def check(results, baselines):
+    """Return the regressions of results against baselines as text lines"""
+    regressions = []
+    for name, metrics in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        for metric, tolerance in TOLERANCES.items():
+            allowed = baseline[metric] * tolerance + SLACK.get(metric, 0)
+            if metrics[metric] > allowed:
+                regressions.append(f"{name}: {metric} {metrics[metric]} > baseline {baseline[metric]}")
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark dump, clone, sector write and compare")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="usb-ccid", help="Reader timing")
+    parser.add_argument("--profile-from-trace", metavar="FILE", help="Take reader latency from an APDU trace")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="Run only these cases")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baselines")
+    parser.add_argument("--check", action="store_true", help="Fail if a result regressed from its baseline")
+    parser.add_argument("--baselines", default=BASELINE_FILE)
+    args = parser.parse_args(argv)
+
+    if args.profile_from_trace:
+        profile, timing = "trace", profile_from_trace(args.profile_from_trace)
+    else:
+        profile, timing = args.profile, PROFILES[args.profile]
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # Keep reader profiles and stores out of the working tree
+        try:
+            for name in args.case or CASES:
+                results[name] = run_case(CASES[name], timing, workdir)
+        finally:
+            os.chdir(cwd)
+
+    print(f"Reader timing '{profile}': {timing}")
+    print(f"{'case':<22} {'APDUs':>6} {'wall s':>8} {'sleep s':>8} {'card s':>8} {'peak KB':>8}")
+    for name, metrics in results.items():
+        print(f"{name:<22} {metrics['apdus']:6d} {metrics['wall_s']:8.3f} {metrics['sleep_s']:8.3f} "
+              f"{metrics['card_s']:8.3f} {metrics['peak_kb']:8.1f}")
+
+    try:
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    if args.save:
+        baselines.setdefault(profile, {}).update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baselines to {args.baselines}")
+
+    if args.check:
+        regressions = check(results, baselines.get(profile, {}))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
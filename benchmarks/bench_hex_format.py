@@ -0,0 +1,85 @@
+"""Benchmark the hex formatter against the old per-byte formatter.
+
+Two cases are timed for images of several sizes:
+
+- export: the full hex/ASCII text of the image written to a file
+- viewer open: the text needed to show the first screen of HexView
+
+    python benchmarks/bench_hex_format.py --sizes 8192 524288
+"""
+import io
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hex_format import format_hex_dump, iter_rows, write_hex_dump  # noqa: E402
+from hex_view import BUFFER_ROWS  # noqa: E402
+
+SIZES = (8 * 1024, 64 * 1024, 512 * 1024)
+SCREEN_ROWS = 40  # Rows visible in a freshly opened viewer
+
+
+def legacy_format_hex_dump(data, bytes_per_line=16):
+    """The per-byte formatter the apps used before hex_format"""
+    result = []
+    ascii_chars = []
+
+    for i, byte in enumerate(data):
+        if i % bytes_per_line == 0:
+            if i != 0:
+                result.append("  " + "".join(ascii_chars))
+                ascii_chars = []
+            result.append(f"\n{i:04X}: ")
+
+        result.append(f"{byte:02X} ")
+        ascii_chars.append(chr(byte) if 32 <= byte <= 126 else ".")
+
+    if ascii_chars:
+        padding = bytes_per_line - len(ascii_chars)
+        result.append("   " * padding)
+        result.append("  " + "".join(ascii_chars))
+
+    return "".join(result)
+
+
+def best(function, repeat):
+    """Best time of repeat runs, in milliseconds"""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def bench(size, repeat):
+    data = os.urandom(size)
+    results = []
+
+    # Export: the old path built the whole string, then wrote it
+    results.append(("export", best(lambda: io.StringIO().write(legacy_format_hex_dump(data)), repeat),
+                    best(lambda: write_hex_dump(data, io.StringIO()), repeat)))
+    # Viewer open: the old viewer formatted the whole image into its text widget,
+    # HexView formats only the first screen plus buffer rows
+    results.append(("viewer open", best(lambda: legacy_format_hex_dump(data), repeat),
+                    best(lambda: list(iter_rows(data, end_row=SCREEN_ROWS + BUFFER_ROWS)), repeat)))
+    # Same output size, old vs new formatter
+    results.append(("format all", best(lambda: legacy_format_hex_dump(data), repeat),
+                    best(lambda: format_hex_dump(data), repeat)))
+    return results
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark hex dump export and viewer open")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Image sizes in bytes")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>8}  {'case':<12} {'old ms':>9} {'new ms':>9} {'speed-up':>9}")
+    for size in args.sizes:
+        for case, old, new in bench(size, args.repeat):
+            print(f"{size:>8}  {case:<12} {old:9.2f} {new:9.2f} {old / new:8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
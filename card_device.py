@@ -0,0 +1,1333 @@
+"""GUI-free device layer shared by the AT24C64 and smart card applications.
+
+The Tk front-ends (at24c64_app.py, smart_card_app.py) only collect input and
+display results; every reader and card operation lives here so it can also be
+driven from scripts, e.g.:
+
+    python card_device.py dump
+    python card_device.py clone at24c64_dump_20241209_235401.bin
+    python card_device.py clone latest
+"""
+import datetime
+import logging
+import os
+from smartcard.System import readers
+from smartcard.CardConnection import CardConnection
+from smartcard.Exceptions import CardConnectionException
+from atr_database import identify_atr
+from card_timing import RETRY_SW1, ReaderProfile, WriteTimer
+from card_dump import CardDump
+from card_drivers import DEFAULT_SLE, DRIVERS, EEPROM, EEPROM_TYPES, PROTECTION_BITS_32, SLE, get_driver
+from card_emulator import simulated_reader
+from card_image import MemoryImage
+from card_trace import ApduTracer
+from dump_store import DumpStore, STORE_FILE
+from hex_format import hex_bytes
+
+
+class CardError(Exception):
+    """Raised when no reader/card is available or the card rejects an APDU.
+
+    sw1/sw2 hold the status word when the error comes from one.
+    """
+
+    def __init__(self, message, sw1=None, sw2=None):
+        super().__init__(message)
+        self.sw1 = sw1
+        self.sw2 = sw2
+
+    @property
+    def length_rejected(self):
+        """True when the reader refused the APDU's Le/Lc (67xx wrong length, 6Cxx wrong Le)"""
+        return self.sw1 in (0x67, 0x6C)
+
+
+def length_rejected(error):
+    """True when a read error means the reader refused the length.
+
+    Besides a 67xx/6Cxx status word, readers and drivers that cannot carry
+    an extended APDU fail the transmit itself with CardConnectionException.
+    """
+    return isinstance(error, CardConnectionException) or error.length_rejected
+
+
+def identify_card(atr):
+    """Return the card type name for an ATR, or None if it is not known"""
+    entry = identify_atr(atr)
+    return entry.card_type if entry else None
+
+
+def list_readers():
+    """Return the PC/SC readers attached to this host"""
+    return readers()
+
+
+class CardDevice:
+    """Connection to a card in one reader"""
+
+    WRITE_TIMEOUT = 0.1  # Longest write cycle we poll for before giving up
+    ADDRESS_BITS = 8
+
+    def __init__(self, reader=None, log=None):
+        self.reader = reader
+        self.connection = None
+        self.driver = None  # CardDriver with the memory geometry of the card
+        self.log = log or logging.info
+        self.profile = None
+        self.write_timer = WriteTimer(timeout=self.WRITE_TIMEOUT)
+        self.tracer = None  # ApduTracer recording every APDU, if tracing is on
+
+    @property
+    def connected(self):
+        return self.connection is not None
+
+    def connect(self, protocol=None):
+        """Connect to the card in the reader (first reader if none given) and return its ATR"""
+        if self.reader is None:
+            reader_list = readers()
+            if not reader_list:
+                raise CardError("No smart card readers found")
+            self.reader = reader_list[0]
+
+        self.refresh()
+        connection = self.reader.createConnection()
+        if protocol is None:
+            connection.connect()
+        else:
+            connection.connect(protocol)
+        self.connection = connection
+        atr = self.connection.getATR()
+        self.select_driver(atr)
+
+        # Timing learned for this reader/card pair in earlier sessions,
+        # starting from the card's nominal write cycle
+        self.profile = ReaderProfile.load(self.reader, atr)
+        self.write_timer = WriteTimer(self.profile, initial_delay=self.driver.write_cycle if self.driver else 0.0,
+                                      timeout=self.WRITE_TIMEOUT)
+        return atr
+
+    def select_driver(self, atr):
+        """Pick the driver for the card that answered with atr"""
+
+    def disconnect(self):
+        self.refresh()
+        if self.connection:
+            self.save_profile()
+            try:
+                self.connection.disconnect()
+            finally:
+                self.connection = None
+
+    def refresh(self):
+        """Forget everything cached from the card so the next reads go to the card"""
+
+    def save_profile(self):
+        """Persist the timing learned for this reader/card pair"""
+        if self.profile:
+            try:
+                self.profile.save()
+            except OSError as e:
+                self.log(f"Could not save reader profile: {str(e)}")
+
+    def get_atr(self):
+        self.require_connection()
+        return self.connection.getATR()
+
+    def require_connection(self):
+        if not self.connection:
+            raise CardError("Please connect to card first")
+
+    def address_bytes(self, address):
+        """Split a memory address into the (P1, P2) bytes of an APDU"""
+        if not 0 <= address < (1 << self.ADDRESS_BITS):
+            raise ValueError(f"Address {address} is outside the {self.ADDRESS_BITS}-bit address space")
+        return (address >> 8) & 0xFF, address & 0xFF
+
+    def transmit(self, apdu, op=None):
+        """Send an APDU and return (response, sw1, sw2).
+
+        op names the command class for the tracer when the INS byte alone
+        does not tell (e.g. "verify" for a read-back).
+        """
+        self.require_connection()
+        if self.tracer is None:
+            return self.connection.transmit(apdu)
+        return self.tracer.transmit(self.connection.transmit, apdu, self.reader, op)
+
+    def transmit_checked(self, apdu, what):
+        """Send an APDU and return the response, raising CardError unless SW1 is 0x90"""
+        response, sw1, sw2 = self.transmit(apdu)
+        if sw1 != 0x90:
+            raise CardError(f"{what} failed: SW1={hex(sw1)}, SW2={hex(sw2)}", sw1, sw2)
+        return response
+
+
+class AT24C64Device(CardDevice):
+    """AT24C64 (or larger 24Cxx) I²C EEPROM accessed through a PC/SC memory card reader.
+
+    The geometry comes from the EEPROM's CardDriver; the class constants
+    below are the AT24C64 defaults.
+    """
+
+    CARD_TYPE = "AT24C64"
+    PAGE_SIZE = 32  # AT24C64 has 32-byte page size
+    TOTAL_SIZE = 8192  # 8KB total memory
+    PAGES = TOTAL_SIZE // PAGE_SIZE  # 256 pages
+    ADDRESS_BITS = 13  # 8KB needs 13 address bits, split over P1 (high) and P2 (low)
+
+    # Read sizes tried by the large-read mode, biggest first: the whole chip
+    # with an extended Le, the short-APDU maximum (Le=0x00), and 255 bytes for
+    # readers that reject Le=0x00. A single page is the fallback.
+    READ_CHUNK_SIZES = (TOTAL_SIZE, 256, 255)
+    READ_RETRIES = 3  # Attempts per block after a transient read error
+
+    # Write sizes a reader may accept in one APDU, biggest first. All of them
+    # divide the page size, so chunks never cross a page boundary.
+    WRITE_CHUNK_SIZES = (32, 16, 8, 4)
+    WRITE_INS = 0xD0  # The write command used by every write path
+
+    def __init__(self, reader=None, log=None, driver=None):
+        super().__init__(reader, log)
+        self.large_reads = True
+        self.use_driver(driver or get_driver(self.CARD_TYPE))
+
+    def use_driver(self, driver):
+        """Take the geometry of an EEPROM type (AT24C64, 24C128, 24C256, 24C512)"""
+        if driver.family != EEPROM:
+            raise ValueError(f"{driver.name} is not an I²C EEPROM")
+        self.driver = driver
+        self.CARD_TYPE = driver.name
+        self.PAGE_SIZE = driver.page_size
+        self.TOTAL_SIZE = driver.memory_size
+        self.PAGES = driver.pages
+        self.ADDRESS_BITS = driver.address_bits
+        self.READ_CHUNK_SIZES = tuple(sorted({driver.read_chunk, 256, 255}, reverse=True))
+        # Halving the page size keeps every chunk inside a page
+        self.WRITE_CHUNK_SIZES = tuple(driver.write_chunk >> shift for shift in range(8)
+                                       if driver.write_chunk >> shift >= 4)
+        self.read_chunk = None  # Probed on first bulk read
+        self.write_chunk = min(self.WRITE_CHUNK_SIZES)
+        self.image = MemoryImage(self.TOTAL_SIZE)
+
+    def refresh(self):
+        self.image.invalidate()
+
+    def connect(self, protocol=CardConnection.T0_protocol):
+        # Connect with T0 protocol since that's what the card supports
+        atr = super().connect(protocol)
+        self.read_chunk = None
+        self.log("Connected using protocol T0")
+
+        # Reuse the write size learned for this reader/card pair, or probe it
+        write_chunk = self.profile.get(self.write_chunk_key)
+        if write_chunk in self.WRITE_CHUNK_SIZES:
+            self.write_chunk = write_chunk
+        else:
+            self.probe_write_chunk()
+        self.log(f"Using {self.write_chunk}-byte writes")
+        return atr
+
+    @property
+    def write_chunk_key(self):
+        """Profile entry of the write size; EEPROM types share one ATR, so it is per type"""
+        return "write_chunk" if self.CARD_TYPE == AT24C64Device.CARD_TYPE else f"write_chunk_{self.CARD_TYPE}"
+
+    def set_write_chunk(self, size):
+        """Override the write size for this reader and remember it"""
+        if size not in self.WRITE_CHUNK_SIZES:
+            raise ValueError(f"Write chunk must be one of {', '.join(map(str, self.WRITE_CHUNK_SIZES))} bytes")
+        self.write_chunk = size
+        if self.profile:
+            self.profile.set(self.write_chunk_key, size)
+            self.save_profile()
+
+    def probe_write_chunk(self):
+        """Find the largest write the reader accepts and remember it.
+
+        Each candidate rewrites the last page with the bytes it already
+        holds, so probing leaves the card contents unchanged.
+        """
+        address = self.TOTAL_SIZE - self.PAGE_SIZE
+        self.write_chunk = min(self.WRITE_CHUNK_SIZES)
+        try:
+            current = self.read_block(address, self.PAGE_SIZE)
+        except CardError as e:
+            self.log(f"Could not probe write size: {str(e)}")
+            return self.write_chunk
+
+        for size in self.WRITE_CHUNK_SIZES:
+            write_cmd = self.write_command(self.WRITE_INS, address, current[:size])
+            response, sw1, sw2 = self.write_timer.transmit_until_ok(self.transmit, write_cmd, settle=False)
+            if sw1 == 0x90:
+                self.write_chunk = size
+                break
+
+        if self.profile:
+            self.profile.set(self.write_chunk_key, self.write_chunk)
+        return self.write_chunk
+
+    def verify_at24c64(self, atr):
+        """Return False if the ATR names a card that is not an I²C EEPROM.
+
+        Unknown ATRs pass: the EEPROM ATR differs between readers.
+        """
+        card_type = identify_card(atr)
+        return card_type is None or card_type in EEPROM_TYPES
+
+    def check_page(self, page):
+        if not 0 <= page < self.PAGES:
+            raise ValueError(f"Page number must be between 0 and {self.PAGES-1}")
+
+    def read_command(self, address, length):
+        """Build a READ APDU; lengths above 256 use an extended Le"""
+        p1, p2 = self.address_bytes(address)
+        if length > 256:
+            return [0xFF, 0xB0, p1, p2, 0x00, (length >> 8) & 0xFF, length & 0xFF]
+        return [0xFF, 0xB0, p1, p2, length & 0xFF]  # Le=0x00 means 256
+
+    def write_command(self, ins, address, data):
+        """Build a write APDU (0xD0 or 0xD6) for data starting at address"""
+        p1, p2 = self.address_bytes(address)
+        return [0xFF, ins, p1, p2, len(data)] + list(data)
+
+    def read_block(self, address, length):
+        """Read length bytes starting at address in a single APDU"""
+        response = self.transmit_checked(self.read_command(address, length),
+                                         f"Read of {length} bytes at {hex(address)}")
+        if len(response) != length:
+            raise CardError(f"Short read at {hex(address)}: expected {length} bytes, got {len(response)}")
+        return list(response)
+
+    def read_block_retrying(self, address, length):
+        """read_block, retried up to READ_RETRIES times after transient errors.
+
+        A length rejection is raised at once: retrying the same Le cannot help.
+        """
+        for attempt in range(self.READ_RETRIES + 1):
+            try:
+                return self.read_block(address, length)
+            except CardError as e:
+                if e.length_rejected or attempt == self.READ_RETRIES:
+                    raise
+                self.log(f"{e} - retrying ({attempt + 1}/{self.READ_RETRIES})")
+
+    def probe_read_chunk(self):
+        """Find the largest read the reader accepts and remember it.
+
+        Returns the bytes read from address 0 by the successful probe so the
+        caller does not have to read them again. A transmit that fails below
+        PC/SC counts as the size being rejected.
+        """
+        data = []
+        for size in self.READ_CHUNK_SIZES:
+            try:
+                data = self.read_block_retrying(0, size)
+            except (CardError, CardConnectionException) as e:
+                self.log(f"{size}-byte reads rejected: {str(e)}")
+                continue
+            self.read_chunk = size
+            break
+        else:
+            self.read_chunk = self.PAGE_SIZE
+        self.log(f"Using {self.read_chunk}-byte reads")
+        return data
+
+    def read_page(self, page, refresh=False):
+        """Read one page, from the session image when it is known"""
+        self.check_page(page)
+        address = page * self.PAGE_SIZE
+        data = None if refresh else self.image.get(address, self.PAGE_SIZE)
+        if data is None:
+            data = self.read_block(address, self.PAGE_SIZE)
+            self.image.store(address, data)
+        return list(data)
+
+    def write_block(self, address, data, settle=True):
+        """Write data starting at address in chunks of the reader's write size.
+
+        Chunks are aligned so none crosses a page boundary (the EEPROM would
+        wrap inside the page). Each chunk ACK-polls until the previous write
+        cycle has finished; pass settle=False when the card is known idle.
+        """
+        self.image.invalidate(address, len(data))
+        offset = 0
+        while offset < len(data):
+            addr = address + offset
+            length = min(self.write_chunk - addr % self.write_chunk, len(data) - offset)
+            write_cmd = self.write_command(self.WRITE_INS, addr, data[offset:offset + length])
+            response, sw1, sw2 = self.write_timer.transmit_until_ok(self.transmit, write_cmd, settle)
+            if sw1 != 0x90:
+                raise CardError(f"Write failed at address {hex(addr)}: SW1={hex(sw1)}, SW2={hex(sw2)}")
+            offset += length
+            settle = True
+
+    def wait_ready(self, address=0):
+        """Poll with a 1-byte read until the last write cycle has finished"""
+        read_cmd = self.read_command(address, 1)
+
+        def ready():
+            sw1 = self.transmit(read_cmd, "poll")[1]
+            if sw1 == 0x90:
+                return True
+            return False if sw1 in RETRY_SW1 else None
+
+        return self.write_timer.wait_until(ready)
+
+    def write_page(self, page, data):
+        """Write up to one page of data, without verification"""
+        self.check_page(page)
+        if len(data) > self.PAGE_SIZE:
+            raise ValueError(f"Data exceeds page size ({self.PAGE_SIZE} bytes)")
+        self.write_block(page * self.PAGE_SIZE, data)
+        self.wait_ready(page * self.PAGE_SIZE)
+
+    def read_all(self, progress=None, refresh=False):
+        """Read the whole EEPROM and return it as bytes.
+
+        A complete session image is returned without touching the card
+        unless refresh is set.
+        """
+        if not refresh and self.image.complete:
+            self.log("Using memory image read earlier in this session")
+            if progress:
+                progress(self.PAGES, self.PAGES)
+            return self.image.get(0, self.TOTAL_SIZE)
+
+        data = bytearray()
+        chunk = self.PAGE_SIZE
+        if self.large_reads:
+            if self.read_chunk is None:
+                data.extend(self.probe_read_chunk())
+            chunk = self.read_chunk
+
+        while len(data) < self.TOTAL_SIZE:
+            address = len(data)
+            length = min(chunk, self.TOTAL_SIZE - address)
+            try:
+                data.extend(self.read_block_retrying(address, length))
+            except (CardError, CardConnectionException) as e:
+                if chunk == self.PAGE_SIZE or not length_rejected(e):
+                    raise
+                # The reader refused the large read; finish page by page
+                self.log(f"{e} - falling back to {self.PAGE_SIZE}-byte reads")
+                chunk = self.read_chunk = self.PAGE_SIZE
+                data = data[:address - address % self.PAGE_SIZE]
+                continue
+
+            page = len(data) // self.PAGE_SIZE - 1
+            if chunk != self.PAGE_SIZE or page % 16 == 0:
+                self.log(f"Read page {page}/{self.PAGES-1}")
+            if progress:
+                progress(len(data) // self.PAGE_SIZE, self.PAGES)
+        self.image.store(0, data)
+        return bytes(data)
+
+    def dump(self, store, progress=None, refresh=False):
+        """Read the whole EEPROM into the dump store and return its DumpRecord"""
+        self.log("Starting full memory read...")
+        data = self.read_all(progress, refresh)
+        record = store.put(data, reader=str(self.reader), atr=hex_bytes(self.get_atr()),
+                           card_type=self.CARD_TYPE, page_size=self.PAGE_SIZE)
+        self.log(f"Full memory dump saved as {record.label}")
+        return record
+
+    def verify_page(self, page, data):
+        """Return True if the page currently holds data"""
+        return self.read_page(page) == list(data)
+
+    def verify(self, data, progress=None, refresh=False):
+        """Compare the card against a memory image and return the differing pages"""
+        return self.changed_pages(self.read_all(progress, refresh), data)
+
+    def write_binary(self, data, start_page=0, progress=None):
+        """Write a binary image page by page starting at start_page"""
+        if len(data) > self.TOTAL_SIZE:
+            raise ValueError(f"File size ({len(data)} bytes) exceeds card capacity ({self.TOTAL_SIZE} bytes)")
+        self.check_page(start_page)
+
+        required_pages = (len(data) + self.PAGE_SIZE - 1) // self.PAGE_SIZE
+        if start_page + required_pages > self.PAGES:
+            raise ValueError("File too large for selected start page")
+
+        for i in range(required_pages):
+            page = start_page + i
+            offset = i * self.PAGE_SIZE
+            page_data = data[offset:offset + self.PAGE_SIZE]
+
+            # Pad last page if needed
+            if len(page_data) < self.PAGE_SIZE:
+                page_data = page_data + bytes([0xFF] * (self.PAGE_SIZE - len(page_data)))
+
+            try:
+                self.write_block(page * self.PAGE_SIZE, page_data, settle=i > 0)
+            except CardError as e:
+                raise CardError(f"Write failed at page {page}: {str(e)}")
+
+            if progress:
+                progress(i + 1, required_pages)
+
+        self.wait_ready(start_page * self.PAGE_SIZE)
+        self.save_profile()
+
+    def write_page_data(self, page, data, max_retries=3):
+        """Write a single page with verification and retry"""
+        # Calculate base address for this page
+        base_addr = page * self.PAGE_SIZE
+        verify_cmd = self.read_command(base_addr, self.PAGE_SIZE)
+
+        def written():
+            response, sw1, sw2 = self.transmit(verify_cmd, "verify")
+            return sw1 == 0x90 and list(response) == list(data)
+
+        for attempt in range(max_retries):
+            try:
+                # The previous page was verified by reading it back, so the card is idle
+                self.write_block(base_addr, data, settle=False)
+
+                # Poll the page until it reads back as written
+                if not self.write_timer.wait_until(written):
+                    if attempt < max_retries - 1:
+                        self.log(f"Verification failed on page {page}, attempt {attempt + 1}/{max_retries}")
+                        continue
+                    raise CardError("Verification failed: Written data doesn't match")
+
+                self.image.store(base_addr, data)
+                return True
+
+            except Exception as e:
+                if attempt < max_retries - 1:
+                    self.log(f"Retry {attempt + 1}/{max_retries} for page {page}: {str(e)}")
+                    continue
+                self.log(f"Write error at page {page}: {str(e)}")
+                return False
+
+        return False
+
+    def changed_pages(self, current, data):
+        """Return the pages where the current card image differs from data"""
+        return [page for page in range(self.PAGES)
+                if current[page * self.PAGE_SIZE:(page + 1) * self.PAGE_SIZE]
+                != data[page * self.PAGE_SIZE:(page + 1) * self.PAGE_SIZE]]
+
+    def clone(self, data, progress=None, delta=False):
+        """Write a full memory image to the card.
+
+        With delta=True the card is bulk-read first and only the pages that
+        differ from data are written and verified.
+        """
+        if len(data) != self.TOTAL_SIZE:
+            raise ValueError(f"Invalid dump size. Expected {self.TOTAL_SIZE} bytes, got {len(data)} bytes.")
+
+        pages = range(self.PAGES)
+        if delta:
+            self.log("Reading target card for delta clone...")
+            pages = self.changed_pages(self.read_all(progress), data)
+            self.log(f"{len(pages)} pages differ, skipping {self.PAGES - len(pages)} unchanged pages")
+
+        result = CloneResult(written_pages=list(pages), skipped_pages=self.PAGES - len(pages))
+        retry_pages = []
+
+        for index, page in enumerate(pages):
+            offset = page * self.PAGE_SIZE
+            page_data = data[offset:offset + self.PAGE_SIZE]
+
+            # Try to write the page
+            if not self.write_page_data(page, page_data):
+                retry_pages.append(page)
+
+            if progress:
+                progress(index + 1, len(pages))
+
+        # Retry failed pages with more retries
+        if retry_pages:
+            self.log(f"Retrying {len(retry_pages)} failed pages...")
+            for page in retry_pages:
+                offset = page * self.PAGE_SIZE
+                page_data = data[offset:offset + self.PAGE_SIZE]
+                if not self.write_page_data(page, page_data, max_retries=5):
+                    result.failed_pages.append(page)
+
+        self.save_profile()
+        return result
+
+    def clone_file(self, filename, progress=None, delta=False):
+        """Clone a dump file onto the card"""
+        with open(filename, "rb") as f:
+            data = f.read()
+        return self.clone(data, progress, delta)
+
+
+class CloneResult:
+    """Outcome of AT24C64Device.clone"""
+
+    def __init__(self, written_pages=None, skipped_pages=0, failed_pages=None):
+        self.written_pages = written_pages or []
+        self.skipped_pages = skipped_pages
+        self.failed_pages = failed_pages or []
+
+    @property
+    def ok(self):
+        return not self.failed_pages
+
+    def summary(self):
+        text = f"{len(self.written_pages)} pages written, {self.skipped_pages} unchanged pages skipped"
+        if self.failed_pages:
+            text += f", failed pages: {', '.join(str(p) for p in self.failed_pages)}"
+        return text
+
+
+class ImagePlan:
+    """Bytes an image write has to change on an SLE card.
+
+    changed are the addresses to write, locked the protected addresses whose
+    contents differ from the image and so cannot be written, runs the
+    (offset, length) writes that cover the changes.
+    """
+
+    def __init__(self, data, current, protected, runs, write_chunk=255, psc_needed=True):
+        self.data = data
+        self.current = current
+        self.runs = runs
+        self.changed = [a for a, value in enumerate(data) if value != current[a] and a not in protected]
+        self.locked = [a for a, value in enumerate(data) if value != current[a] and a in protected]
+        self.unchanged = len(data) - len(self.changed) - len(self.locked)
+        self.psc_needed = psc_needed and bool(runs)
+        self.write_apdus = sum((length + write_chunk - 1) // write_chunk for _, length in runs)
+
+    def summary(self):
+        text = (f"{len(self.changed)} bytes to change in {len(self.runs)} runs ({self.write_apdus} write APDUs), "
+                f"{self.unchanged} unchanged")
+        if self.locked:
+            text += f", {len(self.locked)} protected bytes differ and cannot be written"
+        if self.psc_needed:
+            text += ", PSC required"
+        return text
+
+
+class ImageWriteResult:
+    """Outcome of SmartCardDevice.write_image, byte by byte"""
+
+    SAME, WRITTEN, LOCKED, FAILED = ".", "W", "L", "X"
+
+    def __init__(self, plan, failed=()):
+        self.plan = plan
+        self.status = [self.SAME] * len(plan.data)
+        for address in plan.changed:
+            self.status[address] = self.WRITTEN
+        for address in plan.locked:
+            self.status[address] = self.LOCKED
+        for address in failed:
+            if self.status[address] != self.LOCKED:
+                self.status[address] = self.FAILED
+
+    @property
+    def failed(self):
+        return [address for address, status in enumerate(self.status) if status == self.FAILED]
+
+    @property
+    def ok(self):
+        return not self.failed and not self.plan.locked
+
+    def summary(self):
+        counts = {status: self.status.count(status) for status in (self.WRITTEN, self.SAME, self.LOCKED, self.FAILED)}
+        text = (f"{counts[self.WRITTEN]} bytes written, {counts[self.SAME]} unchanged, "
+                f"{counts[self.LOCKED]} locked")
+        if counts[self.FAILED]:
+            text += f", failed at: {', '.join(hex(address) for address in self.failed)}"
+        return text
+
+    def result_map(self, bytes_per_row=16):
+        """One line per row of bytes: . unchanged, W written, L locked, X failed"""
+        width = max(4, len(f"{len(self.status) - 1:X}"))
+        return "\n".join(f"{offset:0{width}X}: {''.join(self.status[offset:offset + bytes_per_row])}"
+                         for offset in range(0, len(self.status), bytes_per_row))
+
+
+class SmartCardDevice(CardDevice):
+    """SLE44xx/SLE55xx memory card accessed through a PC/SC reader.
+
+    The geometry comes from the CardDriver of the card type identified from
+    the ATR on connect; the class constants below are the SLE4442 defaults.
+    """
+
+    TOTAL_SECTORS = 16
+    BYTES_PER_SECTOR = 16
+
+    WRITE_COMMANDS = {
+        "WRITE (0xD0)": 0xD0,
+        "PROGRAM (0xFE)": 0xFE,
+        "WRITE PROTECTION (0xD1)": 0xD1,
+        "WRITE ALL (0xDE)": 0xDE,
+        "UPDATE (0xF0)": 0xF0
+    }
+
+
+    PROTECTION_READ_SIZE = 4
+    SECURITY_SIZE = 4
+    MERGE_GAP = 2  # Unchanged bytes rewritten to join two runs into one APDU
+
+    def __init__(self, reader=None, log=None, pin_file="default_pins.txt", driver=None):
+        super().__init__(reader, log)
+        self.pin_file = pin_file
+        self.fixed_driver = driver is not None  # An explicit card type wins over the ATR
+        self.use_driver(driver or get_driver(DEFAULT_SLE))
+
+    def use_driver(self, driver):
+        """Take the geometry of an SLE card type"""
+        if driver.family != SLE:
+            raise ValueError(f"{driver.name} is not an SLE memory card")
+        self.driver = driver
+        self.TOTAL_SECTORS = driver.pages
+        self.BYTES_PER_SECTOR = driver.page_size
+        self.ADDRESS_BITS = driver.address_bits
+        self.PROTECTION_READ_SIZE = driver.protection_size
+        self.SECURITY_SIZE = driver.psc_length + 1 if driver.psc_length else 0  # Error counter + PSC
+        self.read_chunk = driver.read_chunk
+        self.write_chunk = driver.write_chunk
+        # Session images of main, protection and security memory
+        self.image = MemoryImage(driver.memory_size)
+        self.protection = None
+        self.security = None
+        self.pin_verified = False
+
+    def select_driver(self, atr):
+        if self.fixed_driver:
+            return
+        card_type = identify_card(atr)
+        driver = DRIVERS.get(card_type)
+        if driver is None or driver.family != SLE:
+            self.log(f"No driver for card type {card_type or 'Unknown'}, assuming {self.driver.name}")
+        elif driver is not self.driver:
+            self.use_driver(driver)
+
+    def refresh(self):
+        self.image.invalidate()
+        self.protection = None
+        self.security = None
+        self.pin_verified = False
+
+    def detect_reader(self):
+        """Pick the first attached reader and return it (None if there is none)"""
+        reader_list = readers()
+        self.reader = reader_list[0] if reader_list else None
+        return self.reader
+
+    def check_sector(self, sector):
+        if not 0 <= sector < self.TOTAL_SECTORS:
+            raise ValueError(f"Sector must be between 0 and {self.TOTAL_SECTORS-1}")
+
+    def get_card_type(self):
+        """Get the card type by reading its ATR"""
+        try:
+            if not self.connection:
+                return "No card connected"
+
+            atr = self.connection.getATR()
+            entry = identify_atr(atr)
+            atr = hex_bytes(atr)
+            if entry and entry.card_type:
+                return f"{entry.card_type} (ATR: {atr})"
+            if entry:
+                return f"Unknown card type: {entry.description} (ATR: {atr})"
+
+            return f"Unknown card type (ATR: {atr})"
+        except Exception as e:
+            return f"Error reading card type: {str(e)}"
+
+    def get_card_uid(self):
+        """Get the card's UID if available"""
+        try:
+            if not self.connection:
+                return "No card connected"
+
+            # Try to read UID using different commands for different card types
+            # GET DATA command for ISO cards
+            COMMANDS = [
+                [0xFF, 0xCA, 0x00, 0x00, 0x00],  # Standard GET DATA
+                [0xFF, 0xB0, 0x00, 0x00, 0x08],  # Read first 8 bytes
+                [0xFF, 0x36, 0x00, 0x00, 0x08]   # Alternative command
+            ]
+
+            # The first 8 bytes may already be known from an earlier read
+            cached = self.image.get(0, 8)
+
+            for cmd in COMMANDS:
+                if cmd[1] == 0xB0 and cached is not None:
+                    return f"Card UID: {hex_bytes(cached)}"
+                try:
+                    response, sw1, sw2 = self.transmit(cmd)
+                    if sw1 == 0x90 and len(response) > 0:
+                        return f"Card UID: {hex_bytes(response)}"
+                except:
+                    continue
+
+            return "UID not available for this card type"
+        except Exception as e:
+            return f"Error reading UID: {str(e)}"
+
+    def read_sector(self, sector, refresh=False):
+        """Read one sector and return its bytes, from the session image when known"""
+        self.check_sector(sector)
+        address = sector * self.BYTES_PER_SECTOR
+        cached = None if refresh else self.image.get(address, self.BYTES_PER_SECTOR)
+        if cached is not None:
+            return list(cached)
+
+        p1, p2 = self.address_bytes(address)
+        APDU = [0xFF, 0xB0, p1, p2, self.BYTES_PER_SECTOR]
+        response, sw1, sw2 = self.transmit(APDU)
+        if sw1 == 0x90 and sw2 == 0x00 and len(response) == self.BYTES_PER_SECTOR:
+            self.image.store(address, response)
+            return list(response)
+        raise CardError(f"Read Error: SW1={hex(sw1)}, SW2={hex(sw2)}")
+
+    def read_sector_data(self, sector):
+        """Read one sector as a hex string (or an error description)"""
+        try:
+            return hex_bytes(self.read_sector(sector))
+        except CardError as e:
+            return str(e)
+        except Exception as e:
+            return f"Error reading sector: {str(e)}"
+
+    def read_protection_memory(self, refresh=False):
+        """Return the protection memory bytes (a bit of 0 protects a byte)"""
+        return self.protection_memory(refresh)
+
+    def read_security_memory(self, refresh=False):
+        """Return the security memory (error counter and PSC), read from the card once per connection"""
+        if not self.SECURITY_SIZE:
+            return []
+        if self.security is None or refresh:
+            command = [0xFF, 0xB1, 0x00, 0x00, self.SECURITY_SIZE]
+            self.security = list(self.transmit_checked(command, "Read security memory"))
+        return list(self.security)
+
+    def sector_protection(self, protection=None):
+        """Split the sectors into (protected, unprotected) lists.
+
+        A sector counts as protected when any of its bytes is.
+        """
+        if protection is None:
+            protection = self.read_protection_memory()
+        protected = {address // self.BYTES_PER_SECTOR for address in self.driver.protected_addresses(protection)}
+
+        protected_sectors = []
+        unprotected_sectors = []
+        for sector in range(self.TOTAL_SECTORS):
+            if sector in protected:
+                protected_sectors.append(sector)
+            else:
+                unprotected_sectors.append(sector)
+        return protected_sectors, unprotected_sectors
+
+    def protection_memory(self, refresh=False):
+        """Return the protection memory, read from the card once per connection"""
+        if not self.PROTECTION_READ_SIZE:
+            return []
+        if self.protection is None or refresh:
+            command = [0xFF, 0xB2, 0x00, 0x00, self.PROTECTION_READ_SIZE]
+            self.protection = list(self.transmit_checked(command, "Read protection memory"))
+        return list(self.protection)
+
+    def protected_addresses(self):
+        """Main memory addresses that can no longer be written"""
+        return self.driver.protected_addresses(self.protection_memory())
+
+    def is_sector_protected(self, sector):
+        """Return whether any byte of a sector is protected, or None if it cannot be read"""
+        try:
+            protected = self.protected_addresses()
+        except CardError:
+            return None
+        start = sector * self.BYTES_PER_SECTOR
+        return any(address in protected for address in range(start, start + self.BYTES_PER_SECTOR))
+
+    def read_memory(self):
+        """Fill the session image in as few reads as the reader accepts.
+
+        Starts with the driver's largest read and halves it down to one
+        sector when the reader refuses; blocks that still fail are left for
+        read_sector to report.
+        """
+        chunk = self.read_chunk
+        address = 0
+        while address < self.driver.memory_size:
+            if self.image.get(address, chunk) is not None:
+                address += chunk
+                continue
+            p1, p2 = self.address_bytes(address)
+            try:
+                response = self.transmit_checked([0xFF, 0xB0, p1, p2, chunk & 0xFF], "Read")
+            except CardError as e:
+                if chunk <= self.BYTES_PER_SECTOR:
+                    self.log(f"{e} at 0x{address:X} - skipping sector")
+                    address += chunk
+                    continue
+                chunk = self.read_chunk = chunk // 2
+                self.log(f"{e} - retrying with {chunk}-byte reads")
+                continue
+            if len(response) == chunk:
+                self.image.store(address, response)
+            address += chunk
+
+    def read_all(self, refresh=False):
+        """Read main, protection and security memory in bulk and return a CardDump"""
+        if refresh:
+            self.refresh()
+        protection, security, protected = [], [], set()
+        try:
+            protection = self.protection_memory()
+            protected = self.driver.protected_addresses(protection)
+        except CardError as e:
+            self.log(str(e))
+        try:
+            security = self.read_security_memory()
+        except CardError as e:
+            self.log(str(e))
+
+        self.read_memory()
+        data = bytearray(self.driver.memory_size)
+        unread = []
+        for sector in range(self.TOTAL_SECTORS):
+            try:
+                data[sector * self.BYTES_PER_SECTOR:(sector + 1) * self.BYTES_PER_SECTOR] = bytes(self.read_sector(sector))
+            except CardError:
+                unread.append(sector)
+
+        atr = self.get_atr()
+        return CardDump(data, protection, security, self.BYTES_PER_SECTOR,
+                        {address // self.BYTES_PER_SECTOR for address in protected}, unread,
+                        self.driver.name, hex_bytes(atr), str(self.reader))
+
+    def dump(self, directory=".", store=None, refresh=False):
+        """Read the card into a binary image with a JSON sidecar; return the CardDump.
+
+        With a DumpStore the main memory is also stored and catalogued with
+        the card's ATR and type, provided every sector could be read.
+        """
+        dump = self.read_all(refresh)
+        dump.save(directory)
+
+        if store is not None:
+            if dump.complete:
+                record = store.put(dump.data, reader=dump.reader, atr=dump.atr,
+                                   card_type=dump.card_type, page_size=self.BYTES_PER_SECTOR)
+                self.log(f"Dump catalogued as {record.label}")
+            else:
+                self.log("Some sectors could not be read; dump not added to the dump store")
+        return dump
+
+    def load_pins(self):
+        """Load PINs from the default PIN file"""
+        try:
+            pins = []
+            with open(self.pin_file, "r") as f:
+                for line in f:
+                    # Skip comments and empty lines
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        # Extract PIN from line (handle both plain PIN and PIN with comment)
+                        pin = line.split("#")[0].strip()
+                        if len(pin) == 6:  # Only add valid 6-character PINs
+                            pins.append(pin)
+            return pins
+        except Exception as e:
+            self.log(f"Error loading PINs: {str(e)}")
+            return ["FFFFFF"]  # Return default PIN if file can't be read
+
+    def present_pin(self, pin):
+        """Present the PSC (3 bytes on SLE4442, 2 on SLE4428); return True if the card accepted it"""
+        length = self.driver.psc_length or 3
+        pin_bytes = [int(pin[i:i+2], 16) for i in range(0, 2 * length, 2)]
+        APDU = [0xFF, 0x20, 0x00, 0x00, length] + pin_bytes
+        # Every attempt updates the error counter in security memory
+        self.security = None
+        response, sw1, sw2 = self.transmit(APDU)
+        self.pin_verified = sw1 == 0x90 and sw2 == 0x00
+        if self.pin_verified:
+            return True
+        self.log(f"PIN {pin} failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
+        return False
+
+    def record_verified_pin(self, pin):
+        """Append a verified PIN to the PIN file if it is not recorded yet"""
+        try:
+            with open(self.pin_file, "r") as f:
+                content = f.read()
+            if f"{pin}  # Verified on" not in content:
+                with open(self.pin_file, "a") as f:
+                    f.write(f"\n{pin}  # Verified on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        except:
+            pass  # Ignore errors in updating the file
+
+    def verify_pin(self, pins=None):
+        """Try each known PIN in turn; return the accepted PIN or None"""
+        if pins is None:
+            pins = self.load_pins()
+        self.log("Starting PIN verification...")
+
+        for pin in pins:
+            try:
+                if self.present_pin(pin):
+                    self.log(f"PIN verification successful with PIN: {pin}")
+                    self.record_verified_pin(pin)
+                    return pin
+            except Exception as e:
+                self.log(f"Error trying PIN {pin}: {str(e)}")
+
+        self.log("All PINs failed")
+        return None
+
+    def check_protection(self, address):
+        """Check if an address is write-protected"""
+        try:
+            # Protection memory is cached per connection
+            is_protected = address in self.protected_addresses()
+            self.log(f"Protection check for address {hex(address)}: {'Protected' if is_protected else 'Not protected'}")
+            return is_protected
+        except CardError as e:
+            self.log(str(e))
+            return True
+        except Exception as e:
+            self.log(f"Error checking protection: {str(e)}")
+            return True
+
+    def forget_written(self, cmd, address, length):
+        """Drop the cached bytes a write command is about to change"""
+        self.image.invalidate(address, length)  # 0xD1 on an SLE4428 also writes the data it protects
+
+    def record_protected(self, address, values, current=None):
+        """Clear the cached protection bits of the bytes a 0xD1 write protected.
+
+        SLE4428 protects every byte it writes; SLE4442 only the bytes already
+        holding the value sent, so without their contents the cache is dropped.
+        """
+        if self.protection is None:
+            return
+        compares = self.driver.protection == PROTECTION_BITS_32
+        if compares and current is None:
+            self.protection = None
+            return
+        for offset, value in enumerate(values):
+            if compares and current[offset] != value:
+                continue
+            byte, bit = divmod(address + offset, 8)
+            if byte < len(self.protection):
+                self.protection[byte] &= ~(1 << bit)
+
+    def write_sector_direct(self, sector, data, cmd_type):
+        """Write an unprotected sector in one APDU, trying the usual write commands.
+
+        Returns the description of the command that worked, or None.
+        """
+        commands = [
+            (cmd_type, "Selected command"),
+            (0xD0, "WRITE command"),
+            (0xFE, "PROGRAM command"),
+            (0xF0, "UPDATE command")
+        ]
+
+        address = sector * self.BYTES_PER_SECTOR
+        current = self.image.get(address, len(data))
+        for cmd, desc in commands:
+            try:
+                self.log(f"\nTrying {desc}...")
+                self.forget_written(cmd, address, len(data))
+                command = [0xFF, cmd, *self.address_bytes(address), len(data)] + list(data)
+                response, sw1, sw2 = self.transmit(command)
+
+                if sw1 == 0x90:
+                    if cmd == 0xD1:
+                        self.record_protected(address, data, current)
+                    self.log(f"Write successful with {desc}")
+                    return desc
+                self.log(f"{desc} failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
+            except Exception as e:
+                self.log(f"Error with {desc}: {str(e)}")
+
+        self.log("All write attempts failed")
+        return None
+
+    def read_bytes(self, address, length):
+        """Return length bytes from address, reading only what the session image lacks"""
+        cached = self.image.get(address, length)
+        if cached is not None:
+            return list(cached)
+        for start in range(address, address + length, self.read_chunk):
+            size = min(self.read_chunk, address + length - start)
+            if self.image.get(start, size) is None:
+                response = self.transmit_checked([0xFF, 0xB0, *self.address_bytes(start), size & 0xFF], "Read")
+                if len(response) != size:
+                    raise CardError(f"Read Error: {len(response)} of {size} bytes at {hex(start)}")
+                self.image.store(start, response)
+        return list(self.image.get(address, length))
+
+    def plan_runs(self, address, data, current, protected, cmd_type):
+        """Split a write into (offset, length) runs of bytes that have to be sent.
+
+        Protected bytes and bytes that already hold their value are left out
+        (WRITE PROTECTION compares the data, so it sends equal bytes too).
+        Unchanged bytes in gaps up to MERGE_GAP long are rewritten to save an
+        APDU; runs are at most write_chunk bytes long.
+        """
+        runs = []
+        for offset, value in enumerate(data):
+            if address + offset in protected:
+                continue
+            if cmd_type != 0xD1 and current[offset] == value:
+                continue
+            if runs:
+                last, length = runs[-1]
+                gap = range(last + length, offset)
+                if (len(gap) <= self.MERGE_GAP and offset - last < self.write_chunk
+                        and not any(address + i in protected for i in gap)):
+                    runs[-1] = (last, offset - last + 1)
+                    continue
+            runs.append((offset, 1))
+        return runs
+
+    def write_run(self, address, values, cmd_type):
+        """Write one run in as few APDUs as the reader's Lc allows; return (sw1, sw2)"""
+        chunk = self.write_chunk
+        if len(values) > chunk:
+            sw = (0x90, 0x00)
+            for start in range(0, len(values), chunk):
+                sw = self.write_run(address + start, values[start:start + chunk], cmd_type)
+                if sw[0] != 0x90:
+                    break
+            return sw
+
+        p1, p2 = self.address_bytes(address)
+        APDU = [0xFF, cmd_type, p1, p2, len(values)] + list(values)
+        response, sw1, sw2 = self.transmit(APDU)
+        if sw1 in RETRY_SW1:
+            # Busy or a transfer error: poll until the card takes the write
+            response, sw1, sw2 = self.write_timer.transmit_until_ok(self.transmit, APDU, settle=False)
+        if sw1 == 0x67 and len(values) > 1:
+            # Lc too long for this reader: remember the shorter length and retry
+            self.write_chunk = (len(values) + 1) // 2
+            if self.profile:
+                self.profile.set("write_chunk", self.write_chunk)
+            self.log(f"Reader refused {len(values)}-byte writes, using {self.write_chunk} bytes")
+            return self.write_run(address, values, cmd_type)
+        return sw1, sw2
+
+    def write_bytes(self, address, data, cmd_type):
+        """Write data at address in contiguous runs and verify them with one readback.
+
+        Bytes already holding their value and protected bytes are not sent.
+        PROGRAM can only clear bits, so a run that has to set bits is erased
+        to FF first. Returns the offsets that did not verify; raises
+        CardError if the card rejects a write.
+        """
+        data = list(data)
+        if self.profile:
+            self.write_chunk = min(self.write_chunk, self.profile.get("write_chunk", self.write_chunk))
+        current = self.read_bytes(address, len(data))
+        protected = self.protected_addresses() if self.driver.protection_size else set()
+        runs = self.plan_runs(address, data, current, protected, cmd_type)
+
+        skipped = sum(1 for offset in range(len(data)) if address + offset in protected)
+        self.log(f"{sum(length for _, length in runs)} of {len(data)} bytes to write in {len(runs)} runs, "
+                 f"{skipped} protected")
+        if runs:
+            self.forget_written(cmd_type, address + runs[0][0], runs[-1][0] + runs[-1][1] - runs[0][0])
+        for offset, length in runs:
+            run_address = address + offset
+            values = data[offset:offset + length]
+            if cmd_type == 0xFE and any(value & ~current[offset + i] for i, value in enumerate(values)):
+                sw1, sw2 = self.write_run(run_address, [0xFF] * length, 0xD0)
+                if sw1 != 0x90:
+                    raise CardError(f"✗ Erase Error at {hex(run_address)}: SW1={hex(sw1)}, SW2={hex(sw2)}",
+                                    sw1, sw2)
+            self.log(f"Writing {length} bytes at {hex(run_address)}: {hex_bytes(values)}")
+            sw1, sw2 = self.write_run(run_address, values, cmd_type)
+            if sw1 != 0x90:
+                raise CardError(f"✗ Write Error at {hex(run_address)}: SW1={hex(sw1)}, SW2={hex(sw2)}")
+            if cmd_type == 0xD1:
+                self.record_protected(run_address, values, current[offset:offset + length])
+
+        final = list(current)
+        if runs:
+            # One readback over all runs, polled until the writes show up (or the timeout expires)
+            first = runs[0][0]
+            last = runs[-1][0] + runs[-1][1]
+            expected = [data[i] if address + i not in protected else current[i] for i in range(first, last)]
+            final[first:last] = self.read_back(address + first, expected)
+
+        failed = [i for i, value in enumerate(data) if final[i] != value]
+        self.save_profile()
+        return failed
+
+    def read_back(self, address, expected):
+        """Read a written range in read_chunk pieces, polling each until it matches.
+
+        Returns the bytes read, with None for pieces the card did not return.
+        """
+        result = []
+        for start in range(0, len(expected), self.read_chunk):
+            wanted = expected[start:start + self.read_chunk]
+            verify_APDU = [0xFF, 0xB0, *self.address_bytes(address + start), len(wanted) & 0xFF]
+            response = []
+
+            def programmed():
+                response[:] = self.transmit(verify_APDU, "verify")[0]
+                return response == wanted
+
+            self.write_timer.wait_until(programmed)
+            if len(response) == len(wanted):
+                self.image.store(address + start, response)
+                result.extend(response)
+            else:
+                result.extend([None] * len(wanted))
+        return result
+
+    def plan_image(self, data, cmd_type=0xD0):
+        """Compare an image with the card and work out the writes it needs"""
+        data = list(data)
+        if len(data) > self.driver.memory_size:
+            raise ValueError(f"Image size ({len(data)} bytes) exceeds card capacity ({self.driver.memory_size} bytes)")
+        current = self.read_bytes(0, len(data))
+        protected = self.protected_addresses() if self.driver.protection_size else set()
+        runs = self.plan_runs(0, data, current, protected, cmd_type)
+        return ImagePlan(data, current, protected, runs, self.write_chunk, self.driver.psc_length > 0)
+
+    def write_image(self, data, cmd_type=0xD0, pins=None):
+        """Program a whole memory image, writing only the bytes that differ.
+
+        The PSC is presented only when something has to be written.
+        Returns an ImageWriteResult with the outcome of every byte.
+        """
+        plan = self.plan_image(data, cmd_type)
+        self.log(plan.summary())
+        if not plan.runs:
+            return ImageWriteResult(plan)
+
+        if plan.psc_needed and not self.pin_verified and self.verify_pin(pins) is None:
+            raise CardError("PIN verification failed, image not written")
+        failed = self.write_bytes(0, plan.data, cmd_type)
+        result = ImageWriteResult(plan, failed)
+        self.log(result.summary())
+        return result
+
+    def write_sector_with_pin(self, sector, data, cmd_type):
+        """Write a sector after PIN verification, sending only the bytes that change.
+
+        Returns the list of byte positions that failed to verify; raises
+        CardError if the card rejects a write.
+        """
+        self.log(f"Writing data to sector {sector}...")
+        failed_bytes = self.write_bytes(sector * self.BYTES_PER_SECTOR, data, cmd_type)
+        for i in failed_bytes:
+            self.log(f"✗ Byte {i} verification failed: wrote {hex(data[i])}")
+        self.log(f"Sector {sector} write operation completed.")
+        if failed_bytes:
+            self.log(f"Failed bytes at positions: {failed_bytes}")
+        return failed_bytes
+
+    def verify_sector(self, sector, data, refresh=False):
+        """Read a sector back and compare it; return (matches, bytes read)"""
+        response = self.read_sector(sector, refresh)
+        self.log(f"Final verification read of sector {sector}: {hex_bytes(response)}")
+        if response == list(data):
+            self.log("Verification successful - written data matches read data")
+            return True, response
+
+        self.log("Warning: Read data doesn't match written data!")
+        self.log(f"Attempted to write: {bytes(data).hex().upper()}")
+        self.log(f"Actually written: {hex_bytes(response)}")
+        self.log("Byte-by-byte comparison:")
+        for i, (written, read) in enumerate(zip(data, response)):
+            if written != read:
+                self.log(f"Mismatch at byte {i}: Wrote {hex(written)}, Read {hex(read)}")
+        return False, response
+
+
+def main(argv=None):
+    """Minimal command line front-end for scripted AT24C64 work"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Headless AT24C64/24Cxx reader/writer")
+    parser.add_argument("--reader", type=int, default=0, help="Index of the reader to use")
+    sub = parser.add_subparsers(dest="command", required=True)
+    parser.add_argument("--store", default=STORE_FILE, help="Dump store file")
+    parser.add_argument("--trace", metavar="FILE", help="Append every APDU to a replayable trace file")
+    parser.add_argument("--simulate", action="store_true", help="Use an emulated card instead of a reader")
+    parser.add_argument("--chip", choices=EEPROM_TYPES, default="AT24C64", help="EEPROM type")
+    sub.add_parser("readers", help="List attached readers")
+    dump_parser = sub.add_parser("dump", help="Dump the whole card into the dump store")
+    dump_parser.add_argument("--export", metavar="FILE", help="Also write the dump to a .bin file")
+    clone_parser = sub.add_parser("clone", help="Write a dump onto the card")
+    clone_parser.add_argument("file", help="Dump file, stored dump id or 'latest'")
+    clone_parser.add_argument("--delta", action="store_true",
+                              help="Only write pages that differ from the card")
+    verify_parser = sub.add_parser("verify", help="Compare the card with a dump")
+    verify_parser.add_argument("file", help="Dump file, stored dump id or 'latest'")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    reader_list = [simulated_reader(args.chip)] if args.simulate else list_readers()
+    if args.command == "readers":
+        for index, reader in enumerate(reader_list):
+            print(f"{index}: {reader}")
+        return 0
+
+    if not 0 <= args.reader < len(reader_list):
+        logging.error("No smart card reader at index %d", args.reader)
+        return 1
+
+    device = AT24C64Device(reader_list[args.reader], driver=get_driver(args.chip))
+    if args.trace:
+        device.tracer = ApduTracer(args.trace)
+    store = DumpStore(args.store)
+    try:
+        atr = device.connect()
+        logging.info("ATR: %s", hex_bytes(atr))
+        if args.command == "dump":
+            record = device.dump(store)
+            if args.export:
+                store.export(record.id, args.export)
+        elif args.command == "clone":
+            result = device.clone(load_image(args.file, store), delta=args.delta)
+            if not result.ok:
+                logging.error("Clone completed with errors: %s", result.summary())
+                return 1
+            logging.info("Successfully cloned card from %s (%s)", args.file, result.summary())
+        elif args.command == "verify":
+            mismatched = device.verify(load_image(args.file, store))
+            if mismatched:
+                logging.error("Pages differ: %s", ", ".join(str(p) for p in mismatched))
+                return 1
+            logging.info("Card matches %s", args.file)
+    except (CardError, ValueError, OSError, KeyError) as e:
+        logging.error(str(e))
+        return 1
+    finally:
+        device.disconnect()
+        store.close()
+        if device.tracer:
+            logging.info("APDU latencies:\n%s", device.tracer.summary())
+            device.tracer.close()
+    return 0
+
+
+def load_image(source, store):
+    """Return a memory image from a dump file, a stored dump id or 'latest'"""
+    if os.path.exists(source):
+        with open(source, "rb") as f:
+            return f.read()
+    if source == "latest":
+        record = store.latest()
+        if record is None:
+            raise KeyError("The dump store is empty")
+        return store.get(record.id)
+    if source.lstrip("#").isdigit():
+        return store.get(int(source.lstrip("#")))
+    raise ValueError(f"No dump file or stored dump called {source}")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""Memory geometry and behaviour of the supported card families.
+
+Every card type the apps can talk to has a CardDriver describing its main
+memory size, page (EEPROM) or sector (SLE) size, address width, the largest
+read and write a reader is asked for in one APDU, its protection model and
+its write cycle time. The devices in card_device take all of these from the
+driver instead of hardcoding the AT24C64 or a 256-byte SLE4442:
+
+    driver = get_driver("SLE4428")
+    driver.memory_size, driver.page_size, driver.pages  # 1024, 16, 64
+"""
+
+EEPROM, SLE = "eeprom", "sle"
+
+# Protection models
+NO_PROTECTION = "none"  # Only the EEPROM's WP pin, invisible to the reader
+PROTECTION_BITS_32 = "32 write-once bits"  # SLE4432/4442: one bit per byte for bytes 0-31
+PROTECTION_PER_BYTE = "bit per byte"  # SLE4418/4428: every byte has its own bit
+
+
+class CardDriver:
+    """Geometry of one card type.
+
+    page_size is the EEPROM page (writes must not cross it) or the sector
+    size SLE memory is shown and written in. read_chunk/write_chunk are the
+    largest transfers tried in one APDU; protection_size is the number of
+    protection memory bytes read with FF B2 and psc_length the PSC length
+    (0 for cards without one). write_cycle is the delay before the first
+    completion poll after a write; SLE readers only answer a write once the
+    card has finished it, so theirs is 0.
+    """
+
+    def __init__(self, name, family, memory_size, page_size, address_bits, read_chunk, write_chunk,
+                 protection=NO_PROTECTION, protection_size=0, psc_length=0, write_cycle=0.005):
+        self.name = name
+        self.family = family
+        self.memory_size = memory_size
+        self.page_size = page_size
+        self.address_bits = address_bits
+        self.read_chunk = read_chunk
+        self.write_chunk = write_chunk
+        self.protection = protection
+        self.protection_size = protection_size
+        self.psc_length = psc_length
+        self.write_cycle = write_cycle
+
+    def __repr__(self):
+        return f"CardDriver({self.name!r})"
+
+    @property
+    def pages(self):
+        return self.memory_size // self.page_size
+
+    def describe(self):
+        unit = "pages" if self.family == EEPROM else "sectors"
+        return f"{self.memory_size} bytes ({self.pages} {unit} × {self.page_size} bytes)"
+
+    def protected_addresses(self, protection):
+        """Set of main memory addresses a protection memory read marks as protected.
+
+        A protection bit of 0 means the byte is protected for good.
+        """
+        if self.protection == NO_PROTECTION:
+            return set()
+        covered = 32 if self.protection == PROTECTION_BITS_32 else self.memory_size
+        protected = set()
+        for address in range(min(covered, len(protection) * 8)):
+            if not protection[address // 8] & (1 << (address % 8)):
+                protected.add(address)
+        return protected
+
+
+def _eeprom(name, memory_size, page_size, address_bits):
+    # One extended read can carry at most 65535 bytes
+    return CardDriver(name, EEPROM, memory_size, page_size, address_bits,
+                      read_chunk=min(memory_size, 0x8000), write_chunk=page_size, write_cycle=0.005)
+
+
+DRIVERS = {driver.name: driver for driver in (
+    _eeprom("AT24C64", 8192, 32, 13),
+    _eeprom("24C128", 16384, 64, 14),
+    _eeprom("24C256", 32768, 64, 15),
+    _eeprom("24C512", 65536, 128, 16),
+    CardDriver("SLE4432", SLE, 256, 16, 8, read_chunk=256, write_chunk=255,
+               protection=PROTECTION_BITS_32, protection_size=4, write_cycle=0.0),
+    CardDriver("SLE4442", SLE, 256, 16, 8, read_chunk=256, write_chunk=255,
+               protection=PROTECTION_BITS_32, protection_size=4, psc_length=3, write_cycle=0.0),
+    CardDriver("SLE5542", SLE, 256, 16, 8, read_chunk=256, write_chunk=255,
+               protection=PROTECTION_BITS_32, protection_size=4, psc_length=3, write_cycle=0.0),
+    CardDriver("SLE4428", SLE, 1024, 16, 10, read_chunk=256, write_chunk=255,
+               protection=PROTECTION_PER_BYTE, protection_size=128, psc_length=2, write_cycle=0.0),
+    CardDriver("SLE5528", SLE, 1024, 16, 10, read_chunk=256, write_chunk=255,
+               protection=PROTECTION_PER_BYTE, protection_size=128, psc_length=2, write_cycle=0.0),
+)}
+
+EEPROM_TYPES = tuple(name for name, driver in DRIVERS.items() if driver.family == EEPROM)
+DEFAULT_SLE = "SLE4442"  # Used for SLE cards whose ATR is not recognized
+
+
+def get_driver(card_type, default=None):
+    """Driver of a card type name; default (a name) when the type has none"""
+    driver = DRIVERS.get(card_type)
+    if driver is None and default is not None:
+        driver = DRIVERS[default]
+    if driver is None:
+        raise ValueError(f"No driver for card type {card_type}")
+    return driver
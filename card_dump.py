@@ -0,0 +1,151 @@
+"""Binary SLE card dumps with a JSON sidecar.
+
+A full read of an SLE card is saved as the raw main memory image
+(card_dump_<timestamp>.bin) next to a JSON file of the same name holding the
+protection and security memory, the protected and unreadable sectors, and
+where the card was read. The per-sector text listing is only written on
+export:
+
+    python card_dump.py card_dump_20241209_235401.bin
+    python card_dump.py card_dump_20241209_235401.bin --text card_dump.txt
+"""
+import datetime
+import hashlib
+import json
+import os
+
+from hex_format import hex_bytes
+
+FORMAT_VERSION = 1
+
+
+class CardDump:
+    """Main, protection and security memory of one SLE card read.
+
+    Sectors listed in unread could not be read; their bytes in data are 0.
+    """
+
+    def __init__(self, data, protection=b"", security=b"", sector_size=16, protected_sectors=(),
+                 unread=(), card_type=None, atr=None, reader=None, created=None):
+        self.data = bytes(data)
+        self.protection = bytes(protection)
+        self.security = bytes(security)
+        self.sector_size = sector_size
+        self.protected_sectors = sorted(protected_sectors)
+        self.unread = sorted(unread)
+        self.card_type = card_type
+        self.atr = atr
+        self.reader = reader
+        self.created = created or datetime.datetime.now().isoformat(timespec="seconds")
+        self.filename = None
+
+    @property
+    def sectors(self):
+        return len(self.data) // self.sector_size
+
+    @property
+    def complete(self):
+        return not self.unread
+
+    @property
+    def unprotected_sectors(self):
+        protected = set(self.protected_sectors)
+        return [sector for sector in range(self.sectors) if sector not in protected]
+
+    def sector(self, sector):
+        start = sector * self.sector_size
+        return self.data[start:start + self.sector_size]
+
+    def metadata(self, image=None):
+        return {
+            "format": FORMAT_VERSION,
+            "image": image,
+            "created": self.created,
+            "reader": self.reader,
+            "atr": self.atr,
+            "card_type": self.card_type,
+            "size": len(self.data),
+            "sha256": hashlib.sha256(self.data).hexdigest(),
+            "sector_size": self.sector_size,
+            "protection": self.protection.hex().upper(),
+            "security": self.security.hex().upper(),
+            "protected_sectors": self.protected_sectors,
+            "unread_sectors": self.unread,
+        }
+
+    def save(self, directory="."):
+        """Write the image and its sidecar; return the image file name"""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = os.path.join(directory, f"card_dump_{timestamp}.bin")
+        count = 1
+        while os.path.exists(filename):  # Several reads within one second
+            count += 1
+            filename = os.path.join(directory, f"card_dump_{timestamp}_{count}.bin")
+        with open(filename, "wb") as f:
+            f.write(self.data)
+        with open(sidecar_name(filename), "w") as f:
+            json.dump(self.metadata(os.path.basename(filename)), f, indent=2)
+            f.write("\n")
+        self.filename = filename
+        return filename
+
+    @classmethod
+    def load(cls, filename):
+        """Read an image and, when present, its sidecar"""
+        with open(filename, "rb") as f:
+            data = f.read()
+        try:
+            with open(sidecar_name(filename), "r") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {}
+        dump = cls(data, bytes.fromhex(meta.get("protection", "")), bytes.fromhex(meta.get("security", "")),
+                   meta.get("sector_size", 16), meta.get("protected_sectors", ()), meta.get("unread_sectors", ()),
+                   meta.get("card_type"), meta.get("atr"), meta.get("reader"), meta.get("created"))
+        dump.filename = filename
+        return dump
+
+    def write_text(self, filename):
+        """Export the per-sector hex listing with its protection summary"""
+        unread = set(self.unread)
+        with open(filename, "w") as f:
+            for sector in range(self.sectors):
+                data = "unreadable" if sector in unread else hex_bytes(self.sector(sector))
+                f.write(f"Sector {sector:02d}: {data}\n")
+
+            f.write("\nProtection Status Summary:\n")
+            f.write("-" * 50 + "\n")
+            f.write(f"Protected Sectors: {', '.join(map(str, self.protected_sectors))}\n")
+            f.write(f"Unprotected Sectors: {', '.join(map(str, self.unprotected_sectors))}\n")
+            if self.protection:
+                f.write(f"Protection Memory: {hex_bytes(self.protection)}\n")
+            if self.security:
+                f.write(f"Security Memory: {hex_bytes(self.security)}\n")
+
+
+def sidecar_name(filename):
+    return os.path.splitext(filename)[0] + ".json"
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show or export a binary SLE card dump")
+    parser.add_argument("file", help="card_dump_*.bin image")
+    parser.add_argument("--text", metavar="FILE", help="Export the per-sector text listing")
+    args = parser.parse_args(argv)
+
+    dump = CardDump.load(args.file)
+    if args.text:
+        dump.write_text(args.text)
+        print(f"Exported {args.file} to {args.text}")
+        return 0
+    print(f"{dump.card_type or 'Unknown'} card, {len(dump.data)} bytes read {dump.created}")
+    print(f"Protected sectors: {', '.join(map(str, dump.protected_sectors)) or 'none'}")
+    if dump.unread:
+        print(f"Unreadable sectors: {', '.join(map(str, dump.unread))}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
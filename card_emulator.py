@@ -0,0 +1,408 @@
+"""Software emulation of memory cards behind a PC/SC reader.
+
+SimulatedReader stands in for a pyscard reader: createConnection() returns a
+SimulatedConnection that answers the memory card APDUs the apps send
+(FF B0/D0/D6/F0/FE/B1/B2/20/D1/CA) from an emulated 24Cxx EEPROM, SLE4442
+or SLE4428, so dump, clone and sector writes run without hardware:
+
+    reader = SimulatedReader(SLE4442Card(), latency=0.004)
+    device = SmartCardDevice(reader)
+
+The cards follow the chips' rules: EEPROM page writes wrap at the page
+boundary and the chip ignores commands during its write cycle (the
+reader reports SW 64 00, which is what ACK polling sees); the SLE44xx accept
+writes only after the PSC was presented, keep protected bytes unchanged, and
+lock after too many wrong PSCs. A protection bit of 0 means protected.
+
+The connection can add per-APDU and per-byte latency, write cycle time and
+random or queued errors. By default latency is slept for real; with a
+VirtualClock it is only added up, so benchmarks run at full speed and still
+report the time the card would have taken.
+"""
+import random
+import time
+
+# Status words
+OK = (0x90, 0x00)
+WRONG_LENGTH = (0x67, 0x00)
+SECURITY_NOT_SATISFIED = (0x69, 0x82)
+WRONG_ADDRESS = (0x6A, 0x82)
+NOT_SUPPORTED = (0x6A, 0x81)
+UNKNOWN_INS = (0x6D, 0x00)
+BUSY = (0x64, 0x00)  # Chip did not acknowledge (EEPROM write cycle in progress)
+TRANSIENT_ERROR = (0x6F, 0x00)
+
+WRITE_INS = (0xD0, 0xD6, 0xF0, 0xFE)
+
+
+class RealClock:
+    """Latency is slept for real"""
+
+    def __init__(self):
+        self.slept = 0.0
+
+    def now(self):
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """Latency only advances a counter, so emulated runs take no wall time.
+
+    Real time still passes too, so a host that sleeps between APDUs (e.g.
+    WriteTimer waiting for a write cycle) sees the card become ready.
+    """
+
+    def __init__(self):
+        self.slept = 0.0
+        self.start = time.perf_counter()
+
+    def now(self):
+        return time.perf_counter() - self.start + self.slept
+
+    def sleep(self, seconds):
+        self.slept += seconds
+
+
+class MemoryCard:
+    """Main memory of an emulated card and the commands common to all of them"""
+
+    CARD_TYPE = None
+    ATR = ()
+    SIZE = 0
+    MAX_WRITE = 256  # Largest Lc a write accepts
+
+    def __init__(self, data=None):
+        self.memory = bytearray(b"\xFF" * self.SIZE)
+        if data is not None:
+            self.memory[:len(data)] = bytes(data)[:self.SIZE]
+
+    def address(self, p1, p2):
+        return (p1 << 8) | p2
+
+    def handle(self, apdu):
+        """Execute an APDU and return (response, (sw1, sw2))"""
+        if len(apdu) < 5 or apdu[0] != 0xFF:
+            return [], UNKNOWN_INS
+        ins, p1, p2 = apdu[1], apdu[2], apdu[3]
+        if ins == 0xB0:
+            return self.read(self.address(p1, p2), read_length(apdu))
+        if ins in WRITE_INS:
+            data = apdu[5:5 + apdu[4]]
+            if len(data) != apdu[4]:
+                return [], WRONG_LENGTH
+            return [], self.write(ins, self.address(p1, p2), data)
+        if ins == 0xB1:
+            return self.read_security(apdu[4])
+        if ins == 0xB2:
+            return self.read_protection(self.address(p1, p2), apdu[4])
+        if ins == 0x20:
+            return [], self.present_psc(apdu[5:5 + apdu[4]])
+        if ins == 0xD1:
+            return [], self.write_protection(self.address(p1, p2), apdu[5:5 + apdu[4]])
+        if ins == 0xCA:
+            return [], NOT_SUPPORTED  # Memory cards have no UID to GET
+        return [], UNKNOWN_INS
+
+    def read(self, address, length):
+        if address + length > self.SIZE:
+            return [], WRONG_ADDRESS
+        return list(self.memory[address:address + length]), OK
+
+    def write(self, ins, address, data):
+        if len(data) > self.MAX_WRITE:
+            return WRONG_LENGTH
+        if address + len(data) > self.SIZE:
+            return WRONG_ADDRESS
+        self.store(ins, address, data)
+        return OK
+
+    def store(self, ins, address, data):
+        for offset, value in enumerate(data):
+            self.program(ins, address + offset, value)
+
+    def program(self, ins, address, value):
+        # PROGRAM (FE) can only clear bits; the other writes erase first
+        self.memory[address] = self.memory[address] & value if ins == 0xFE else value
+
+    def read_security(self, length):
+        return [], NOT_SUPPORTED
+
+    def read_protection(self, address, length):
+        return [], NOT_SUPPORTED
+
+    def present_psc(self, psc):
+        return NOT_SUPPORTED
+
+    def write_protection(self, address, data):
+        return NOT_SUPPORTED
+
+
+class AT24C64Card(MemoryCard):
+    """8 KB I²C EEPROM with 32-byte pages and an optional write-protect pin"""
+
+    CARD_TYPE = "AT24C64"
+    ATR = (0x3B, 0x04, 0x49, 0x32, 0x43, 0x2E)
+    SIZE = 8192
+    PAGE_SIZE = 32
+    MAX_WRITE = 32
+
+    def __init__(self, data=None, write_protect=False):
+        super().__init__(data)
+        self.write_protect = write_protect
+
+    def address(self, p1, p2):
+        return ((p1 << 8) | p2) & (self.SIZE - 1)  # 13 address bits on the AT24C64
+
+    def write(self, ins, address, data):
+        if self.write_protect:
+            return OK  # The chip ignores writes while WP is tied high
+        if len(data) > self.MAX_WRITE:
+            return WRONG_LENGTH
+        # Page writes roll over to the start of the page instead of crossing it
+        page = address - address % self.PAGE_SIZE
+        for offset, value in enumerate(data):
+            self.program(ins, page + (address + offset) % self.PAGE_SIZE, value)
+        return OK
+
+
+class AT24C128Card(AT24C64Card):
+    CARD_TYPE = "24C128"
+    SIZE = 16384
+    PAGE_SIZE = 64
+    MAX_WRITE = 64
+
+
+class AT24C256Card(AT24C64Card):
+    CARD_TYPE = "24C256"
+    SIZE = 32768
+    PAGE_SIZE = 64
+    MAX_WRITE = 64
+
+
+class AT24C512Card(AT24C64Card):
+    CARD_TYPE = "24C512"
+    SIZE = 65536
+    PAGE_SIZE = 128
+    MAX_WRITE = 128
+
+
+class SLE4442Card(MemoryCard):
+    """256-byte card with 32 write-once protection bits and a 3-byte PSC"""
+
+    CARD_TYPE = "SLE4442"
+    ATR = (0x3B, 0x04, 0xA2, 0x13, 0x10, 0x91)
+    SIZE = 256
+    PROTECTED_BYTES = 32  # Bytes covered by protection bits
+    PSC = (0xFF, 0xFF, 0xFF)
+    ATTEMPTS = 3
+
+    def __init__(self, data=None, psc=None, protected=()):
+        super().__init__(data)
+        self.psc = list(psc or self.PSC)
+        self.error_counter = (1 << self.ATTEMPTS) - 1
+        self.verified = False
+        self.protected = set(protected)
+
+    def address(self, p1, p2):
+        return (p1 << 8) | p2 if self.SIZE > 256 else p2
+
+    def program(self, ins, address, value):
+        if address not in self.protected:
+            super().program(ins, address, value)
+
+    def write(self, ins, address, data):
+        if not self.verified:
+            return SECURITY_NOT_SATISFIED
+        return super().write(ins, address, data)
+
+    def protection_bits(self, address, count):
+        """Protection bitmap of count bytes from address; bit 0 means protected"""
+        bits = bytearray(b"\xFF" * ((count + 7) // 8))
+        for offset in range(count):
+            if address + offset in self.protected:
+                bits[offset // 8] &= ~(1 << (offset % 8)) & 0xFF
+        return list(bits)
+
+    def read_protection(self, address, length):
+        # The reader returns all 4 protection bytes, whatever Le asks for
+        return self.protection_bits(0, self.PROTECTED_BYTES), OK
+
+    def read_security(self, length):
+        # The PSC itself only reads back once it has been presented
+        psc = self.psc if self.verified else [0x00] * len(self.psc)
+        return ([self.error_counter] + psc)[:max(length, 1)], OK
+
+    def present_psc(self, psc):
+        if self.error_counter == 0:
+            return 0x63, 0x00  # Locked for good
+        if list(psc) == self.psc:
+            self.error_counter = (1 << self.ATTEMPTS) - 1
+            self.verified = True
+            return OK
+        self.error_counter &= self.error_counter - 1  # Each failure clears one bit
+        self.verified = False
+        return 0x63, bin(self.error_counter).count("1")
+
+    def write_protection(self, address, data):
+        """Protect each byte whose contents equal the data given for it"""
+        if not self.verified:
+            return SECURITY_NOT_SATISFIED
+        if address + len(data) > self.PROTECTED_BYTES:
+            return WRONG_ADDRESS
+        for offset, value in enumerate(data):
+            if self.memory[address + offset] == value:
+                self.protected.add(address + offset)
+        return OK
+
+
+class SLE4428Card(SLE4442Card):
+    """1 KB card with a protection bit per byte and a 2-byte PSC"""
+
+    CARD_TYPE = "SLE4428"
+    ATR = (0x3B, 0x04, 0x92, 0x23, 0x10, 0x91)
+    SIZE = 1024
+    PROTECTED_BYTES = 1024
+    PSC = (0xFF, 0xFF)
+    ATTEMPTS = 8
+
+    def read_protection(self, address, length):
+        # Le is the length of the bitmap in bytes, eight bytes per bitmap byte
+        count = min(length * 8, self.SIZE - address)
+        return self.protection_bits(address, count), OK
+
+    def write_protection(self, address, data):
+        """Write data and protect it in one step"""
+        if not self.verified:
+            return SECURITY_NOT_SATISFIED
+        if address + len(data) > self.SIZE:
+            return WRONG_ADDRESS
+        self.store(0xD0, address, data)
+        self.protected.update(range(address, address + len(data)))
+        return OK
+
+
+CARD_MODELS = {card.CARD_TYPE: card for card in (AT24C64Card, AT24C128Card, AT24C256Card, AT24C512Card,
+                                                 SLE4442Card, SLE4428Card)}
+
+
+def read_length(apdu):
+    """Le of a READ APDU: short (0 means 256) or extended (00 hi lo)"""
+    if len(apdu) >= 7 and apdu[4] == 0:
+        return (apdu[5] << 8) | apdu[6]
+    return apdu[4] or 256
+
+
+class SimulatedConnection:
+    """pyscard CardConnection look-alike that talks to an emulated card.
+
+    latency is added to every APDU, byte_latency for every byte sent and
+    received, and write_cycle after each write: the AT24C64 answers BUSY
+    until it has passed, an SLE write simply takes that long per byte. max_read
+    is the longest read the reader accepts (extended reads need max_read > 256)
+    and max_write the longest Lc of a write.
+    error_rate makes that fraction of APDUs fail with TRANSIENT_ERROR before
+    reaching the card; inject() queues specific status words.
+    """
+
+    def __init__(self, card, latency=0.0, byte_latency=0.0, write_cycle=0.0, max_read=256, max_write=255,
+                 error_rate=0.0, seed=None, clock=None):
+        self.card = card
+        self.latency = latency
+        self.byte_latency = byte_latency
+        self.write_cycle = write_cycle
+        self.max_read = max_read
+        self.max_write = max_write
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.clock = clock or RealClock()
+        self.busy_until = 0.0
+        self.injected = []
+        self.connected = False
+        self.apdus = 0
+        self.errors = 0
+        self.busy = 0
+
+    def connect(self, protocol=None):
+        if self.card is None:
+            raise ConnectionError("No card in the simulated reader")
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+    def getATR(self):
+        return list(self.card.ATR)
+
+    def inject(self, sw1, sw2, count=1):
+        """Answer the next count APDUs with (sw1, sw2) without executing them"""
+        self.injected.extend([(sw1, sw2)] * count)
+
+    def transmit(self, apdu):
+        if not self.connected:
+            raise ConnectionError("Simulated card is not connected")
+        self.apdus += 1
+        apdu = list(apdu)
+        response, sw = self.execute(apdu)
+        self.clock.sleep(self.latency + self.byte_latency * (len(apdu) + len(response)))
+        return response, sw[0], sw[1]
+
+    def execute(self, apdu):
+        if self.injected:
+            self.errors += 1
+            return [], self.injected.pop(0)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return [], TRANSIENT_ERROR
+        if self.clock.now() < self.busy_until:
+            self.busy += 1
+            return [], BUSY
+        if apdu[1] == 0xB0 and read_length(apdu) > self.max_read:
+            return [], WRONG_LENGTH
+        if apdu[1] in WRITE_INS + (0xD1,) and apdu[4] > self.max_write:
+            return [], WRONG_LENGTH
+
+        response, sw = self.card.handle(apdu)
+        if sw == OK and apdu[1] in WRITE_INS + (0xD1,) and self.write_cycle:
+            if isinstance(self.card, AT24C64Card):
+                self.busy_until = self.clock.now() + self.write_cycle
+            else:
+                self.clock.sleep(self.write_cycle * apdu[4])
+        return response, sw
+
+
+class SimulatedReader:
+    """pyscard Reader look-alike holding an emulated card (or none)"""
+
+    def __init__(self, card=None, name="Simulated Reader 0", **options):
+        self.card = card
+        self.name = name
+        self.options = options
+        self.connections = []
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"SimulatedReader({self.name!r})"
+
+    def insert(self, card):
+        self.card = card
+
+    def remove(self):
+        self.card = None
+
+    def createConnection(self):
+        connection = SimulatedConnection(self.card, **self.options)
+        self.connections.append(connection)
+        return connection
+
+
+def simulated_reader(card_type="AT24C64", data=None, name="Simulated Reader 0", **options):
+    """A SimulatedReader holding a fresh card of card_type, optionally preloaded with data"""
+    if card_type not in CARD_MODELS:
+        raise ValueError(f"Card type must be one of {', '.join(CARD_MODELS)}")
+    return SimulatedReader(CARD_MODELS[card_type](data), name, **options)
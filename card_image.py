@@ -0,0 +1,44 @@
+"""Connection-scoped shadow copies of card memory.
+
+A MemoryImage remembers the bytes read from one memory area of the connected
+card. Reads of bytes it already knows cost no APDU; writes forget the bytes
+they touch until they are read (or verified) again. Devices drop their images
+on connect, disconnect and on an explicit refresh.
+"""
+
+
+class MemoryImage:
+    """Copy of one card memory area and which of its bytes are known"""
+
+    def __init__(self, size):
+        self.size = size
+        self.data = bytearray(size)
+        self.known = bytearray(size)  # 1 where data holds the card's byte
+
+    @property
+    def complete(self):
+        return self.known.find(0) == -1
+
+    def check_range(self, address, length):
+        if address < 0 or length < 0 or address + length > self.size:
+            raise ValueError(f"Range {address}+{length} is outside the {self.size}-byte memory")
+
+    def get(self, address, length):
+        """Return the bytes at address, or None unless all of them are known"""
+        self.check_range(address, length)
+        if self.known.find(0, address, address + length) != -1:
+            return None
+        return bytes(self.data[address:address + length])
+
+    def store(self, address, data):
+        """Record bytes read from (or verified on) the card"""
+        self.check_range(address, len(data))
+        self.data[address:address + len(data)] = bytes(data)
+        self.known[address:address + len(data)] = b"\x01" * len(data)
+
+    def invalidate(self, address=0, length=None):
+        """Forget bytes the card may no longer hold, all of them by default"""
+        if length is None:
+            length = self.size - address
+        self.check_range(address, length)
+        self.known[address:address + length] = bytes(length)
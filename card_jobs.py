@@ -0,0 +1,132 @@
+"""Background job execution for long card operations.
+
+Card operations run on a worker thread so the Tk mainloop keeps processing
+events. The worker never touches widgets: progress, results and UI callbacks
+are posted to a queue which the Tk thread drains with root.after.
+"""
+import queue
+import threading
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when the operator cancels it"""
+
+
+class Job:
+    """A single unit of work running on the JobRunner worker thread"""
+
+    def __init__(self, runner, name, func, on_progress=None, on_done=None, on_error=None):
+        self.runner = runner
+        self.name = name
+        self.func = func
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.state = "pending"
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # Wake up a paused job so it can stop
+
+    def pause(self):
+        if self.state == "running":
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def checkpoint(self):
+        """Block while paused and raise JobCancelled once cancelled"""
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled(f"{self.name} cancelled")
+
+    def progress(self, done, total):
+        """Progress callback handed to device operations"""
+        self.checkpoint()
+        if self.on_progress:
+            self.runner.call_in_ui(self.on_progress, done, total)
+
+    def run(self):
+        self.state = "running"
+        try:
+            self.checkpoint()
+            result = self.func(self)
+        except Exception as e:
+            self.state = "cancelled" if isinstance(e, JobCancelled) else "failed"
+            if self.on_error:
+                self.runner.call_in_ui(self.on_error, e)
+        else:
+            self.state = "done"
+            if self.on_done:
+                self.runner.call_in_ui(self.on_done, result)
+
+
+class JobRunner:
+    """Runs jobs one at a time on a worker thread and relays results to Tk"""
+
+    def __init__(self, root, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.current = None
+        self._jobs = queue.Queue()
+        self._ui_calls = queue.Queue()
+        self._worker = threading.Thread(target=self._work, name="card-jobs", daemon=True)
+        self._worker.start()
+        self.root.after(self.poll_ms, self._drain)
+
+    @property
+    def busy(self):
+        return self.current is not None or not self._jobs.empty()
+
+    def submit(self, name, func, on_progress=None, on_done=None, on_error=None):
+        """Queue func(job) for the worker thread and return the Job"""
+        job = Job(self, name, func, on_progress, on_done, on_error)
+        self._jobs.put(job)
+        return job
+
+    def call_in_ui(self, func, *args):
+        """Run func(*args) on the Tk thread; safe to call from any thread"""
+        self._ui_calls.put((func, args))
+
+    def pause(self):
+        if self.current:
+            self.current.pause()
+
+    def resume(self):
+        if self.current:
+            self.current.resume()
+
+    def cancel(self):
+        if self.current:
+            self.current.cancel()
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            self.current = job
+            try:
+                job.run()
+            finally:
+                self.current = None
+
+    def _drain(self):
+        try:
+            while True:
+                func, args = self._ui_calls.get_nowait()
+                func(*args)
+        except queue.Empty:
+            pass
+        finally:
+            self.root.after(self.poll_ms, self._drain)
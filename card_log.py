@@ -0,0 +1,93 @@
+"""Logging for the Tk apps: a bounded console and a rotating log file.
+
+Messages are queued by ConsoleLog.write() from any thread and flushed into the
+console Text widget in one insert per timer tick, and the widget only keeps
+the newest max_lines lines, so logging thousands of lines per write stays
+cheap. The full log goes to a rotating file; records are handed to a
+QueueListener thread so the UI thread never waits on disk.
+"""
+import atexit
+import collections
+import datetime
+import logging
+import logging.handlers
+import queue
+import tkinter as tk
+
+FLUSH_MS = 100  # Console refresh interval
+MAX_LINES = 5000  # Lines kept in the console widget
+MAX_BYTES = 5 * 1024 * 1024  # Log file size before it is rotated
+BACKUP_COUNT = 5  # Rotated log files kept
+
+_listeners = {}
+
+
+def start_file_logging(filename, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, level=logging.INFO):
+    """Send the root logger to a rotating file through a background QueueListener.
+
+    Calling it again for the same file returns the running listener.
+    """
+    if filename in _listeners:
+        return _listeners[filename]
+    records = queue.SimpleQueue()
+    file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes,
+                                                        backupCount=backup_count, delay=True)
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    listener = logging.handlers.QueueListener(records, file_handler)
+    listener.start()
+    atexit.register(listener.stop)  # Drain the queue before the process exits
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    if root.level > level or root.level == logging.NOTSET:
+        root.setLevel(level)
+    _listeners[filename] = listener
+    return listener
+
+
+class ConsoleLog:
+    """Timestamped messages appended to a Text widget in batches.
+
+    write() may be called from any thread; the widget is only touched by the
+    flush timer on the Tk thread. Each message is also passed to logger.
+    """
+
+    def __init__(self, root, widget, logger=None, max_lines=MAX_LINES, flush_ms=FLUSH_MS,
+                 timestamp_format="%H:%M:%S"):
+        self.root = root
+        self.widget = widget
+        self.logger = logger
+        self.max_lines = max_lines
+        self.flush_ms = flush_ms
+        self.timestamp_format = timestamp_format
+        # Lines beyond max_lines would be trimmed anyway, so the backlog is bounded too
+        self.pending = collections.deque(maxlen=max_lines)
+        self.lines = int(widget.index("end-1c").split(".")[0]) - 1
+        self.root.after(self.flush_ms, self.tick)
+
+    def write(self, message):
+        timestamp = datetime.datetime.now().strftime(self.timestamp_format)
+        self.pending.append(f"[{timestamp}] {message}\n")
+        if self.logger:
+            self.logger.info(message)
+
+    def flush(self):
+        """Insert everything queued so far and trim old lines (Tk thread only)"""
+        lines = []
+        while self.pending:
+            try:
+                lines.append(self.pending.popleft())
+            except IndexError:
+                break
+        if lines:
+            text = "".join(lines)
+            self.widget.insert(tk.END, text)
+            self.lines += text.count("\n")
+            if self.lines > self.max_lines:
+                self.widget.delete("1.0", f"{self.lines - self.max_lines + 1}.0")
+                self.lines = self.max_lines
+            self.widget.see(tk.END)
+
+    def tick(self):
+        self.flush()
+        self.root.after(self.flush_ms, self.tick)
@@ -0,0 +1,124 @@
+"""Event-driven card handling: run a preset pipeline on every inserted card.
+
+AutoProvisioner watches all readers through pyscard's CardMonitor. When a
+card is inserted it connects, identifies the card (ATR and card type) and
+runs the selected pipeline (dump, clone or verify); when the card is removed
+the reader is torn down and ready for the next card.
+"""
+import logging
+import queue
+import threading
+from smartcard.CardMonitoring import CardMonitor, CardObserver
+from card_device import AT24C64Device, identify_card, list_readers
+from card_provision import ProvisionJob, describe_result
+from hex_format import hex_bytes
+
+PIPELINES = ("identify", "dump", "clone", "verify")
+
+
+class AutoProvisioner(CardObserver):
+    """Runs a pipeline on each inserted card, one worker thread per reader.
+
+    on_event(event, reader, details) is called from worker threads with
+    event one of "inserted", "done", "skipped", "failed" or "removed"; GUI
+    callers must marshal it to their UI thread. Cards whose ATR names
+    something other than an I²C EEPROM are skipped untouched.
+    """
+
+    def __init__(self, pipeline="dump", data=None, delta=False, store=None,
+                 log=None, on_event=None, device_factory=AT24C64Device):
+        if pipeline not in PIPELINES:
+            raise ValueError(f"Unknown pipeline: {pipeline}")
+        self.job = None
+        if pipeline != "identify":
+            self.job = ProvisionJob(pipeline, data, delta, store)
+        self.pipeline = pipeline
+        self.log = log or logging.info
+        self.on_event = on_event
+        self.device_factory = device_factory
+        self.monitor = None
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.monitor = CardMonitor()
+        # addObserver reports the cards already present as insertions
+        self.monitor.addObserver(self)
+        self.log(f"Auto mode started: {self.pipeline} on card insertion")
+
+    def stop(self):
+        if self.monitor is not None:
+            self.monitor.deleteObserver(self)
+            self.monitor = None
+        with self._lock:
+            for events in self._queues.values():
+                events.put(None)
+            self._queues = {}
+        self.log("Auto mode stopped")
+
+    def update(self, observable, actions):
+        """CardObserver callback, called on pyscard's monitoring thread"""
+        added_cards, removed_cards = actions
+        for card in removed_cards:
+            self._post(card, "removed")
+        for card in added_cards:
+            self._post(card, "inserted")
+
+    def _post(self, card, event):
+        with self._lock:
+            events = self._queues.get(card.reader)
+            if events is None:
+                events = self._queues[card.reader] = queue.Queue()
+                threading.Thread(target=self._work, args=(card.reader, events),
+                                 name=f"auto-{card.reader}", daemon=True).start()
+        events.put((event, card))
+
+    def _emit(self, event, reader, details=None):
+        if self.on_event:
+            self.on_event(event, reader, details)
+
+    def _reader(self, name):
+        """Return the PC/SC reader object called name"""
+        for reader in list_readers():
+            if str(reader) == name:
+                return reader
+        return None
+
+    def _work(self, reader_name, events):
+        while True:
+            item = events.get()
+            if item is None:
+                break
+            event, card = item
+            if event == "removed":
+                self.log(f"[{reader_name}] Card removed, ready for the next card")
+                self._emit("removed", reader_name)
+                continue
+            self._process(reader_name, card)
+
+    def _process(self, reader_name, card):
+        reader = self._reader(reader_name) or card
+        device = self.device_factory(reader, log=lambda message: self.log(f"[{reader_name}] {message}"))
+        try:
+            atr = device.connect()
+            card_type = identify_card(atr) or "Unknown"
+            self.log(f"[{reader_name}] Card inserted: {card_type} (ATR: {hex_bytes(atr)})")
+            self._emit("inserted", reader_name, {"atr": atr, "card_type": card_type})
+            if not device.verify_at24c64(atr):
+                self.log(f"[{reader_name}] Skipped: {card_type} is not an I²C EEPROM")
+                self._emit("skipped", reader_name, {"atr": atr, "card_type": card_type})
+                return
+
+            result = None
+            if self.job is not None:
+                result = self.job.run(device)
+                self.log(f"[{reader_name}] {describe_result(self.job, result)}")
+            self._emit("done", reader_name, {"atr": atr, "card_type": card_type, "result": result})
+        except Exception as e:
+            self.log(f"[{reader_name}] {self.pipeline} failed: {str(e)}")
+            self._emit("failed", reader_name, {"error": e})
+        finally:
+            try:
+                device.disconnect()
+            except Exception as e:
+                self.log(f"[{reader_name}] Disconnect error: {str(e)}")
@@ -0,0 +1,262 @@
+"""Parallel AT24C64 provisioning across every PC/SC reader on the host.
+
+One worker thread per reader pulls jobs (dump, clone or verify one card) from
+a shared queue, so throughput grows with the number of readers on the bench:
+
+    python card_provision.py dump
+    python card_provision.py clone master.bin --count 200 --delta
+    python card_provision.py clone latest --count 200
+"""
+import logging
+import queue
+import threading
+from smartcard.CardRequest import CardRequest
+from smartcard.Exceptions import CardRequestTimeoutException
+from card_device import AT24C64Device, CardError, identify_card, list_readers, load_image
+from dump_store import DumpStore, STORE_FILE
+
+JOB_KINDS = ("dump", "clone", "verify")
+
+
+class ProvisionJob:
+    """One card worth of work: dump it, clone data onto it or verify it against data"""
+
+    def __init__(self, kind, data=None, delta=False, store=None):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if kind != "dump" and data is None:
+            raise ValueError(f"A {kind} job needs a memory image")
+        self.kind = kind
+        self.data = data
+        self.delta = delta
+        self.store = store  # DumpStore for dump jobs; opened on first use if None
+        self._store_lock = threading.Lock()
+
+    def run(self, device, progress=None):
+        if self.kind == "dump":
+            with self._store_lock:
+                if self.store is None:
+                    self.store = DumpStore()
+            return device.dump(self.store, progress)
+        if self.kind == "clone":
+            return device.clone(self.data, progress, self.delta)
+        return device.verify(self.data, progress)
+
+
+class ReaderStatus:
+    """Progress of one reader, as reported to on_progress"""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.state = "idle"
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.cards_done = 0
+        self.cards_failed = 0
+
+
+class ProvisioningPool:
+    """Runs provisioning jobs on all readers at once, one thread per reader.
+
+    on_progress(status) and on_result(status, job, result, error) are called
+    from the worker threads; GUI callers must marshal them to their UI thread.
+    A card whose ATR names something other than an I²C EEPROM is skipped and
+    its job left for another card.
+    """
+
+    CARD_POLL_TIMEOUT = 1  # Seconds between stop checks while waiting for a card
+
+    def __init__(self, reader_list=None, log=None, on_progress=None, on_result=None,
+                 device_factory=AT24C64Device):
+        self.readers = list(reader_list if reader_list is not None else list_readers())
+        self.log = log or logging.info
+        self.on_progress = on_progress
+        self.on_result = on_result
+        self.device_factory = device_factory
+        self.status = {str(reader): ReaderStatus(str(reader)) for reader in self.readers}
+        self._jobs = queue.Queue()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def submit(self, job, count=1):
+        for _ in range(count):
+            self._jobs.put(job)
+
+    def start(self, wait_for_new_card=False):
+        """Start one worker per reader.
+
+        With wait_for_new_card=True every job after a reader's first one
+        waits for the operator to swap the card in that reader.
+        """
+        if not self.readers:
+            raise CardError("No smart card readers found")
+        self._stop.clear()
+        for reader in self.readers:
+            thread = threading.Thread(target=self._work, args=(reader, wait_for_new_card),
+                                      name=f"provision-{reader}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        """Stop after the jobs currently running; queued jobs are dropped"""
+        self._stop.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def run(self, job, count=None, wait_for_new_card=None):
+        """Run job on count cards (one per reader by default) and wait for completion"""
+        if count is None:
+            count = len(self.readers)
+        if wait_for_new_card is None:
+            wait_for_new_card = count > len(self.readers)
+        self.submit(job, count)
+        self.start(wait_for_new_card)
+        self.join()
+        return self.status
+
+    def _report(self, status, state=None, message=None):
+        if state is not None:
+            status.state = state
+        if message is not None:
+            status.message = message
+        if self.on_progress:
+            self.on_progress(status)
+
+    def _wait_for_card(self, reader, status):
+        """Block until a new card is inserted in reader; False if stopped"""
+        self._report(status, "waiting", "Insert next card")
+        while not self._stop.is_set():
+            try:
+                CardRequest(readers=[reader], newcardonly=True,
+                            timeout=self.CARD_POLL_TIMEOUT).waitforcard()
+                return True
+            except CardRequestTimeoutException:
+                continue
+        return False
+
+    def _work(self, reader, wait_for_new_card):
+        status = self.status[str(reader)]
+        device = self.device_factory(reader, log=lambda message: self.log(f"[{reader}] {message}"))
+        first = True
+
+        def progress(done, total):
+            if self._stop.is_set():
+                raise CardError("Provisioning stopped")
+            status.done, status.total = done, total
+            self._report(status)
+
+        while not self._stop.is_set():
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+
+            if wait_for_new_card and not first and not self._wait_for_card(reader, status):
+                self._jobs.put(job)
+                break
+            first = False
+
+            result = error = skipped = None
+            self._report(status, "running", job.kind)
+            try:
+                atr = device.connect()
+                if device.verify_at24c64(atr):
+                    result = job.run(device, progress)
+                else:
+                    skipped = identify_card(atr)
+            except Exception as e:
+                error = e
+            finally:
+                try:
+                    device.disconnect()
+                except Exception as e:
+                    self.log(f"[{reader}] Disconnect error: {str(e)}")
+
+            if skipped:
+                # Leave the job to the next EEPROM card, here or in another reader
+                self._jobs.put(job)
+                self.log(f"[{reader}] Skipped: {skipped} is not an I²C EEPROM")
+                self._report(status, "skipped", f"Skipped: {skipped}")
+                if not wait_for_new_card:
+                    break
+                continue
+
+            failed = error is not None or getattr(result, "ok", True) is False or (
+                job.kind == "verify" and bool(result))
+            if failed:
+                status.cards_failed += 1
+            else:
+                status.cards_done += 1
+            self._report(status, "failed" if failed else "done",
+                         str(error) if error else describe_result(job, result))
+            if self.on_result:
+                self.on_result(status, job, result, error)
+
+        self._report(status, "stopped" if self._stop.is_set() else "finished")
+
+
+def describe_result(job, result):
+    """One-line description of a job result for status displays"""
+    if job.kind == "dump":
+        return f"Saved dump {result.label}"
+    if job.kind == "clone":
+        return result.summary()
+    if result:
+        return f"Pages differ: {', '.join(str(p) for p in result)}"
+    return "Card matches"
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Provision AT24C64 cards on every attached reader")
+    parser.add_argument("kind", choices=JOB_KINDS)
+    parser.add_argument("file", nargs="?", help="Dump file, stored dump id or 'latest' for clone/verify")
+    parser.add_argument("--count", type=int, help="Number of cards (default: one per reader)")
+    parser.add_argument("--delta", action="store_true", help="Only write pages that differ")
+    parser.add_argument("--store", default=STORE_FILE, help="Dump store file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
+
+    store = DumpStore(args.store)
+    data = None
+    if args.kind != "dump":
+        if not args.file:
+            parser.error(f"{args.kind} needs a memory image file")
+        try:
+            data = load_image(args.file, store)
+        except (KeyError, ValueError, OSError) as e:
+            logging.error(str(e))
+            return 1
+
+    def on_result(status, job, result, error):
+        if error:
+            logging.error("[%s] %s failed: %s", status.reader, job.kind, error)
+        else:
+            logging.info("[%s] %s", status.reader, describe_result(job, result))
+
+    pool = ProvisioningPool(on_result=on_result)
+    try:
+        statuses = pool.run(ProvisionJob(args.kind, data, args.delta, store), args.count)
+    except (CardError, ValueError) as e:
+        logging.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pool.stop()
+        pool.join()
+        return 1
+
+    failed = sum(status.cards_failed for status in statuses.values())
+    done = sum(status.cards_done for status in statuses.values())
+    logging.info("%d cards done, %d failed", done, failed)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
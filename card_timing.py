@@ -0,0 +1,150 @@
+"""Adaptive write-cycle timing for EEPROM and SLE memory cards.
+
+Instead of sleeping for a fixed worst case after every write, WriteTimer
+polls the card (by status word or by reading the data back) with a short
+exponential backoff until the write cycle has finished. The delay before the
+first poll is learned per reader/card pair and stored in a ReaderProfile so
+later sessions start from the minimum delay that worked.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+PROFILE_FILE = "reader_profiles.json"
+
+# SW1 of answers worth polling again: 64 = the chip did not acknowledge (busy
+# in its write cycle), 6F = transfer error. Anything else is final.
+RETRY_SW1 = (0x64, 0x6F)
+
+_profile_lock = threading.Lock()
+
+
+def profile_key(reader, atr):
+    """Key identifying a reader/card pair in the profile file"""
+    return f"{reader}|{' '.join(f'{b:02X}' for b in atr)}"
+
+
+class ReaderProfile:
+    """Tuning values learned for one reader/card pair"""
+
+    def __init__(self, key, values=None, path=PROFILE_FILE):
+        self.key = key
+        self.values = dict(values or {})
+        self.path = path
+        self.dirty = False
+
+    @classmethod
+    def load(cls, reader, atr, path=PROFILE_FILE):
+        key = profile_key(reader, atr)
+        return cls(key, cls._read_file(path).get(key), path)
+
+    @staticmethod
+    def _read_file(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable reader profile file {path}: {str(e)}")
+            return {}
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def set(self, name, value):
+        if self.values.get(name) != value:
+            self.values[name] = value
+            self.dirty = True
+
+    def save(self):
+        """Merge this profile into the profile file if anything changed"""
+        if not self.dirty or not self.path:
+            return
+        with _profile_lock:
+            profiles = self._read_file(self.path)
+            profiles[self.key] = self.values
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(profiles, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+class WriteTimer:
+    """Waits for a write cycle to complete by polling with backoff"""
+
+    def __init__(self, profile=None, name="write_cycle", initial_delay=0.0,
+                 timeout=0.1, first_poll=0.0005, max_poll=0.01):
+        self.profile = profile
+        self.name = name
+        self.timeout = timeout
+        self.first_poll = first_poll
+        self.max_poll = max_poll
+        self.delay = initial_delay
+        self.slept = 0.0  # Total time spent sleeping, for benchmarks
+        if profile is not None:
+            self.delay = profile.get(name, initial_delay)
+
+    def wait_until(self, check, settle=True):
+        """Call check() until it returns True or the timeout expires.
+
+        With settle=True the learned delay is slept before the first check;
+        further checks back off exponentially. check() may return None to
+        stop polling at once. Returns True on success.
+        """
+        start = time.perf_counter()
+        if settle and self.delay:
+            time.sleep(self.delay)
+            self.slept += self.delay
+        interval = self.first_poll
+        polls = 0
+        while True:
+            polls += 1
+            result = check()
+            if result:
+                if settle:
+                    self.learn(time.perf_counter() - start, polls)
+                return True
+            if result is None:
+                return False
+            if time.perf_counter() - start >= self.timeout:
+                return False
+            time.sleep(interval)
+            self.slept += interval
+            interval = min(interval * 2, self.max_poll)
+
+    def transmit_until_ok(self, transmit, apdu, settle=True):
+        """Send an APDU until the card answers SW1=0x90 (ACK polling).
+
+        Only busy/transfer errors (RETRY_SW1) are retried; any other status
+        word ends the polling. Returns the last (response, sw1, sw2),
+        successful or not.
+        """
+        last = []
+
+        def accepted():
+            last[:] = [transmit(apdu)]
+            sw1 = last[0][1]
+            if sw1 == 0x90:
+                return True
+            return False if sw1 in RETRY_SW1 else None
+
+        self.wait_until(accepted, settle)
+        return last[0]
+
+    def learn(self, elapsed, polls):
+        """Adjust the delay before the first poll from the last observation"""
+        if polls == 1:
+            # The first poll already succeeded, so try waiting a little less
+            delay = self.delay * 0.9
+        else:
+            # It took longer than the learned delay; start polling later next time
+            delay = min(elapsed, self.timeout)
+        delay = round(delay, 5)
+        if delay != self.delay:
+            self.delay = delay
+            if self.profile is not None:
+                self.profile.set(self.name, delay)
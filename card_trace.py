@@ -0,0 +1,277 @@
+"""APDU tracing and latency statistics.
+
+When a device has an ApduTracer, CardDevice.transmit records every APDU it
+sends: its command class (read, write, verify, pin, protection...), size,
+latency and status word. The tracer keeps latency histograms per command
+class and per reader, can export them as JSON or CSV, and can append every
+exchange to a trace file (one JSON object per line) that ReplayConnection or
+`python card_trace.py replay` plays back later:
+
+    python card_trace.py summary clone_trace.jsonl
+    python card_trace.py replay clone_trace.jsonl
+
+Recording costs two perf_counter() calls and a few dict updates per APDU.
+"""
+import csv
+import json
+import threading
+import time
+
+# Command class of each memory card INS byte
+COMMAND_CLASSES = {
+    0xB0: "read",
+    0xB1: "read",
+    0xCA: "read",
+    0xB2: "protection",
+    0xD1: "protection",
+    0xD0: "write",
+    0xD6: "write",
+    0xFE: "write",
+    0xF0: "write",
+    0x20: "pin",
+}
+
+
+def command_class(apdu):
+    """Command class of an APDU from its INS byte"""
+    return COMMAND_CLASSES.get(apdu[1], "other") if len(apdu) > 1 else "other"
+
+
+class LatencyHistogram:
+    """Count, total, extremes and power-of-two microsecond buckets of latencies"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.buckets = {}  # Bucket b holds latencies below 2**b microseconds
+
+    def add(self, seconds, sent, received, ok):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.bytes_out += sent
+        self.bytes_in += received
+        if not ok:
+            self.errors += 1
+        bucket = int(seconds * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound in seconds of the bucket holding the given fraction of samples"""
+        if not self.count:
+            return 0.0
+        needed = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= needed:
+                return min(2 ** bucket / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_s": round(self.total, 6),
+            "mean_ms": round(self.mean * 1000, 3),
+            "min_ms": round((self.min or 0.0) * 1000, 3),
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "buckets_us": {str(2 ** bucket): count for bucket, count in sorted(self.buckets.items())},
+        }
+
+
+class ApduTracer:
+    """Collects latency histograms of the APDUs sent by one or more devices.
+
+    Histograms are keyed by ("op", class) and ("reader", name); with
+    trace_file every exchange is also appended to that file.
+    """
+
+    FIELDS = ("group", "name", "count", "errors", "total_s", "mean_ms", "min_ms",
+              "p50_ms", "p95_ms", "max_ms", "bytes_out", "bytes_in")
+
+    def __init__(self, trace_file=None):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.started = time.time()
+        self.trace = open(trace_file, "a", encoding="ascii") if trace_file else None
+
+    def transmit(self, transmit, apdu, reader=None, op=None):
+        """Send apdu with transmit(apdu), record the exchange and return its result"""
+        start = time.perf_counter()
+        response, sw1, sw2 = result = transmit(apdu)
+        self.record(apdu, response, sw1, sw2, time.perf_counter() - start, reader, op)
+        return result
+
+    def record(self, apdu, response, sw1, sw2, seconds, reader=None, op=None):
+        op = op or command_class(apdu)
+        ok = sw1 in (0x90, 0x61)
+        with self.lock:
+            for key in (("op", op), ("reader", str(reader))):
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = LatencyHistogram()
+                histogram.add(seconds, len(apdu), len(response), ok)
+            if self.trace:
+                self.trace.write(json.dumps({
+                    "t": round(time.time(), 6), "reader": str(reader), "op": op,
+                    "apdu": bytes(apdu).hex(), "response": bytes(response).hex(),
+                    "sw": f"{sw1:02X}{sw2:02X}", "ms": round(seconds * 1000, 3),
+                }) + "\n")
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.started = time.time()
+
+    def close(self):
+        with self.lock:
+            if self.trace:
+                self.trace.close()
+                self.trace = None
+
+    def rows(self):
+        """One dict per histogram, ops first, in FIELDS order"""
+        with self.lock:
+            items = sorted(self.histograms.items())
+            rows = []
+            for (group, name), histogram in items:
+                row = {"group": group, "name": name}
+                row.update(histogram.to_dict())
+                rows.append(row)
+        return rows
+
+    def summary(self):
+        lines = []
+        for row in self.rows():
+            lines.append(f"{row['group']:>6} {row['name']:<12} {row['count']:6d} APDUs  "
+                         f"mean {row['mean_ms']:.2f} ms  p95 {row['p95_ms']:.2f} ms  "
+                         f"max {row['max_ms']:.2f} ms  total {row['total_s']:.3f} s  "
+                         f"{row['errors']} errors")
+        return "\n".join(lines)
+
+    def export_json(self, filename):
+        with open(filename, "w") as f:
+            json.dump({"started": self.started, "histograms": self.rows()}, f, indent=2)
+
+    def export_csv(self, filename):
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+
+def load_trace(filename):
+    """Yield the exchanges of a trace file as dicts with bytes apdu/response and int sw1/sw2"""
+    with open(filename, "r", encoding="ascii") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            entry["apdu"] = bytes.fromhex(entry["apdu"])
+            entry["response"] = bytes.fromhex(entry["response"])
+            entry["sw1"], entry["sw2"] = int(entry["sw"][:2], 16), int(entry["sw"][2:], 16)
+            yield entry
+
+
+class ReplayConnection:
+    """Connection stand-in that answers APDUs from a recorded trace, in order.
+
+    With strict=True an APDU that differs from the recorded one raises
+    ValueError, so a changed command sequence is caught.
+    """
+
+    def __init__(self, entries, atr=(), strict=True):
+        self.entries = list(entries)
+        self.position = 0
+        self.atr = list(atr)
+        self.strict = strict
+
+    def connect(self, protocol=None):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def getATR(self):
+        return self.atr
+
+    def transmit(self, apdu):
+        if self.position >= len(self.entries):
+            raise ValueError("Trace exhausted")
+        entry = self.entries[self.position]
+        if self.strict and bytes(apdu) != entry["apdu"]:
+            raise ValueError(f"APDU {self.position} is {bytes(apdu).hex()}, trace has {entry['apdu'].hex()}")
+        self.position += 1
+        return list(entry["response"]), entry["sw1"], entry["sw2"]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize or replay APDU trace files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary_parser = sub.add_parser("summary", help="Latency histograms of a trace file")
+    summary_parser.add_argument("trace")
+    summary_parser.add_argument("--json", metavar="FILE", help="Also export the histograms as JSON")
+    summary_parser.add_argument("--csv", metavar="FILE", help="Also export the histograms as CSV")
+    replay_parser = sub.add_parser("replay", help="Send the APDUs of a trace to a card and compare")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument("--reader", type=int, default=0, help="Reader index")
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        tracer = ApduTracer()
+        for entry in load_trace(args.trace):
+            tracer.record(entry["apdu"], entry["response"], entry["sw1"], entry["sw2"],
+                          entry["ms"] / 1000, entry.get("reader"), entry.get("op"))
+        print(tracer.summary())
+        if args.json:
+            tracer.export_json(args.json)
+        if args.csv:
+            tracer.export_csv(args.csv)
+        return 0
+
+    from card_device import CardDevice, list_readers
+
+    reader_list = list_readers()
+    if args.reader >= len(reader_list):
+        print("Reader not found")
+        return 1
+    tracer = ApduTracer()
+    device = CardDevice(reader_list[args.reader])
+    device.tracer = tracer
+    device.connect()
+    mismatches = 0
+    try:
+        for index, entry in enumerate(load_trace(args.trace)):
+            response, sw1, sw2 = device.transmit(list(entry["apdu"]), entry.get("op"))
+            if (bytes(response), sw1, sw2) != (entry["response"], entry["sw1"], entry["sw2"]):
+                mismatches += 1
+                print(f"{index}: {entry['apdu'].hex()} -> {bytes(response).hex()} {sw1:02X}{sw2:02X}, "
+                      f"trace has {entry['response'].hex()} {entry['sw']}")
+    finally:
+        device.disconnect()
+    print(tracer.summary())
+    print(f"{mismatches} responses differ from the trace")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
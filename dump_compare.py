@@ -0,0 +1,176 @@
+"""Byte-level comparison of memory dumps.
+
+Both dumps are memory-mapped and compared a block at a time, so images much
+larger than the AT24C64's 8 KB never have to be read into memory at once.
+Each block is compared with NumPy when it is installed, otherwise by XOR-ing
+the block as one big integer and scanning the result for non-zero bytes; both
+run at C speed. The result is a compact list of differing byte ranges:
+
+    python dump_compare.py at24c64_dump_20241209_235401.bin at24c64_dump_20241210_002943.bin
+"""
+import mmap
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BLOCK_SIZE = 1 << 20  # Bytes compared per step
+PAGE_SIZE = 32  # AT24C64 page size, used to report page numbers
+DIFF, EXTRA = "diff", "extra"  # DiffRun kinds, also the tag names HexView highlights them with
+
+_NONZERO_RUN = re.compile(rb"[^\x00]+")
+
+
+class DiffRun:
+    """A range of bytes that differs between two dumps.
+
+    kind is DIFF where both dumps hold different bytes, or EXTRA for the
+    tail that only the longer dump has.
+    """
+
+    def __init__(self, offset, length, page_size=PAGE_SIZE, kind=DIFF):
+        self.offset = offset
+        self.length = length
+        self.page_size = page_size
+        self.kind = kind
+
+    @property
+    def end(self):
+        return self.offset + self.length
+
+    @property
+    def first_page(self):
+        return self.offset // self.page_size
+
+    @property
+    def last_page(self):
+        return (self.end - 1) // self.page_size
+
+    def __repr__(self):
+        return f"DiffRun({self.offset:#06x}, {self.length}, {self.kind})"
+
+    def describe(self):
+        pages = f"page {self.first_page}"
+        if self.last_page != self.first_page:
+            pages = f"pages {self.first_page}-{self.last_page}"
+        return f"{self.offset:04X}-{self.end - 1:04X} ({self.length} bytes, {pages}, {self.kind})"
+
+
+class DumpDiff:
+    """Outcome of comparing two dumps"""
+
+    def __init__(self, size1, size2, runs, page_size=PAGE_SIZE):
+        self.size1 = size1
+        self.size2 = size2
+        self.runs = runs
+        self.page_size = page_size
+
+    @property
+    def identical(self):
+        return not self.runs
+
+    @property
+    def size_mismatch(self):
+        return self.size1 != self.size2
+
+    @property
+    def differing_bytes(self):
+        return sum(run.length for run in self.runs)
+
+    def pages(self):
+        """Sorted page numbers that contain at least one differing byte"""
+        pages = set()
+        for run in self.runs:
+            pages.update(range(run.first_page, run.last_page + 1))
+        return sorted(pages)
+
+    def summary(self):
+        if self.identical:
+            return f"Dumps are identical ({self.size1} bytes)"
+        text = f"{self.differing_bytes} bytes differ in {len(self.runs)} runs across {len(self.pages())} pages"
+        if self.size_mismatch:
+            text += f"; sizes differ ({self.size1} vs {self.size2} bytes)"
+        return text
+
+
+def _block_runs(block1, block2):
+    """Yield (start, end) of the differing runs in two equal-length blocks"""
+    if numpy is not None:
+        diff = numpy.frombuffer(block1, dtype=numpy.uint8) != numpy.frombuffer(block2, dtype=numpy.uint8)
+        # Run edges are where the mask flips; pad so runs touching the ends are closed
+        edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([False], diff, [False])).view(numpy.int8)))
+        for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+            yield start, end
+        return
+
+    length = len(block1)
+    xored = (int.from_bytes(block1, "little") ^ int.from_bytes(block2, "little")).to_bytes(length, "little")
+    for match in _NONZERO_RUN.finditer(xored):
+        yield match.start(), match.end()
+
+
+def compare_bytes(data1, data2, page_size=PAGE_SIZE, block_size=BLOCK_SIZE):
+    """Compare two buffers (bytes, memoryview, mmap...) and return a DumpDiff"""
+    view1, view2 = memoryview(data1), memoryview(data2)
+    common = min(len(view1), len(view2))
+    runs = []
+
+    for block_start in range(0, common, block_size):
+        block_end = min(block_start + block_size, common)
+        block1, block2 = view1[block_start:block_end], view2[block_start:block_end]
+        if block1 == block2:
+            continue
+        for start, end in _block_runs(block1, block2):
+            start += block_start
+            end += block_start
+            if runs and runs[-1].end == start:
+                # A run that continues across the block boundary
+                runs[-1].length += end - start
+            else:
+                runs.append(DiffRun(start, end - start, page_size))
+
+    if len(view1) != len(view2):
+        runs.append(DiffRun(common, max(len(view1), len(view2)) - common, page_size, EXTRA))
+    return DumpDiff(len(view1), len(view2), runs, page_size)
+
+
+def _map(f):
+    """Memory-map an open file read-only; empty files map to b\"\" """
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        return b""
+
+
+def compare_files(path1, path2, page_size=PAGE_SIZE, block_size=BLOCK_SIZE):
+    """Memory-map two dump files and compare them byte by byte"""
+    with open(path1, "rb") as f1, open(path2, "rb") as f2:
+        map1, map2 = _map(f1), _map(f2)
+        try:
+            return compare_bytes(map1, map2, page_size, block_size)
+        finally:
+            for mapped in (map1, map2):
+                if isinstance(mapped, mmap.mmap):
+                    mapped.close()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare two memory dumps byte by byte")
+    parser.add_argument("dump1")
+    parser.add_argument("dump2")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args(argv)
+
+    diff = compare_files(args.dump1, args.dump2, args.page_size)
+    for run in diff.runs:
+        print(run.describe())
+    print(diff.summary())
+    return 0 if diff.identical else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,307 @@
+"""N-way analysis of an archive of memory dumps.
+
+Every dump in a directory is read once. Identical dumps are grouped by
+content hash, and for every byte offset the analysis reports whether the
+value is constant across the fleet, takes one of a small set of values, or
+varies so much it looks random (serials, counters, keys). Per page this gives
+a variability map of which regions hold static firmware and which hold
+per-card data:
+
+    python dump_fleet.py archive/ --workers 8
+    python dump_fleet.py --store dump_store.db
+
+Dumps are processed in batches on all cores. Work and memory grow linearly
+with the number of dumps: each worker folds the pages of its batch into
+per-page counters of distinct contents, which the parent merges.
+"""
+import fnmatch
+import functools
+import hashlib
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from dump_store import DumpStore, STORE_FILE
+
+DUMP_PATTERN = "at24c64_dump_*.bin"
+PAGE_SIZE = 32
+BATCH_SIZE = 256  # Dumps per worker task
+
+SMALL_SET = 8  # Offsets with at most this many distinct values are "small set"
+MAX_DISTINCT_PAGES = 4096  # Distinct contents kept per page before folding into histograms
+
+CONSTANT, SMALL, RANDOM = "constant", "small set", "random"
+MAP_SYMBOLS = {CONSTANT: ".", SMALL: "s", RANDOM: "R"}
+
+
+def find_dumps(directory, pattern=DUMP_PATTERN):
+    """Yield the paths of the dump files in directory, streaming the listing"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and fnmatch.fnmatch(entry.name, pattern):
+                yield entry.path
+
+
+def find_stored_dumps(store_file=STORE_FILE):
+    """Return (id, label) of every dump in a dump store, oldest first"""
+    store = DumpStore(store_file)
+    try:
+        return [(record.id, record.label) for record in reversed(store.records())]
+    finally:
+        store.close()
+
+
+def count_dump(groups, pages, name, data, page_size):
+    """Fold one dump into the batch's groups and per-page counters"""
+    groups.setdefault(hashlib.blake2b(data, digest_size=16).hexdigest(), []).append(name)
+    for page in range((len(data) + page_size - 1) // page_size):
+        pages.setdefault(page, Counter())[data[page * page_size:(page + 1) * page_size]] += 1
+
+
+def analyze_batch(paths, page_size=PAGE_SIZE):
+    """Hash a batch of dumps; return (digest -> paths, page index -> Counter of contents)"""
+    groups = {}
+    pages = {}
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        count_dump(groups, pages, path, data, page_size)
+    return groups, pages
+
+
+def analyze_store_batch(dumps, page_size=PAGE_SIZE, store_file=STORE_FILE):
+    """analyze_batch for (id, label) pairs of a dump store; groups list the labels"""
+    groups = {}
+    pages = {}
+    store = DumpStore(store_file)
+    try:
+        for dump_id, label in dumps:
+            try:
+                data = store.get(dump_id)
+            except KeyError:
+                continue
+            count_dump(groups, pages, label, data, page_size)
+    finally:
+        store.close()
+    return groups, pages
+
+
+class PageStats:
+    """Distinct contents of one page across the fleet, folded into per-offset
+    value histograms once there are too many to keep"""
+
+    def __init__(self, page, page_size=PAGE_SIZE):
+        self.page = page
+        self.page_size = page_size
+        self.samples = 0
+        self.contents = Counter()
+        self.histograms = None
+        self.overflowed = False  # True once distinct contents were folded away
+
+    def add(self, contents):
+        self.samples += sum(contents.values())
+        self.contents.update(contents)
+        if len(self.contents) > MAX_DISTINCT_PAGES:
+            self.fold()
+            self.overflowed = True
+
+    def fold(self):
+        if self.histograms is None:
+            self.histograms = [[0] * 256 for _ in range(self.page_size)]
+        for content, count in self.contents.items():
+            for offset, value in enumerate(content):
+                self.histograms[offset][value] += count
+        self.contents.clear()
+
+    def offset_classes(self):
+        """Classify each offset of the page as constant, small set or random"""
+        self.fold()
+        classes = []
+        for histogram in self.histograms:
+            distinct = sum(1 for count in histogram if count)
+            if distinct == 0:
+                break  # Past the end of every (short) dump
+            if distinct == 1:
+                classes.append(CONSTANT)
+            elif distinct <= SMALL_SET:
+                classes.append(SMALL)
+            else:
+                classes.append(RANDOM)
+        return classes
+
+
+class PageVariability:
+    """Summary of one page: how many of its bytes are constant, small-set or random"""
+
+    def __init__(self, page, classes, distinct_contents, samples):
+        self.page = page
+        self.classes = classes
+        self.constant = classes.count(CONSTANT)
+        self.small_set = classes.count(SMALL)
+        self.random = classes.count(RANDOM)
+        self.distinct_contents = distinct_contents  # None when too many to count
+        self.samples = samples
+
+    @property
+    def kind(self):
+        """The most variable class found in the page"""
+        if self.random:
+            return RANDOM
+        if self.small_set:
+            return SMALL
+        return CONSTANT
+
+
+class FleetReport:
+    """Result of analyzing a directory of dumps"""
+
+    def __init__(self, groups, pages, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        # Largest groups of identical dumps first
+        self.groups = sorted(groups.values(), key=len, reverse=True)
+        self.dumps = sum(len(paths) for paths in self.groups)
+        self.pages = []
+        for page in sorted(pages):
+            stats = pages[page]
+            distinct = None if stats.overflowed else len(stats.contents)
+            self.pages.append(PageVariability(page, stats.offset_classes(), distinct, stats.samples))
+
+    def offset_classes(self):
+        """Class of every byte offset, in address order"""
+        return [cls for page in self.pages for cls in page.classes]
+
+    def variable_ranges(self):
+        """Yield (start, end, class) for each run of non-constant offsets"""
+        start = None
+        classes = self.offset_classes()
+        for offset, cls in enumerate(classes + [CONSTANT]):
+            if start is not None and cls != classes[start]:
+                yield start, offset, classes[start]
+                start = None
+            if start is None and cls != CONSTANT:
+                start = offset
+
+    def variability_map(self, pages_per_line=16):
+        """One symbol per page: '.' static, 's' small set of values, 'R' random"""
+        lines = []
+        for first in range(0, len(self.pages), pages_per_line):
+            row = self.pages[first:first + pages_per_line]
+            lines.append(f"{first:4d}: " + "".join(MAP_SYMBOLS[page.kind] for page in row))
+        return "\n".join(lines)
+
+    def summary(self):
+        classes = self.offset_classes()
+        return (f"{self.dumps} dumps, {len(self.groups)} distinct; "
+                f"{classes.count(CONSTANT)} constant, {classes.count(SMALL)} small-set, "
+                f"{classes.count(RANDOM)} random offsets")
+
+
+def _batches(paths, size):
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def analyze_directory(directory, pattern=DUMP_PATTERN, page_size=PAGE_SIZE, workers=None,
+                      batch_size=BATCH_SIZE, progress=None):
+    """Analyze every dump in directory and return a FleetReport.
+
+    workers=1 runs in this process; otherwise batches are spread over a
+    process pool (os.cpu_count() processes by default). progress(dumps) is
+    called after each merged batch.
+    """
+    return analyze(find_dumps(directory, pattern), analyze_batch, page_size, workers, batch_size, progress)
+
+
+def analyze_store(store_file=STORE_FILE, page_size=PAGE_SIZE, workers=None,
+                  batch_size=BATCH_SIZE, progress=None):
+    """Analyze every dump in a dump store, like analyze_directory; each worker opens the store itself"""
+    return analyze(find_stored_dumps(store_file), functools.partial(analyze_store_batch, store_file=store_file),
+                   page_size, workers, batch_size, progress)
+
+
+def analyze(dumps, analyze_function, page_size=PAGE_SIZE, workers=None, batch_size=BATCH_SIZE, progress=None):
+    """Run analyze_function(batch, page_size) over batches of dumps and merge the results"""
+    groups = {}
+    pages = {}
+    done = 0
+
+    def merge(result):
+        nonlocal done
+        batch_groups, batch_pages = result
+        for digest, paths in batch_groups.items():
+            groups.setdefault(digest, []).extend(paths)
+            done += len(paths)
+        for page, contents in batch_pages.items():
+            if page not in pages:
+                pages[page] = PageStats(page, page_size)
+            pages[page].add(contents)
+        if progress:
+            progress(done)
+
+    batches = _batches(dumps, batch_size)
+    if workers == 1:
+        for batch in batches:
+            merge(analyze_function(batch, page_size))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for batch in batches:
+                pending.append(pool.submit(analyze_function, batch, page_size))
+                # Keep a bounded number of batches in flight
+                if len(pending) >= 2 * workers:
+                    merge(pending.pop(0).result())
+            for future in pending:
+                merge(future.result())
+
+    return FleetReport(groups, pages, page_size)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyze an archive of memory dumps")
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("--pattern", default=DUMP_PATTERN, help="File name pattern of the dumps")
+    parser.add_argument("--store", metavar="FILE", help="Analyze the dumps in a dump store (e.g. dump_store.db) "
+                                                       "instead of a directory")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--groups", type=int, default=10, help="Number of dump groups to list")
+    args = parser.parse_args(argv)
+
+    if args.store:
+        if not os.path.exists(args.store):
+            parser.error(f"No dump store {args.store}")
+        report = analyze_store(args.store, args.page_size, args.workers)
+    else:
+        report = analyze_directory(args.directory, args.pattern, args.page_size, args.workers)
+    if not report.dumps:
+        print("No dumps found")
+        return 1
+
+    print(report.summary())
+    print("\nLargest groups of identical dumps:")
+    for paths in report.groups[:args.groups]:
+        print(f"  {len(paths):6d} x {paths[0] if args.store else os.path.basename(paths[0])}")
+
+    print("\nVariable regions:")
+    for start, end, cls in report.variable_ranges():
+        print(f"  {start:04X}-{end - 1:04X} ({end - start} bytes, page {start // args.page_size}): {cls}")
+
+    print("\nPage variability map ('.' static, 's' small set, 'R' random):")
+    print(report.variability_map())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
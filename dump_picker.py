@@ -0,0 +1,118 @@
+"""Tk dialog for finding dumps in the dump catalog.
+
+The dialog never lists the whole store: it runs DumpStore.query() with the
+entered filters and shows one page of results at a time, so it opens as fast
+with 100k dumps as with ten.
+"""
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+PAGE_ROWS = 100
+
+
+class DumpPicker:
+    """Filterable, paged list of stored dumps.
+
+    on_pick(records) is called with the selected DumpRecords when the action
+    button is pressed; with pick=2 exactly two must be selected.
+    """
+
+    FILTERS = (("atr", "ATR prefix:"), ("card_type", "Card type:"), ("reader", "Reader:"),
+               ("since", "From (YYYY-MM-DD):"), ("until", "To (YYYY-MM-DD):"), ("content_hash", "Content hash:"))
+
+    def __init__(self, root, store, title, action, on_pick, pick=1, filters=None):
+        self.store = store
+        self.on_pick = on_pick
+        self.pick = pick
+        self.cursors = [None]  # "before" id of each page visited so far
+        self.records = {}
+
+        self.window = tk.Toplevel(root)
+        self.window.title(title)
+        self.window.geometry("900x500")
+
+        filter_frame = ttk.LabelFrame(self.window, text="Filters", padding="5")
+        filter_frame.pack(fill="x", padx=5, pady=5)
+        self.filter_vars = {}
+        for index, (name, label) in enumerate(self.FILTERS):
+            ttk.Label(filter_frame, text=label).grid(row=index // 3, column=(index % 3) * 2, padx=5, pady=2, sticky="e")
+            var = tk.StringVar(value=(filters or {}).get(name) or "")
+            if name == "card_type":
+                widget = ttk.Combobox(filter_frame, textvariable=var, width=18,
+                                      values=[""] + store.card_types())
+            else:
+                widget = ttk.Entry(filter_frame, textvariable=var, width=20)
+            widget.grid(row=index // 3, column=(index % 3) * 2 + 1, padx=5, pady=2, sticky="w")
+            widget.bind("<Return>", lambda event: self.search())
+            self.filter_vars[name] = var
+        ttk.Button(filter_frame, text="Search", command=self.search).grid(row=0, column=6, rowspan=2, padx=10)
+
+        columns = ("created", "card_type", "atr", "reader", "size", "hash")
+        self.tree = ttk.Treeview(self.window, columns=columns, show="tree headings",
+                                 selectmode="extended" if pick > 1 else "browse")
+        self.tree.heading("#0", text="Id")
+        self.tree.column("#0", width=60)
+        for column, heading, width in (("created", "Time", 140), ("card_type", "Card Type", 90),
+                                       ("atr", "ATR", 160), ("reader", "Reader", 150),
+                                       ("size", "Size", 60), ("hash", "Content Hash", 120)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width)
+        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
+        self.tree.bind("<Double-1>", lambda event: self.choose())
+
+        buttons = ttk.Frame(self.window, padding="5")
+        buttons.pack(fill="x")
+        ttk.Button(buttons, text="< Newer", command=self.previous_page).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Older >", command=self.next_page).pack(side=tk.LEFT, padx=5)
+        self.page_label = ttk.Label(buttons, text="")
+        self.page_label.pack(side=tk.LEFT, padx=10)
+        ttk.Button(buttons, text=action, command=self.choose).pack(side=tk.RIGHT, padx=5)
+
+        self.search()
+
+    def filters(self):
+        return {name: var.get().strip() or None for name, var in self.filter_vars.items()}
+
+    def search(self):
+        self.cursors = [None]
+        self.show_page()
+
+    def show_page(self):
+        try:
+            filters = self.filters()
+            records = self.store.query(before=self.cursors[-1], limit=PAGE_ROWS, **filters)
+            total = self.store.count(**filters)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid filter: {str(e)}", parent=self.window)
+            return
+
+        self.tree.delete(*self.tree.get_children())
+        self.records = {}
+        for record in records:
+            iid = str(record.id)
+            self.records[iid] = record
+            self.tree.insert("", tk.END, iid=iid, text=f"#{record.id}",
+                             values=(record.created, record.card_type or "", record.atr or "",
+                                     record.reader or "", record.size, record.hash[:16]))
+        self.next_cursor = records[-1].id if len(records) == PAGE_ROWS else None
+        first = (len(self.cursors) - 1) * PAGE_ROWS
+        self.page_label.config(text=f"{first + 1 if records else 0}-{first + len(records)} of {total}")
+
+    def next_page(self):
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+            self.show_page()
+
+    def previous_page(self):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+            self.show_page()
+
+    def choose(self):
+        records = [self.records[iid] for iid in self.tree.selection()]
+        if len(records) != self.pick:
+            messagebox.showwarning("Warning", f"Please select {self.pick} dump{'s' if self.pick > 1 else ''}",
+                                   parent=self.window)
+            return
+        self.window.destroy()
+        self.on_pick(records)
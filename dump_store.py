@@ -0,0 +1,335 @@
+"""Content-addressed, deduplicated store for card memory dumps.
+
+Dumps are split into page-sized chunks addressed by their hash, so storage
+only grows with content that has not been seen before: identical pages are
+kept once across all dumps, and an identical dump costs one metadata row.
+Everything lives in a single SQLite file (dump_store.db by default):
+
+    chunks  hash -> page bytes
+    images  content hash -> size, page size and the list of chunk hashes
+    dumps   id, time, reader, ATR, card type -> image hash
+
+Dump ids grow with every dump, so the latest dump is one index lookup. The
+dumps table doubles as the dump catalog: ATR, card type, reader, time, size
+and content hash are indexed, and query() filters and pages through them
+with keyset paging so it stays fast with hundreds of thousands of dumps.
+Dump files from older versions can be imported with
+
+    python dump_store.py import .
+"""
+import datetime
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+from hex_format import write_hex_dump
+
+STORE_FILE = "dump_store.db"
+PAGE_SIZE = 32
+DIGEST_SIZE = 16
+
+LEGACY_DUMP = re.compile(r"at24c64_dump_(\d{8}_\d{6})(?:_\d+)?\.bin$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    hash BLOB PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS images (
+    hash BLOB PRIMARY KEY,
+    size INTEGER NOT NULL,
+    page_size INTEGER NOT NULL,
+    chunks BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dumps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    reader TEXT,
+    atr TEXT,
+    card_type TEXT,
+    image BLOB NOT NULL REFERENCES images(hash)
+);
+CREATE INDEX IF NOT EXISTS dumps_atr ON dumps (atr, id);
+CREATE INDEX IF NOT EXISTS dumps_card_type ON dumps (card_type, id);
+CREATE INDEX IF NOT EXISTS dumps_reader ON dumps (reader, id);
+CREATE INDEX IF NOT EXISTS dumps_created ON dumps (created, id);
+CREATE INDEX IF NOT EXISTS dumps_image ON dumps (image, id);
+CREATE INDEX IF NOT EXISTS images_size ON images (size);
+"""
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+class DumpRecord:
+    """Metadata of one stored dump"""
+
+    def __init__(self, id, created, reader, atr, card_type, size, hash):
+        self.id = id
+        self.created = created
+        self.reader = reader
+        self.atr = atr
+        self.card_type = card_type
+        self.size = size
+        self.hash = hash  # Hex content hash of the whole dump
+
+    @property
+    def label(self):
+        """Short description for lists and window titles"""
+        text = f"#{self.id} {self.created}"
+        if self.card_type:
+            text += f" {self.card_type}"
+        if self.reader:
+            text += f" [{self.reader}]"
+        return text
+
+    def __repr__(self):
+        return f"DumpRecord({self.label})"
+
+
+class DumpStore:
+    """Deduplicated dump repository in one SQLite file; safe to share between threads"""
+
+    _RECORD_QUERY = ("SELECT dumps.id, dumps.created, dumps.reader, dumps.atr, dumps.card_type, "
+                     "images.size, images.hash FROM dumps JOIN images ON images.hash = dumps.image")
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def put(self, data, reader=None, atr=None, card_type=None, page_size=PAGE_SIZE, created=None):
+        """Store a dump and return its DumpRecord; only unseen pages take space"""
+        data = bytes(data)
+        if created is None:
+            created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        image = digest(data)
+
+        with self._lock, self._db:
+            if self._db.execute("SELECT 1 FROM images WHERE hash = ?", (image,)).fetchone() is None:
+                chunks = [data[offset:offset + page_size] for offset in range(0, len(data), page_size)]
+                hashes = [digest(chunk) for chunk in chunks]
+                self._db.executemany("INSERT OR IGNORE INTO chunks (hash, data) VALUES (?, ?)",
+                                     zip(hashes, chunks))
+                self._db.execute("INSERT INTO images (hash, size, page_size, chunks) VALUES (?, ?, ?, ?)",
+                                 (image, len(data), page_size, b"".join(hashes)))
+            cursor = self._db.execute(
+                "INSERT INTO dumps (created, reader, atr, card_type, image) VALUES (?, ?, ?, ?, ?)",
+                (created, reader, atr, card_type, image))
+        return DumpRecord(cursor.lastrowid, created, reader, atr, card_type, len(data), image.hex())
+
+    def get(self, dump_id):
+        """Return the bytes of a stored dump"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT images.chunks FROM dumps JOIN images ON images.hash = dumps.image "
+                "WHERE dumps.id = ?", (dump_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"No dump #{dump_id} in {self.path}")
+            hashes = [row[0][i:i + DIGEST_SIZE] for i in range(0, len(row[0]), DIGEST_SIZE)]
+
+            chunks = {}
+            unique = list(set(hashes))
+            for start in range(0, len(unique), 500):  # Stay below SQLite's parameter limit
+                batch = unique[start:start + 500]
+                chunks.update(self._db.execute(
+                    f"SELECT hash, data FROM chunks WHERE hash IN ({','.join('?' * len(batch))})", batch))
+        return b"".join(chunks[h] for h in hashes)
+
+    def record(self, dump_id):
+        with self._lock:
+            row = self._db.execute(self._RECORD_QUERY + " WHERE dumps.id = ?", (dump_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def latest(self, **filters):
+        """Return the most recent DumpRecord (matching the query() filters), or None"""
+        records = self.query(limit=1, **filters)
+        return records[0] if records else None
+
+    def records(self, limit=None):
+        """Return DumpRecords, newest first"""
+        query = self._RECORD_QUERY + " ORDER BY dumps.id DESC"
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def query(self, atr=None, card_type=None, reader=None, since=None, until=None,
+              size=None, content_hash=None, before=None, limit=100):
+        """Return matching DumpRecords, newest first, at most limit of them.
+
+        atr matches as a prefix ("3B 67"), since/until compare with the
+        "YYYY-MM-DD HH:MM:SS" creation time (a date alone works), and
+        content_hash is the hex hash (or its start) of the whole dump. For the next page
+        pass before=the id of the last record of this page.
+        """
+        where, params = self._filters(atr, card_type, reader, since, until, size, content_hash)
+        if before is not None:
+            where.append("dumps.id < ?")
+            params.append(before)
+        query = self._RECORD_QUERY
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY dumps.id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def count(self, **filters):
+        """Number of dumps, optionally matching the same filters as query()"""
+        where, params = self._filters(**filters)
+        query = "SELECT COUNT(*) FROM dumps"
+        if where:
+            query += " JOIN images ON images.hash = dumps.image WHERE " + " AND ".join(where)
+        with self._lock:
+            return self._db.execute(query, params).fetchone()[0]
+
+    def card_types(self):
+        """Distinct card types in the catalog, for filter lists"""
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT card_type FROM dumps WHERE card_type IS NOT NULL "
+                                    "ORDER BY card_type").fetchall()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _filters(atr=None, card_type=None, reader=None, since=None, until=None,
+                 size=None, content_hash=None):
+        where, params = [], []
+        if atr:
+            # Prefix match as a range so the index is used
+            where.append("dumps.atr >= ? AND dumps.atr < ?")
+            params += [atr, atr + "\uffff"]
+        if card_type:
+            where.append("dumps.card_type = ?")
+            params.append(card_type)
+        if reader:
+            where.append("dumps.reader = ?")
+            params.append(reader)
+        if since:
+            where.append("dumps.created >= ?")
+            params.append(since)
+        if until:
+            try:
+                # A bare date includes the whole day: stop before the next one
+                day = datetime.date.fromisoformat(until)
+            except ValueError:
+                where.append("dumps.created <= ?")
+                params.append(until)
+            else:
+                where.append("dumps.created < ?")
+                params.append((day + datetime.timedelta(days=1)).isoformat())
+        if size is not None:
+            where.append("images.size = ?")
+            params.append(size)
+        if content_hash:
+            digits = content_hash.replace(" ", "")
+            if len(digits) == 2 * DIGEST_SIZE:
+                where.append("dumps.image = ?")
+                params.append(bytes.fromhex(digits))
+            else:
+                # A shortened hash, as shown in lists, matches as a prefix; an
+                # odd number of digits fixes only the top nibble of the last byte
+                width = (len(digits) + 1) // 2
+                step = 1 << (8 * width - 4 * len(digits))
+                low = int(digits, 16) * step
+                where.append("dumps.image >= ?")
+                params.append(low.to_bytes(width, "big"))
+                if low + step < 1 << (8 * width):
+                    where.append("dumps.image < ?")
+                    params.append((low + step).to_bytes(width, "big"))
+        return where, params
+
+    def export(self, dump_id, filename, hex_dump=False):
+        """Write a stored dump to a .bin file, or as a hex/ASCII text dump"""
+        data = self.get(dump_id)
+        if hex_dump:
+            write_hex_dump(data, filename)
+            return
+        with open(filename, "wb") as f:
+            f.write(data)
+
+    def import_file(self, filename, **metadata):
+        """Store a dump file; legacy at24c64_dump_<timestamp>.bin names keep their time"""
+        match = LEGACY_DUMP.search(os.path.basename(filename))
+        if match and "created" not in metadata:
+            metadata["created"] = datetime.datetime.strptime(
+                match.group(1), "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+        with open(filename, "rb") as f:
+            return self.put(f.read(), **metadata)
+
+    def import_directory(self, directory="."):
+        """Import the legacy timestamped dump files of a directory, oldest first"""
+        names = sorted(name for name in os.listdir(directory) if LEGACY_DUMP.match(name))
+        return [self.import_file(os.path.join(directory, name), card_type="AT24C64") for name in names]
+
+    @staticmethod
+    def _record(row):
+        id, created, reader, atr, card_type, size, image = row
+        return DumpRecord(id, created, reader, atr, card_type, size, image.hex())
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the deduplicated dump store")
+    parser.add_argument("--store", default=STORE_FILE, help="Store file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="Import legacy at24c64_dump_*.bin files")
+    import_parser.add_argument("directory", nargs="?", default=".")
+    list_parser = sub.add_parser("list", help="List the newest dumps")
+    list_parser.add_argument("--limit", type=int, default=20)
+    list_parser.add_argument("--atr", help="ATR prefix, e.g. '3B 67'")
+    list_parser.add_argument("--card-type")
+    list_parser.add_argument("--reader")
+    list_parser.add_argument("--since", help="YYYY-MM-DD[ HH:MM:SS]")
+    list_parser.add_argument("--until", help="YYYY-MM-DD[ HH:MM:SS]")
+    list_parser.add_argument("--hash", help="Content hash of the whole dump")
+    export_parser = sub.add_parser("export", help="Write a stored dump to a file")
+    export_parser.add_argument("id", help="Dump id or 'latest'")
+    export_parser.add_argument("file")
+    export_parser.add_argument("--hex", action="store_true", help="Write a hex/ASCII text dump")
+    args = parser.parse_args(argv)
+
+    if args.command == "list" and args.hash:
+        try:
+            int(args.hash.replace(" ", ""), 16)
+        except ValueError:
+            parser.error(f"--hash must be hex digits, not {args.hash!r}")
+
+    store = DumpStore(args.store)
+    try:
+        if args.command == "import":
+            records = store.import_directory(args.directory)
+            print(f"Imported {len(records)} dumps")
+        elif args.command == "list":
+            for record in store.query(args.atr, args.card_type, args.reader, args.since, args.until,
+                                      content_hash=args.hash, limit=args.limit):
+                print(f"{record.label}  {record.size} bytes  {record.hash}")
+        elif args.command == "export":
+            record = store.latest() if args.id == "latest" else store.record(int(args.id))
+            if record is None:
+                print(f"No dump {args.id}")
+                return 1
+            store.export(record.id, args.file, args.hex)
+            print(f"Wrote {record.label} to {args.file}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
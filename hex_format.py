@@ -0,0 +1,66 @@
+"""Hex/ASCII formatting of memory images, a whole row at a time.
+
+Each row is formatted with bytes.hex() for the hex column and a 256-entry
+translate table for the ASCII column, so no Python code runs per byte.
+write_hex_dump() streams rows to a file in batches and never holds the whole
+text of a large image in memory:
+
+    0000: 41 54 32 34 43 36 34 00 FF FF FF FF FF FF FF FF  AT24C64.........
+"""
+
+BYTES_PER_ROW = 16
+WRITE_ROWS = 4096  # Rows formatted per write() when streaming
+
+# Printable ASCII maps to itself, everything else to "."
+ASCII_TABLE = bytes(byte if 32 <= byte <= 126 else ord(".") for byte in range(256))
+
+
+def hex_bytes(data, sep=" "):
+    """Upper-case hex of data with sep between bytes, like smartcard.util.toHexString"""
+    return bytes(data).hex(sep).upper() if sep else bytes(data).hex().upper()
+
+
+def ascii_bytes(data):
+    """Printable ASCII of data with "." for every other byte"""
+    return bytes(data).translate(ASCII_TABLE).decode("ascii")
+
+
+def address_width(size):
+    """Hex digits needed for the largest offset of a size-byte image (at least 4)"""
+    return max(4, len(f"{max(size - 1, 0):X}"))
+
+
+def format_row(data, offset, bytes_per_row=BYTES_PER_ROW, width=4):
+    """Format bytes offset..offset+bytes_per_row-1 of data as one line"""
+    chunk = bytes(data[offset:offset + bytes_per_row])
+    hex_part = chunk.hex(" ").upper()
+    return (f"{offset:0{width}X}: {hex_part:<{3 * bytes_per_row - 1}}  "
+            + chunk.translate(ASCII_TABLE).decode("ascii"))
+
+
+def iter_rows(data, bytes_per_row=BYTES_PER_ROW, start_row=0, end_row=None):
+    """Yield the formatted lines of rows start_row..end_row-1 of data"""
+    view = memoryview(data)
+    width = address_width(len(view))
+    rows = (len(view) + bytes_per_row - 1) // bytes_per_row
+    end_row = rows if end_row is None else min(end_row, rows)
+    for row in range(start_row, end_row):
+        yield format_row(view, row * bytes_per_row, bytes_per_row, width)
+
+
+def format_hex_dump(data, bytes_per_row=BYTES_PER_ROW):
+    """The whole hex dump of data as one string"""
+    return "\n".join(iter_rows(data, bytes_per_row))
+
+
+def write_hex_dump(data, out, bytes_per_row=BYTES_PER_ROW):
+    """Stream the hex dump of data to out, a file name or anything with write()"""
+    if isinstance(out, str):
+        with open(out, "w", encoding="ascii") as f:
+            write_hex_dump(data, f, bytes_per_row)
+        return
+
+    view = memoryview(data)
+    rows = (len(view) + bytes_per_row - 1) // bytes_per_row
+    for start in range(0, rows, WRITE_ROWS):
+        out.write("\n".join(iter_rows(view, bytes_per_row, start, start + WRITE_ROWS)) + "\n")
@@ -0,0 +1,131 @@
+"""Virtualized hex/ASCII viewer for memory images of any size.
+
+HexView only formats the rows in the visible viewport (plus a few buffer
+rows) straight from a memoryview of the image, and re-renders them when the
+view scrolls. Opening a 512 KB image costs the same as opening 8 KB, and
+memory use does not grow with the image. Diff runs (see dump_compare) are
+highlighted per visible row.
+"""
+import bisect
+import tkinter as tk
+from tkinter import ttk, font as tkfont
+
+from dump_compare import DIFF, EXTRA
+from hex_format import address_width, format_row
+
+BUFFER_ROWS = 4  # Rows rendered below the viewport so resizing never shows a gap
+
+
+class HexView(ttk.Frame):
+    """Scrollable hex dump of data that renders only the visible rows.
+
+    runs is an optional list of DiffRun-like objects (offset, end, kind);
+    bytes inside them are tagged with the run's kind (DIFF or EXTRA) and,
+    when runs are given, all other bytes as "same". A single dump is shown
+    untagged.
+    on_scroll(first_row) is called whenever the view scrolls.
+    """
+
+    def __init__(self, parent, data, bytes_per_row=16, runs=None, on_scroll=None,
+                 font=("Courier", 10)):
+        super().__init__(parent)
+        self.data = memoryview(data)
+        self.bytes_per_row = bytes_per_row
+        self.rows = max(1, (len(self.data) + bytes_per_row - 1) // bytes_per_row)
+        self.address_width = address_width(len(self.data))
+        self.line_tag = "same" if runs is not None else ()
+        self.runs = sorted(runs or [], key=lambda run: run.offset)
+        self.run_ends = [run.end for run in self.runs]
+        self.on_scroll = on_scroll
+        self.first_row = 0
+        self.visible_rows = 1
+
+        self.text = tk.Text(self, wrap=tk.NONE, font=font, height=1)
+        self.text.tag_configure("same", background="#ccffcc")  # Light green for matches
+        self.text.tag_configure(DIFF, background="#ffcccc")  # Light red for differing bytes
+        self.text.tag_configure(EXTRA, background="#ffe0a0")  # Orange for bytes only one dump has
+        self.yscroll = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.xscroll = ttk.Scrollbar(self, orient="horizontal", command=self.text.xview)
+        self.text.configure(xscrollcommand=self.xscroll.set)
+
+        self.text.grid(row=0, column=0, sticky="nsew")
+        self.yscroll.grid(row=0, column=1, sticky="ns")
+        self.xscroll.grid(row=1, column=0, sticky="ew")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.line_height = tkfont.Font(font=font).metrics("linespace")
+        self.text.bind("<Configure>", self.resize)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.text.bind(sequence, self.wheel)
+        for key, rows in (("<Up>", -1), ("<Down>", 1)):
+            self.text.bind(key, lambda event, rows=rows: self.scroll_to(self.first_row + rows) or "break")
+        self.text.bind("<Prior>", lambda event: self.scroll_to(self.first_row - self.visible_rows) or "break")
+        self.text.bind("<Next>", lambda event: self.scroll_to(self.first_row + self.visible_rows) or "break")
+        self.render()
+
+    def format_row(self, row):
+        """Return the text of one row and the (start, end, tag) highlights in it"""
+        offset = row * self.bytes_per_row
+        line = format_row(self.data, offset, self.bytes_per_row, self.address_width)
+        end = min(offset + self.bytes_per_row, len(self.data))
+        return line, self.row_highlights(offset, end)
+
+    def row_highlights(self, start, end):
+        """Column ranges of the diff runs overlapping bytes start..end-1"""
+        highlights = []
+        hex_column = self.address_width + 2
+        ascii_column = hex_column + 3 * self.bytes_per_row + 1
+        index = bisect.bisect_right(self.run_ends, start)
+        while index < len(self.runs) and self.runs[index].offset < end:
+            run = self.runs[index]
+            first = max(run.offset, start) - start
+            last = min(run.end, end) - start
+            highlights.append((hex_column + 3 * first, hex_column + 3 * last - 1, run.kind))
+            highlights.append((ascii_column + first, ascii_column + last, run.kind))
+            index += 1
+        return highlights
+
+    def render(self):
+        """Format the rows in the viewport (and the buffer rows) into the text widget"""
+        self.text.configure(state="normal")
+        self.text.delete("1.0", tk.END)
+        last = min(self.rows, self.first_row + self.visible_rows + BUFFER_ROWS)
+        for line_number, row in enumerate(range(self.first_row, last), start=1):
+            line, highlights = self.format_row(row)
+            self.text.insert(tk.END, line + "\n", self.line_tag)
+            for start, end, tag in highlights:
+                self.text.tag_add(tag, f"{line_number}.{start}", f"{line_number}.{end}")
+        self.text.configure(state="disabled")
+        self.yscroll.set(self.first_row / self.rows,
+                         min(1.0, (self.first_row + self.visible_rows) / self.rows))
+
+    def scroll_to(self, row, notify=True):
+        row = max(0, min(int(row), self.rows - self.visible_rows))
+        if row != self.first_row:
+            self.first_row = row
+            self.render()
+            if notify and self.on_scroll:
+                self.on_scroll(row)
+
+    def yview(self, *args):
+        """Scrollbar command: moveto fraction / scroll n units|pages"""
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.rows)
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self.scroll_to(self.first_row + int(args[1]) * step)
+
+    def wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.first_row - 3)
+        else:
+            self.scroll_to(self.first_row + 3)
+        return "break"
+
+    def resize(self, event):
+        visible_rows = max(1, event.height // self.line_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.first_row = max(0, min(self.first_row, self.rows - self.visible_rows))
+            self.render()
@@ -1,14 +1,22 @@
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox
-from smartcard.System import readers
-from smartcard.util import toHexString, toBytes
-from smartcard.Exceptions import NoCardException, CardConnectionException
-import datetime
+from tkinter import ttk, messagebox, filedialog
+import logging
+from card_device import SmartCardDevice, CardError
+from card_dump import sidecar_name
+from card_log import ConsoleLog, start_file_logging
+from card_trace import ApduTracer
+from dump_store import DumpStore
+from hex_format import format_hex_dump, hex_bytes
+from trace_view import TraceWindow
+
+LOG_FILE = "smart_card_app.log"
 
 class SmartCardApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Khanfar Systems Cards Reader")
+        start_file_logging(LOG_FILE)
         
         # Set window size and position
         window_width = 800  
@@ -20,30 +28,16 @@ class SmartCardApp:
         root.geometry(f"{window_width}x{window_height}+{x}+{y}")
         
         # Initialize variables
-        self.TOTAL_SECTORS = 16
-        self.BYTES_PER_SECTOR = 16
+        self.device = SmartCardDevice(log=self.log_to_console)
+        self.store = DumpStore()
+        self.last_dump = None  # CardDump of the last Read All
+        self.tracer = ApduTracer()
+        self.TOTAL_SECTORS = self.device.TOTAL_SECTORS
+        self.BYTES_PER_SECTOR = self.device.BYTES_PER_SECTOR
         self.processing = False
-        self.connection = None
-        self.reader = None
         
         # Constants
-        self.WRITE_COMMANDS = {
-            "WRITE (0xD0)": 0xD0,
-            "PROGRAM (0xFE)": 0xFE,
-            "WRITE PROTECTION (0xD1)": 0xD1,
-            "WRITE ALL (0xDE)": 0xDE,
-            "UPDATE (0xF0)": 0xF0
-        }
-        
-        # Card type definitions
-        self.CARD_TYPES = {
-            "3B 67 00 00 4A": "SLE4442",
-            "3B 67 00 00 2A": "SLE4428",
-            "3B 67 00 00 45": "SLE4432",
-            "3B 67 00 00 47": "SLE4436",
-            "3B 95 15 40 .. 68": "SLE5542",
-            "3B 95 18 40 .. 65": "SLE5528"
-        }
+        self.WRITE_COMMANDS = self.device.WRITE_COMMANDS
         
         # Create main frames
         left_frame = ttk.Frame(root, padding="5")
@@ -97,6 +91,20 @@ class SmartCardApp:
         self.read_canvas.grid(row=0, column=4, padx=5, pady=5)
         self.read_ball = self.read_canvas.create_oval(5, 5, 15, 15, fill="gray")
         
+        # Drop the memory images kept for this connection so reads go to the card again
+        self.refresh_button = ttk.Button(read_frame, text="Refresh", command=self.refresh_from_card)
+        self.refresh_button.grid(row=0, column=5, padx=5, pady=5)
+        
+        self.export_button = ttk.Button(read_frame, text="Export Text", command=self.export_text)
+        self.export_button.grid(row=0, column=6, padx=5, pady=5)
+        
+        # Time every APDU sent to the card
+        self.trace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(read_frame, text="Trace APDUs", variable=self.trace_var,
+                        command=self.toggle_trace).grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+        ttk.Button(read_frame, text="APDU Stats",
+                   command=lambda: TraceWindow(self.root, self.tracer)).grid(row=2, column=2, padx=5, pady=5)
+        
         self.read_data = tk.Text(read_frame, height=4, width=40)
         self.read_data.grid(row=1, column=0, columnspan=5, padx=5, pady=5)
         
@@ -133,6 +141,10 @@ class SmartCardApp:
         self.write_button = ttk.Button(write_frame, text="Write Block", command=self.write_sector)
         self.write_button.grid(row=4, column=1, padx=5, pady=5)
         
+        # Program a whole binary image, writing only the bytes that differ
+        self.write_image_button = ttk.Button(write_frame, text="Write Image...", command=self.write_image)
+        self.write_image_button.grid(row=5, column=1, padx=5, pady=5)
+        
         self.write_canvas = tk.Canvas(write_frame, width=20, height=20)
         self.write_canvas.grid(row=4, column=2, padx=5, pady=5)
         self.write_ball = self.write_canvas.create_oval(5, 5, 15, 15, fill="gray")
@@ -149,6 +161,7 @@ class SmartCardApp:
         # Copy console button
         self.copy_button = ttk.Button(console_frame, text="Copy Console", command=self.copy_console)
         self.copy_button.pack(pady=5)
+        self.console_log = ConsoleLog(self.root, self.console, logging.getLogger(__name__))
         
         # Initialize status
         self.update_status_ball_color(self.connect_canvas, self.connect_ball, 'gray')
@@ -160,11 +173,10 @@ class SmartCardApp:
 
     def log_to_console(self, message):
         """Log a message to the console with timestamp"""
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        self.console.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.console.see(tk.END)  # Auto-scroll to the end
+        self.console_log.write(message)
         
     def copy_console(self):
+        self.console_log.flush()
         console_text = self.console.get("1.0", tk.END)
         self.root.clipboard_clear()
         self.root.clipboard_append(console_text)
@@ -177,19 +189,21 @@ class SmartCardApp:
     def connect_to_card(self):
         """Connect to the smart card and get its information"""
         try:
-            if not self.reader:
-                self.reader = readers()[0]
-                self.log_to_console(f"Found reader: {self.reader}")
+            if not self.device.reader:
+                if not self.device.detect_reader():
+                    raise CardError("No smart card readers found")
+                self.log_to_console(f"Found reader: {self.device.reader}")
         
-            if self.connection:
-                self.connection.disconnect()
-                self.connection = None
+            if self.device.connected:
+                self.device.disconnect()
                 self.log_to_console("Disconnected from card")
                 self.update_status_ball_color(self.connect_canvas, self.connect_ball, 'gray')
                 self.connect_button.config(text="Connect")
             else:
-                self.connection = self.reader.createConnection()
-                self.connection.connect()
+                self.device.connect()
+                # The card type decides the geometry
+                self.TOTAL_SECTORS = self.device.TOTAL_SECTORS
+                self.BYTES_PER_SECTOR = self.device.BYTES_PER_SECTOR
                 self.log_to_console("\nConnected to card successfully!")
                 self.update_status_ball_color(self.connect_canvas, self.connect_ball, 'green')
                 self.connect_button.config(text="Disconnect")
@@ -203,10 +217,8 @@ class SmartCardApp:
 
     def detect_reader(self):
         try:
-            reader_list = readers()
-            if reader_list:
-                self.reader = reader_list[0]
-                self.log_to_console(f"Found reader: {self.reader}")
+            if self.device.detect_reader():
+                self.log_to_console(f"Found reader: {self.device.reader}")
             else:
                 self.log_to_console("No readers found")
         except Exception as e:
@@ -218,163 +230,84 @@ class SmartCardApp:
     def read_sector(self):
         try:
             sector = int(self.sector_entry.get())
-            if not 0 <= sector < self.TOTAL_SECTORS:
-                raise ValueError(f"Sector must be between 0 and {self.TOTAL_SECTORS-1}")
-            
-            address = sector * self.BYTES_PER_SECTOR
-            APDU = [0xFF, 0xB0, 0x00, address, self.BYTES_PER_SECTOR]
-            response, sw1, sw2 = self.connection.transmit(APDU)
+            self.device.check_sector(sector)
             
-            if sw1 == 0x90 and sw2 == 0x00:
-                hex_values = toHexString(response)
-                self.read_data.delete(1.0, tk.END)
-                self.read_data.insert(tk.END, hex_values)
-            else:
-                self.read_data.delete(1.0, tk.END)
-                self.read_data.insert(tk.END, f"Read Error: SW1={hex(sw1)}, SW2={hex(sw2)}")
+            try:
+                hex_values = hex_bytes(self.device.read_sector(sector))
+            except CardError as e:
+                hex_values = str(e)
+            self.read_data.delete(1.0, tk.END)
+            self.read_data.insert(tk.END, hex_values)
                 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to read sector: {str(e)}")
 
     def read_all_data(self):
-        """Read all sectors and save to file"""
+        """Read the whole card into a binary dump with a JSON sidecar"""
         try:
             self.log_to_console("Starting read all sectors")
-            
-            # First read protection memory
-            command = [0xFF, 0xB2, 0x00, 0x00, 0x04]
-            response, sw1, sw2 = self.connection.transmit(command)
-            
-            protected_sectors = []
-            unprotected_sectors = []
-            
-            if sw1 == 0x90:
-                # Process protection bits
-                for byte_index in range(len(response)):
-                    for bit in range(8):
-                        sector = byte_index * 8 + bit
-                        if sector < self.TOTAL_SECTORS:
-                            if response[byte_index] & (1 << bit):
-                                protected_sectors.append(sector)
-                            else:
-                                unprotected_sectors.append(sector)
-            
-            # Read all sectors
-            all_data = []
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"card_dump_{timestamp}.txt"
-            
-            with open(filename, 'w') as f:
-                for sector in range(self.TOTAL_SECTORS):
-                    data = self.read_sector_data(sector)
-                    if data:
-                        protection_status = "Protected" if sector in protected_sectors else "Unprotected"
-                        log_message = f"Read sector {sector:02d}: {data} ({protection_status})"
-                        self.log_to_console(log_message)
-                        f.write(f"Sector {sector:02d}: {data}\n")
-                        all_data.append(data)
-                
-                # Write protection summary to file
-                f.write("\nProtection Status Summary:\n")
-                f.write("-" * 50 + "\n")
-                f.write(f"Protected Sectors: {', '.join(map(str, protected_sectors))}\n")
-                f.write(f"Unprotected Sectors: {', '.join(map(str, unprotected_sectors))}\n")
-            
-            self.log_to_console(f"Data saved to {filename}")
-            
-            # Display protection summary
-            self.log_to_console("\nProtection Status Summary:")
-            self.log_to_console("-" * 50)
-            if protected_sectors:
-                self.log_to_console(f"Protected Sectors: {', '.join(map(str, protected_sectors))}")
+            dump = self.device.dump(store=self.store)
+            self.last_dump = dump
+            
+            # One console update for the whole read
+            lines = [f"Read {len(dump.data)} bytes ({dump.sectors} sectors)",
+                     f"Data saved to {dump.filename} (metadata in {sidecar_name(dump.filename)})"]
+            if dump.unread:
+                lines.append(f"Unreadable sectors: {', '.join(map(str, dump.unread))}")
+            lines.append("\nProtection Status Summary:")
+            lines.append("-" * 50)
+            if dump.protected_sectors:
+                lines.append(f"Protected Sectors: {', '.join(map(str, dump.protected_sectors))}")
+            unprotected_sectors = ', '.join(map(str, dump.unprotected_sectors))
             if unprotected_sectors:
-                self.log_to_console(f"Unprotected Sectors: {', '.join(map(str, unprotected_sectors))}")
-            self.log_to_console(f"\nFor writing data, use unprotected sectors: {', '.join(map(str, unprotected_sectors))}")
-            self.log_to_console("-" * 50)
+                lines.append(f"Unprotected Sectors: {unprotected_sectors}")
+            lines.append(f"\nFor writing data, use unprotected sectors: {unprotected_sectors}")
+            lines.append("-" * 50)
+            self.log_to_console("\n".join(lines))
             
-            # Update display
-            if all_data:
-                self.read_data.delete(1.0, tk.END)
-                self.read_data.insert(tk.END, '\n'.join(all_data))
-                self.update_status_ball_color(self.read_canvas, self.read_ball, 'green')
+            self.read_data.delete(1.0, tk.END)
+            self.read_data.insert(tk.END, format_hex_dump(dump.data, dump.sector_size))
+            self.update_status_ball_color(self.read_canvas, self.read_ball, 'green' if dump.complete else 'red')
             
         except Exception as e:
             self.log_to_console(f"Error reading all sectors: {str(e)}")
             self.update_status_ball_color(self.read_canvas, self.read_ball, 'red')
 
+    def export_text(self):
+        """Write the last Read All dump as a per-sector text listing"""
+        if self.last_dump is None:
+            messagebox.showinfo("Export", "Read the card with Read All first")
+            return
+        filename = filedialog.asksaveasfilename(defaultextension=".txt",
+                                                initialfile=os.path.splitext(os.path.basename(self.last_dump.filename))[0],
+                                                filetypes=[("Text", "*.txt"), ("All files", "*.*")])
+        if not filename:
+            return
+        try:
+            self.last_dump.write_text(filename)
+            self.log_to_console(f"Dump exported to {filename}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Export failed: {str(e)}")
+
+    def refresh_from_card(self):
+        """Forget the cached card memory so the next reads go to the card"""
+        self.device.refresh()
+        self.log_to_console("Cached card memory cleared; next reads come from the card")
+
+    def toggle_trace(self):
+        """Record the latency of every APDU while the Trace box is ticked"""
+        self.device.tracer = self.tracer if self.trace_var.get() else None
+
     def load_pins(self):
         """Load PINs from default_pins.txt file"""
-        try:
-            pins = []
-            with open("default_pins.txt", "r") as f:
-                for line in f:
-                    # Skip comments and empty lines
-                    line = line.strip()
-                    if line and not line.startswith("#"):
-                        # Extract PIN from line (handle both plain PIN and PIN with comment)
-                        pin = line.split("#")[0].strip()
-                        if len(pin) == 6:  # Only add valid 6-character PINs
-                            pins.append(pin)
-            return pins
-        except Exception as e:
-            self.log_to_console(f"Error loading PINs: {str(e)}")
-            return ["FFFFFF"]  # Return default PIN if file can't be read
+        return self.device.load_pins()
 
     def verify_pin(self):
-        pins = self.load_pins()
-        self.log_to_console("Starting PIN verification...")
-        
-        for pin in pins:
-            try:
-                # Present PIN command for SLE4442
-                pin_bytes = [int(pin[i:i+2], 16) for i in range(0, 6, 2)]
-                APDU = [0xFF, 0x20, 0x00, 0x00, 0x03] + pin_bytes
-                response, sw1, sw2 = self.connection.transmit(APDU)
-                
-                if sw1 == 0x90 and sw2 == 0x00:
-                    self.log_to_console(f"PIN verification successful with PIN: {pin}")
-                    # Add verified PIN to the list if not already there
-                    try:
-                        with open("default_pins.txt", "r") as f:
-                            content = f.read()
-                        if f"{pin}  # Verified on" not in content:
-                            with open("default_pins.txt", "a") as f:
-                                f.write(f"\n{pin}  # Verified on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                    except:
-                        pass  # Ignore errors in updating the file
-                    return True
-                else:
-                    self.log_to_console(f"PIN {pin} failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                    
-            except Exception as e:
-                self.log_to_console(f"Error trying PIN {pin}: {str(e)}")
-                
-        self.log_to_console("All PINs failed")
-        return False
+        return self.device.verify_pin() is not None
 
     def check_protection(self, address):
         """Check if an address is write-protected"""
-        try:
-            # Read protection memory (32 bytes, each bit protects 4 bytes)
-            APDU = [0xFF, 0xB2, 0x00, 0x00, 0x20]
-            response, sw1, sw2 = self.connection.transmit(APDU)
-            
-            if sw1 == 0x90 and sw2 == 0x00:
-                # Calculate which protection bit corresponds to this address
-                prot_byte = address // 32
-                prot_bit = (address % 32) // 4
-                
-                if prot_byte < len(response):
-                    is_protected = bool(response[prot_byte] & (1 << prot_bit))
-                    self.log_to_console(f"Protection check for address {hex(address)}: {'Protected' if is_protected else 'Not protected'}")
-                    return is_protected
-            else:
-                self.log_to_console(f"Failed to read protection memory: SW1={hex(sw1)}, SW2={hex(sw2)}")
-        
-            return True  # Assume protected if we can't read protection memory
-        except Exception as e:
-            self.log_to_console(f"Error checking protection: {str(e)}")
-            return True
+        return self.device.check_protection(address)
 
     def write_sector(self):
         """Write data to a sector"""
@@ -382,8 +315,8 @@ class SmartCardApp:
             # Validate sector input
             sector_text = self.write_sector_entry.get().strip()
             if not sector_text:
-                self.log_to_console("Error: Please enter a sector number (0-15)")
-                messagebox.showerror("Error", "Please enter a sector number (0-15)")
+                self.log_to_console(f"Error: Please enter a sector number (0-{self.TOTAL_SECTORS-1})")
+                messagebox.showerror("Error", f"Please enter a sector number (0-{self.TOTAL_SECTORS-1})")
                 return
                 
             sector = int(sector_text)
@@ -422,53 +355,29 @@ class SmartCardApp:
             self.log_to_console(f"Command: {self.command_type.get()}")
 
             # Check if sector is protected
-            command = [0xFF, 0xB2, 0x00, 0x00, 0x04]  # Read protection memory
-            response, sw1, sw2 = self.connection.transmit(command)
+            is_protected = self.device.is_sector_protected(sector)
             
-            if sw1 == 0x90:
-                byte_index = sector // 8
-                bit_index = sector % 8
-                is_protected = bool(response[byte_index] & (1 << bit_index))
-                self.log_to_console(f"Sector {sector} protection status: {'Protected' if is_protected else 'Unprotected'}")
+            if is_protected is None:
+                self.log_to_console("Could not read protection status, attempting write with PIN verification")
+                self.verify_pin_and_write(sector, data, cmd_type)
+                return
                 
-                if not is_protected:
-                    # For unprotected sectors, try direct write without PIN
-                    self.log_to_console("Sector is unprotected, attempting direct write...")
-                    
-                    # Try different write commands
-                    commands = [
-                        (cmd_type, "Selected command"),
-                        (0xD0, "WRITE command"),
-                        (0xFE, "PROGRAM command"),
-                        (0xF0, "UPDATE command")
-                    ]
-                    
-                    for cmd, desc in commands:
-                        try:
-                            self.log_to_console(f"\nTrying {desc}...")
-                            command = [0xFF, cmd, 0x00, sector * self.BYTES_PER_SECTOR, len(data)] + list(data)
-                            response, sw1, sw2 = self.connection.transmit(command)
-                            
-                            if sw1 == 0x90:
-                                self.log_to_console(f"Write successful with {desc}")
-                                self.update_status_ball_color(self.write_canvas, self.write_ball, 'green')
-                                
-                                # Verify write
-                                self.verify_write(sector, data_hex)
-                                return
-                            else:
-                                self.log_to_console(f"{desc} failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                        except Exception as e:
-                            self.log_to_console(f"Error with {desc}: {str(e)}")
+            self.log_to_console(f"Sector {sector} protection status: {'Protected' if is_protected else 'Unprotected'}")
+            
+            if not is_protected:
+                # For unprotected sectors, try direct write without PIN
+                self.log_to_console("Sector is unprotected, attempting direct write...")
+                
+                if self.device.write_sector_direct(sector, data, cmd_type):
+                    self.update_status_ball_color(self.write_canvas, self.write_ball, 'green')
                     
-                    self.log_to_console("All write attempts failed")
-                    self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
+                    # Verify write
+                    self.verify_write(sector, data_hex)
                 else:
-                    # For protected sectors, try PIN verification first
-                    self.log_to_console("Sector is protected, PIN verification required")
-                    self.verify_pin_and_write(sector, data, cmd_type)
+                    self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
             else:
-                self.log_to_console("Could not read protection status, attempting write with PIN verification")
+                # For protected sectors, try PIN verification first
+                self.log_to_console("Sector is protected, PIN verification required")
                 self.verify_pin_and_write(sector, data, cmd_type)
                 
         except Exception as e:
@@ -477,6 +386,37 @@ class SmartCardApp:
             messagebox.showerror("Error", error_msg)
             self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
 
+    def write_image(self):
+        """Program a binary image onto the card after showing what it will change"""
+        if not self.device.connected:
+            messagebox.showerror("Error", "Connect to a card first")
+            return
+        filename = filedialog.askopenfilename(filetypes=[("Binary images", "*.bin"), ("All files", "*.*")])
+        if not filename:
+            return
+        try:
+            with open(filename, "rb") as f:
+                data = f.read()
+            cmd_type = self.WRITE_COMMANDS[self.command_type.get()]
+            plan = self.device.plan_image(data, cmd_type)
+            self.log_to_console(f"\nImage {filename}: {plan.summary()}")
+            if not plan.runs:
+                messagebox.showinfo("Write Image", "The card already holds this image")
+                return
+            if not messagebox.askyesno("Write Image", f"{plan.summary()}.\n\nWrite the image to the card?"):
+                return
+            
+            result = self.device.write_image(data, cmd_type)
+            self.log_to_console(f"{result.summary()}\n"
+                                f"Result map (. unchanged, W written, L locked, X failed):\n{result.result_map()}")
+            self.update_status_ball_color(self.write_canvas, self.write_ball, 'green' if result.ok else 'red')
+            if not result.ok:
+                messagebox.showwarning("Write Image", result.summary())
+        except (CardError, ValueError, OSError) as e:
+            self.log_to_console(f"Image write error: {str(e)}")
+            messagebox.showerror("Error", str(e))
+            self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
+
     def verify_pin_and_write(self, sector, data, cmd_type):
         if self.verify_pin():
             self.log_to_console("PIN verification successful, proceeding with write...")
@@ -487,110 +427,17 @@ class SmartCardApp:
 
     def write_sector_with_pin(self, sector, data, cmd_type):
         try:
-            # Write data byte by byte for SLE4442
-            address = sector * self.BYTES_PER_SECTOR
-            success = True
-            failed_bytes = []
-            
-            self.log_to_console(f"Writing data to sector {sector}...")
-            self.log_to_console("Starting byte-by-byte write operation:")
-            
-            import time
-            
-            for i, byte in enumerate(data):
-                current_address = address + i
-                
-                # Check protection before writing
-                if self.check_protection(current_address):
-                    # Try to update protection memory if protected
-                    if byte != 0:  # Only need to unprotect for non-zero values
-                        self.log_to_console(f"Attempting to unprotect address {hex(current_address)}")
-                        # Write protection bit command
-                        prot_APDU = [0xFF, 0xD1, 0x00, current_address // 4, 0x01, 0x00]
-                        prot_response, prot_sw1, prot_sw2 = self.connection.transmit(prot_APDU)
-                        time.sleep(0.01)  # Wait after protection change
-                        
-                        if prot_sw1 != 0x90 or prot_sw2 != 0x00:
-                            self.log_to_console(f"Failed to unprotect address: SW1={hex(prot_sw1)}, SW2={hex(prot_sw2)}")
-                
-                if byte != 0 and cmd_type in [0xFE, 0xF0]:  # For non-zero values with PROGRAM or UPDATE
-                    self.log_to_console(f"Non-zero value detected at byte {i}: {hex(byte)}, using command {hex(cmd_type)}")
-                    # First erase the location if using PROGRAM
-                    if cmd_type == 0xFE:
-                        erase_APDU = [0xFF, 0xD0, 0x00, current_address, 0x01, 0x00]
-                        self.connection.transmit(erase_APDU)
-                        time.sleep(0.003)  # Wait after erase
-                    
-                    # Then program/update the new value
-                    APDU = [0xFF, cmd_type, 0x00, current_address, 0x01, byte]
-                    self.log_to_console(f"Writing byte {i}: {hex(byte)} to address {hex(current_address)}")
-                    response, sw1, sw2 = self.connection.transmit(APDU)
-                    time.sleep(0.005)  # 5ms programming time
-                    
-                    if sw1 != 0x90 and sw2 != 0x00:
-                        self.log_to_console(f"Command response: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                else:
-                    # Use selected command type for other cases
-                    APDU = [0xFF, cmd_type, 0x00, current_address, 0x01, byte]
-                    self.log_to_console(f"Writing byte {i}: {hex(byte)} to address {hex(current_address)}")
-                    response, sw1, sw2 = self.connection.transmit(APDU)
-                
-                # Rest of your existing verification code...
-                
-                # Log the response for each byte
-                if sw1 == 0x90 and sw2 == 0x00:
-                    self.log_to_console(f"✓ Byte {i} written successfully")
-                    # Verify immediate read after write
-                    verify_APDU = [0xFF, 0xB0, 0x00, current_address, 0x01]
-                    verify_response, verify_sw1, verify_sw2 = self.connection.transmit(verify_APDU)
-                    
-                    if verify_response and verify_response[0] == byte:
-                        self.log_to_console(f"✓ Byte {i} verified: wrote {hex(byte)}, read back {hex(verify_response[0])}")
-                    else:
-                        self.log_to_console(f"✗ Byte {i} verification failed: wrote {hex(byte)}, read back {hex(verify_response[0]) if verify_response else 'none'}")
-                        failed_bytes.append(i)
-                else:
-                    success = False
-                    error_msg = f"✗ Write Error at byte {i}: SW1={hex(sw1)}, SW2={hex(sw2)}"
-                    self.log_to_console(error_msg)
-                    failed_bytes.append(i)
-                    messagebox.showerror("Error", error_msg)
-                    self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
-                    break
-                    
-            if success:
-                self.log_to_console(f"Sector {sector} write operation completed.")
-                if failed_bytes:
-                    self.log_to_console(f"Failed bytes at positions: {failed_bytes}")
-                
-                # Verify the write by reading back
-                APDU = [0xFF, 0xB0, 0x00, address, self.BYTES_PER_SECTOR]
-                response, sw1, sw2 = self.connection.transmit(APDU)
+            try:
+                self.device.write_sector_with_pin(sector, data, cmd_type)
+            except CardError as e:
+                error_msg = str(e)
+                self.log_to_console(error_msg)
+                messagebox.showerror("Error", error_msg)
+                self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
+                return
                 
-                if sw1 == 0x90 and sw2 == 0x00:
-                    read_data = toHexString(response)
-                    self.log_to_console(f"Final verification read of sector {sector}: {read_data}")
-                    
-                    # Compare written data with read data
-                    if read_data.replace(" ", "").upper() == data_hex.upper():
-                        self.log_to_console("Verification successful - written data matches read data")
-                        self.update_status_ball_color(self.write_canvas, self.write_ball, 'green')
-                        messagebox.showinfo("Success", f"Sector {sector} written and verified successfully!")
-                    else:
-                        self.log_to_console("Warning: Read data doesn't match written data!")
-                        self.log_to_console(f"Attempted to write: {data_hex}")
-                        self.log_to_console(f"Actually written: {read_data}")
-                        self.log_to_console("Byte-by-byte comparison:")
-                        for i in range(16):
-                            written = int(data_hex[i*2:(i+1)*2], 16)
-                            read = response[i]
-                            if written != read:
-                                self.log_to_console(f"Mismatch at byte {i}: Wrote {hex(written)}, Read {hex(read)}")
-                        self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
-                        messagebox.showwarning("Warning", "Written data doesn't match intended data!")
-                else:
-                    self.log_to_console(f"Verification read failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
-                    self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
+            # Verify the write by reading back
+            self.verify_write(sector, data.hex().upper())
 
         except Exception as e:
             error_msg = f"Failed to write sector: {str(e)}"
@@ -600,101 +447,53 @@ class SmartCardApp:
 
     def get_card_type(self):
         """Get the card type by reading its ATR"""
-        try:
-            if not self.connection:
-                return "No card connected"
-            
-            atr = toHexString(self.connection.getATR())
-            
-            # Try to match ATR with known card types
-            for atr_pattern, card_type in self.CARD_TYPES.items():
-                # Replace dots with wildcard for pattern matching
-                pattern = atr_pattern.replace(".", r"\d")
-                if atr.startswith(pattern.split()[0]):
-                    return f"{card_type} (ATR: {atr})"
-            
-            return f"Unknown card type (ATR: {atr})"
-        except Exception as e:
-            return f"Error reading card type: {str(e)}"
+        return self.device.get_card_type()
 
     def get_card_uid(self):
         """Get the card's UID if available"""
-        try:
-            if not self.connection:
-                return "No card connected"
-            
-            # Try to read UID using different commands for different card types
-            # GET DATA command for ISO cards
-            COMMANDS = [
-                [0xFF, 0xCA, 0x00, 0x00, 0x00],  # Standard GET DATA
-                [0xFF, 0xB0, 0x00, 0x00, 0x08],  # Read first 8 bytes
-                [0xFF, 0x36, 0x00, 0x00, 0x08]   # Alternative command
-            ]
-            
-            for cmd in COMMANDS:
-                try:
-                    response, sw1, sw2 = self.connection.transmit(cmd)
-                    if sw1 == 0x90 and len(response) > 0:
-                        return f"Card UID: {toHexString(response)}"
-                except:
-                    continue
-            
-            return "UID not available for this card type"
-        except Exception as e:
-            return f"Error reading UID: {str(e)}"
+        return self.device.get_card_uid()
 
     def read_protection_memory(self):
         """Read the protection memory of the card"""
         try:
-            # Command to read protection memory
-            command = [0xFF, 0xB2, 0x00, 0x00, 0x04]
-            response, sw1, sw2 = self.connection.transmit(command)
-            
-            if sw1 == 0x90:
-                self.log_to_console("\nProtection Memory:")
-                self.log_to_console("-" * 40)
-                self.log_to_console(f"Raw data: {toHexString(response)}")
-                
-                # Analyze protection bits
-                for i, byte in enumerate(response):
-                    protected_sectors = []
-                    for bit in range(8):
-                        if byte & (1 << bit):
-                            sector = (i * 8) + bit
-                            if sector < self.TOTAL_SECTORS:
-                                protected_sectors.append(sector)
-                    
-                    if protected_sectors:
-                        self.log_to_console(f"Protected sectors in byte {i}: {protected_sectors}")
-                    else:
-                        self.log_to_console(f"No protected sectors in byte {i}")
+            response = self.device.read_protection_memory()
+            
+            self.log_to_console("\nProtection Memory:")
+            self.log_to_console("-" * 40)
+            self.log_to_console(f"Raw data: {hex_bytes(response)}")
+            
+            # A cleared bit protects its byte for good
+            protected = sorted(self.device.driver.protected_addresses(response))
+            if protected:
+                self.log_to_console(f"Protected bytes: {', '.join(hex(address) for address in protected)}")
+                protected_sectors, _ = self.device.sector_protection(response)
+                self.log_to_console(f"Sectors with protected bytes: {protected_sectors}")
             else:
-                self.log_to_console(f"Failed to read protection memory: SW1={hex(sw1)}, SW2={hex(sw2)}")
+                self.log_to_console("No protected bytes")
                 
+        except CardError as e:
+            self.log_to_console(str(e))
         except Exception as e:
             self.log_to_console(f"Error reading protection memory: {str(e)}")
 
     def read_security_memory(self):
         """Read the security memory of the card"""
         try:
-            # Command to read security memory
-            command = [0xFF, 0xB1, 0x00, 0x00, 0x04]
-            response, sw1, sw2 = self.connection.transmit(command)
+            response = self.device.read_security_memory()
             
-            if sw1 == 0x90:
-                self.log_to_console("\nSecurity Memory:")
-                self.log_to_console("-" * 40)
-                self.log_to_console(f"Raw data: {toHexString(response)}")
-                
-                # Error counter is typically in first byte
-                error_counter = response[0] if response else 0
-                self.log_to_console(f"PIN error counter: {error_counter}")
-                
-                if len(response) > 1:
-                    self.log_to_console(f"Additional security data: {toHexString(response[1:])}")
-            else:
-                self.log_to_console(f"Failed to read security memory: SW1={hex(sw1)}, SW2={hex(sw2)}")
+            self.log_to_console("\nSecurity Memory:")
+            self.log_to_console("-" * 40)
+            self.log_to_console(f"Raw data: {hex_bytes(response)}")
+            
+            # Error counter is typically in first byte
+            error_counter = response[0] if response else 0
+            self.log_to_console(f"PIN error counter: {error_counter}")
+            
+            if len(response) > 1:
+                self.log_to_console(f"Additional security data: {hex_bytes(response[1:])}")
                 
+        except CardError as e:
+            self.log_to_console(str(e))
         except Exception as e:
             self.log_to_console(f"Error reading security memory: {str(e)}")
 
@@ -714,13 +513,14 @@ class SmartCardApp:
             self.log_to_console(f"Card ID: {card_uid}")
             
             # Get additional card info
-            if self.connection:
-                atr = toHexString(self.connection.getATR())
+            if self.device.connected:
+                atr = hex_bytes(self.device.get_atr())
                 self.log_to_console(f"Raw ATR: {atr}")
                 self.log_to_console(f"Protocol: T=0 (Memory Card)")
-                self.log_to_console(f"Memory Size: 256 bytes (16 sectors × 16 bytes)")
-                self.log_to_console(f"Protection Memory: 32 bytes")
-                self.log_to_console(f"Security Memory: 4 bytes")
+                driver = self.device.driver
+                self.log_to_console(f"Memory Size: {driver.describe()}")
+                self.log_to_console(f"Protection Memory: {driver.protection_size} bytes ({driver.protection})")
+                self.log_to_console(f"Security Memory: {self.device.SECURITY_SIZE} bytes")
                 
                 # Read protection and security memory
                 self.read_protection_memory()
@@ -733,46 +533,22 @@ class SmartCardApp:
 
     def verify_write(self, sector, data_hex):
         # Verify the write by reading back
-        APDU = [0xFF, 0xB0, 0x00, sector * self.BYTES_PER_SECTOR, self.BYTES_PER_SECTOR]
-        response, sw1, sw2 = self.connection.transmit(APDU)
-        
-        if sw1 == 0x90 and sw2 == 0x00:
-            read_data = toHexString(response)
-            self.log_to_console(f"Final verification read of sector {sector}: {read_data}")
+        try:
+            matches, response = self.device.verify_sector(sector, bytes.fromhex(data_hex))
+        except CardError as e:
+            self.log_to_console(f"Verification read failed: {str(e)}")
+            self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
+            return
             
-            # Compare written data with read data
-            if read_data.replace(" ", "").upper() == data_hex.upper():
-                self.log_to_console("Verification successful - written data matches read data")
-                self.update_status_ball_color(self.write_canvas, self.write_ball, 'green')
-                messagebox.showinfo("Success", f"Sector {sector} written and verified successfully!")
-            else:
-                self.log_to_console("Warning: Read data doesn't match written data!")
-                self.log_to_console(f"Attempted to write: {data_hex}")
-                self.log_to_console(f"Actually written: {read_data}")
-                self.log_to_console("Byte-by-byte comparison:")
-                for i in range(16):
-                    written = int(data_hex[i*2:(i+1)*2], 16)
-                    read = response[i]
-                    if written != read:
-                        self.log_to_console(f"Mismatch at byte {i}: Wrote {hex(written)}, Read {hex(read)}")
-                self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
-                messagebox.showwarning("Warning", "Written data doesn't match intended data!")
+        if matches:
+            self.update_status_ball_color(self.write_canvas, self.write_ball, 'green')
+            messagebox.showinfo("Success", f"Sector {sector} written and verified successfully!")
         else:
-            self.log_to_console(f"Verification read failed: SW1={hex(sw1)}, SW2={hex(sw2)}")
             self.update_status_ball_color(self.write_canvas, self.write_ball, 'red')
+            messagebox.showwarning("Warning", "Written data doesn't match intended data!")
 
     def read_sector_data(self, sector):
-        try:
-            address = sector * self.BYTES_PER_SECTOR
-            APDU = [0xFF, 0xB0, 0x00, address, self.BYTES_PER_SECTOR]
-            response, sw1, sw2 = self.connection.transmit(APDU)
-            
-            if sw1 == 0x90 and sw2 == 0x00:
-                return toHexString(response)
-            else:
-                return f"Read Error: SW1={hex(sw1)}, SW2={hex(sw2)}"
-        except Exception as e:
-            return f"Error reading sector: {str(e)}"
+        return self.device.read_sector_data(sector)
 
 if __name__ == "__main__":
     root = tk.Tk()
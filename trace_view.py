@@ -0,0 +1,62 @@
+"""Tk window showing the APDU latency histograms of an ApduTracer."""
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+REFRESH_MS = 1000
+
+
+class TraceWindow:
+    """Live table of per-operation and per-reader APDU statistics"""
+
+    COLUMNS = (("count", "APDUs", 60), ("errors", "Errors", 50), ("mean_ms", "Mean ms", 70),
+               ("p50_ms", "p50 ms", 70), ("p95_ms", "p95 ms", 70), ("max_ms", "Max ms", 70),
+               ("total_s", "Total s", 70), ("bytes_out", "Bytes out", 70), ("bytes_in", "Bytes in", 70))
+
+    def __init__(self, root, tracer):
+        self.tracer = tracer
+        self.window = tk.Toplevel(root)
+        self.window.title("APDU Statistics")
+        self.window.geometry("820x320")
+
+        self.tree = ttk.Treeview(self.window, columns=[name for name, _, _ in self.COLUMNS],
+                                 show="tree headings")
+        self.tree.heading("#0", text="Operation / Reader")
+        self.tree.column("#0", width=180)
+        for name, heading, width in self.COLUMNS:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=width, anchor="e")
+        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
+
+        buttons = ttk.Frame(self.window, padding="5")
+        buttons.pack(fill="x")
+        ttk.Button(buttons, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Export JSON", command=lambda: self.export("json")).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(buttons, text="Export CSV", command=lambda: self.export("csv")).pack(side=tk.RIGHT, padx=5)
+
+        self.refresh()
+
+    def refresh(self):
+        if not self.window.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        for row in self.tracer.rows():
+            self.tree.insert("", tk.END, text=f"{row['group']}: {row['name']}",
+                             values=[row[name] for name, _, _ in self.COLUMNS])
+        self.window.after(REFRESH_MS, self.refresh)
+
+    def reset(self):
+        self.tracer.reset()
+        self.tree.delete(*self.tree.get_children())
+
+    def export(self, kind):
+        filename = filedialog.asksaveasfilename(parent=self.window, defaultextension=f".{kind}",
+                                                filetypes=[(kind.upper(), f"*.{kind}"), ("All files", "*.*")])
+        if not filename:
+            return
+        try:
+            if kind == "json":
+                self.tracer.export_json(filename)
+            else:
+                self.tracer.export_csv(filename)
+        except OSError as e:
+            messagebox.showerror("Error", f"Export failed: {str(e)}", parent=self.window)